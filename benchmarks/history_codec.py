@@ -0,0 +1,108 @@
+"""
+Compares the history codec with JSON for the size and speed of a long, tool-heavy history.
+
+    python -m benchmarks.history_codec
+"""
+
+import json
+import time
+import zlib
+from typing import Any, Callable
+
+from llmio import codec, types as T
+
+
+def _history(rounds: int) -> list[T.Message]:
+    history: list[T.Message] = [{"role": "user", "content": "Plan my week."}]
+    for i in range(rounds):
+        history.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{i}_{j}",
+                        "type": "function",
+                        "function": {
+                            "name": name,
+                            "arguments": json.dumps({"day": i % 7, "slot": j}),
+                        },
+                    }
+                    for j, name in enumerate(["list_events", "get_weather"])
+                ],
+            }
+        )
+        for j in range(2):
+            history.append(
+                {
+                    "role": "tool",
+                    "content": json.dumps(
+                        [
+                            {"id": k, "title": f"Meeting {k}", "done": False}
+                            for k in range(5)
+                        ]
+                    ),
+                    "tool_call_id": f"call_{i}_{j}",
+                }
+            )
+        history.append({"role": "assistant", "content": f"Day {i} is planned."})
+    return history
+
+
+def _measure(function: Callable[[], Any], repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    history = _history(500)
+    as_json = json.dumps(history).encode()
+    compressed_json = zlib.compress(as_json)
+    encoded = codec.encode_history(history)
+    compressed = codec.encode_history(history, compress=True)
+    tail = history[-4:]
+
+    rows = [
+        (
+            "json",
+            len(as_json),
+            lambda: json.dumps(history).encode(),
+            lambda: json.loads(as_json),
+        ),
+        (
+            "json + zlib",
+            len(compressed_json),
+            lambda: zlib.compress(json.dumps(history).encode()),
+            lambda: json.loads(zlib.decompress(compressed_json)),
+        ),
+        (
+            "codec",
+            len(encoded),
+            lambda: codec.encode_history(history),
+            lambda: codec.decode_history(encoded),
+        ),
+        (
+            "codec + zlib",
+            len(compressed),
+            lambda: codec.encode_history(history, compress=True),
+            lambda: codec.decode_history(compressed),
+        ),
+    ]
+    print(f"{len(history)} messages")
+    print(f"{'':<14}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+    for name, size, encode, decode in rows:
+        print(
+            f"{name:<14}{size:>10,}{_measure(encode):>12.2f}{_measure(decode):>12.2f}"
+        )
+
+    append_ms = _measure(lambda: codec.append_history(encoded, tail))
+    reencode_ms = _measure(lambda: json.dumps(history + tail).encode())
+    print(
+        f"Appending 4 messages: codec {append_ms:.3f} ms, json re-encode {reencode_ms:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares how many streamed chunks per second the SDK path and the raw path decode.
+
+    python -m benchmarks.raw_decoding
+"""
+
+import json
+import time
+from typing import Any, Callable
+
+from openai._models import construct_type  # pylint: disable=protected-access
+
+from llmio import models, raw
+
+
+def _chunks(count: int) -> list[str]:
+    return [
+        json.dumps(
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": f"token{i} "},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def _sdk(data: dict[str, Any]) -> Any:
+    # This mirrors how openai.AsyncStream turns SSE payloads into models.
+    return construct_type(type_=models.ChatCompletionChunk, value=data)
+
+
+def _measure(decode: Callable[[dict[str, Any]], Any], lines: list[str]) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        decode(json.loads(line))
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    lines = _chunks(100_000)
+    sdk = _measure(_sdk, lines)
+    fast = _measure(raw.decode_chunk, lines)
+    print(f"SDK models: {sdk:>12,.0f} chunks/s")
+    print(f"Raw:        {fast:>12,.0f} chunks/s ({fast / sdk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,73 @@
-from .agent import (
-    Agent,
-    StructuredAgent,
-)
-
-from .types import (
-    Message,
-    UserMessage,
-    AssistantMessage,
-    ToolCall,
-    ToolMessage,
-)
-
-from .errors import BadToolCall
-from .clients import (
-    OpenAIClient,
-    AzureOpenAIClient,
-    GeminiClient,
-)
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .agent import (
+        Agent,
+        StructuredAgent,
+    )
+
+    from .types import (
+        Message,
+        UserMessage,
+        AssistantMessage,
+        ToolCall,
+        ToolMessage,
+    )
+
+    from .errors import BadToolCall, StopStream
+    from .clients import (
+        OpenAIClient,
+        AzureOpenAIClient,
+        GeminiClient,
+        create_http_client,
+    )
+    from .retrieval import ToolRetriever
+    from .results import BlobStore, Project, Spill, Truncate
+    from .pool import AgentPool
+    from .sync import SyncAgent
+    from .delivery import StreamDelivery
+    from .cascade import Cascade
+
+
+# The public names are imported on first access, so that `import llmio`
+# does not pay for importing the openai SDK and pydantic up front.
+_LAZY_IMPORTS = {
+    "Agent": ".agent",
+    "StructuredAgent": ".agent",
+    "Message": ".types",
+    "UserMessage": ".types",
+    "AssistantMessage": ".types",
+    "ToolCall": ".types",
+    "ToolMessage": ".types",
+    "BadToolCall": ".errors",
+    "StopStream": ".errors",
+    "OpenAIClient": ".clients",
+    "AzureOpenAIClient": ".clients",
+    "GeminiClient": ".clients",
+    "create_http_client": ".clients",
+    "ToolRetriever": ".retrieval",
+    "BlobStore": ".results",
+    "Project": ".results",
+    "Spill": ".results",
+    "Truncate": ".results",
+    "AgentPool": ".pool",
+    "SyncAgent": ".sync",
+    "StreamDelivery": ".delivery",
+    "Cascade": ".cascade",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
 
 
 __all__ = [
@@ -28,7 +79,18 @@ __all__ = [
     "ToolCall",
     "ToolMessage",
     "BadToolCall",
+    "StopStream",
     "OpenAIClient",
     "AzureOpenAIClient",
     "GeminiClient",
+    "create_http_client",
+    "ToolRetriever",
+    "BlobStore",
+    "Project",
+    "Spill",
+    "Truncate",
+    "AgentPool",
+    "SyncAgent",
+    "StreamDelivery",
+    "Cascade",
 ]
@@ -1,41 +1,197 @@
+from __future__ import annotations
+
 import asyncio
 import pprint
-from typing import Callable, Generic, Type, Any, AsyncIterator, TypeVar
-from dataclasses import dataclass
+from typing import (
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    Generic,
+    Hashable,
+    Literal,
+    Type,
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    TypeVar,
+    TYPE_CHECKING,
+    get_type_hints,
+)
+from dataclasses import dataclass, field
+from contextlib import aclosing, nullcontext
+from functools import cached_property, partial
+import json
+import logging
+import math
+import string
 import textwrap
 from inspect import signature, iscoroutinefunction
-import re
+import time
 
 from typing_extensions import assert_never
 import pydantic
-from openai.types.shared_params import ResponseFormatJSONSchema
-from openai.lib._parsing import type_to_response_format_param
 
-from llmio import function_parser, errors, types as T, models
-from llmio.clients import BaseClient, AsyncOpenAI
+from llmio import (
+    function_parser,
+    errors,
+    types as T,
+    models,
+    tracing,
+    stats as S,
+    schema as schema_,
+    sync,
+)
+from llmio.cascade import Cascade
+from llmio.delivery import StreamDelivery
+from llmio.metrics import Metrics
+from llmio.retrieval import ToolRetriever
+from llmio.results import BlobStore, ResultPolicy, ResultSerializer, Spill
+
+if TYPE_CHECKING:
+    from openai.types.shared_params import ResponseFormatJSONSchema
+
+    from llmio.clients import BaseClient, AsyncOpenAI
 
 
 _Context = TypeVar("_Context")
 
 _CONTEXT_ARG_NAME = "_context"
 
+_TOOL_TIMEOUT_MESSAGE = "The tool '{tool}' did not finish within {timeout} seconds."
+
+_logger = logging.getLogger("llmio")
+
 
 @dataclass
 class AgentResponse:
     messages: list[str]
     history: list[T.Message]
+    stats: S.ResponseStats = field(default_factory=S.ResponseStats)
+
+
+@dataclass
+class _SpeakState:
+    """
+    State shared by the rounds of a single interaction with the agent.
+    """
+
+    rounds: int = 0
+    retries: int = 0
+    stats: S.ResponseStats = field(default_factory=S.ResponseStats)
+    # The time.monotonic() time at which the interaction must be complete.
+    deadline: float | None = None
+
+    def remaining(self) -> float | None:
+        """
+        Returns the seconds left until the deadline, or None if there is no deadline.
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+
+VariableCache = Literal["speak", "context", "global"]
+
+# The maximum number of contexts a context-scoped variable keeps values for.
+_MAX_CACHED_CONTEXTS = 1024
+
+
+@dataclass
+class _Variable:
+    function: Callable
+    cache: VariableCache = "speak"
+    ttl: float | None = None
+    key: Callable[[Any], Hashable] | None = None
+    _values: dict[Hashable, tuple[float, Any]] = field(default_factory=dict)
+
+    def cache_key(self, context: Any) -> Hashable:
+        if self.cache == "global":
+            return None
+        key = self.key(context) if self.key is not None else context
+        try:
+            hash(key)
+        except TypeError as e:
+            raise TypeError(
+                f"The context of variable '{self.function.__name__}' is not hashable. "
+                "Pass a `key` function that returns a hashable key for the context."
+            ) from e
+        return key
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """
+        Returns whether a value is cached for the key, and the value.
+        """
+        entry = self._values.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._values[key]
+            return False, None
+        return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires = math.inf if self.ttl is None else time.monotonic() + self.ttl
+        self._values[key] = (expires, value)
+        if len(self._values) > _MAX_CACHED_CONTEXTS:
+            # Dicts keep insertion order, so this evicts the oldest value.
+            del self._values[next(iter(self._values))]
+
+
+@dataclass
+class _Hook:
+    """
+    A prompt inspector, output inspector or message callback.
+    Concurrent hooks run together with the other hooks of the same kind,
+    and background hooks run as tasks that the interaction does not wait for.
+    Synchronous concurrent and background hooks run in a thread.
+    """
+
+    function: Callable
+    concurrent: bool = False
+    background: bool = False
+
+    @cached_property
+    def takes_context(self) -> bool:
+        return _CONTEXT_ARG_NAME in signature(self.function).parameters
+
+    async def __call__(self, context: Any, *args: Any, **kwargs: Any) -> None:
+        if self.takes_context:
+            kwargs[_CONTEXT_ARG_NAME] = context
+        if iscoroutinefunction(self.function):
+            await self.function(*args, **kwargs)
+        elif self.concurrent or self.background:
+            await asyncio.to_thread(self.function, *args, **kwargs)
+        else:
+            self.function(*args, **kwargs)
+
+
+def _sorted_schema(value: Any) -> Any:
+    """
+    Returns a copy of a JSON schema with the keys of all objects sorted,
+    so that it always serializes to the same bytes.
+    """
+    if isinstance(value, dict):
+        return {key: _sorted_schema(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_sorted_schema(item) for item in value]
+    return value
 
 
 @dataclass
 class _Tool:
     function: Callable
     strict: bool = False
+    minimize: bool = False
+    timeout: float | None = None
+    result_policy: ResultPolicy = field(default_factory=ResultPolicy)
+    tabular: bool = False
 
     @property
     def name(self) -> str:
         return self.function.__name__
 
-    @property
+    @cached_property
     def params(self) -> Type[pydantic.BaseModel]:
         """
         Returns a Pydantic model dynamically created from the function signature.
@@ -44,6 +200,17 @@ class _Tool:
         """
         return function_parser.model_from_function(self.function)
 
+    @cached_property
+    def serializer(self) -> ResultSerializer:
+        """
+        Returns the serializer for the tool's results, compiled for its return annotation.
+        """
+        try:
+            annotation = get_type_hints(self.function).get("return", Any)
+        except NameError:
+            annotation = Any
+        return ResultSerializer(annotation, tabular=self.tabular)
+
     @property
     def description(self) -> str:
         """
@@ -55,11 +222,16 @@ class _Tool:
         return textwrap.dedent(self.function.__doc__).strip()
 
     async def execute(
-        self, params: pydantic.BaseModel, context: _Context | None
+        self,
+        params: pydantic.BaseModel,
+        context: _Context | None,
+        thread: bool = False,
     ) -> str:
         """
         Executes the tool with the parsed parameters received from the OpenAI API.
         If the function is a coroutine, it is awaited.
+        Synchronous functions with a timeout, or when `thread` is set, run in a worker thread,
+        so that the event loop is free to stop waiting for them.
         """
         kwargs = {}
         if _CONTEXT_ARG_NAME in signature(self.function).parameters:
@@ -67,10 +239,14 @@ class _Tool:
 
         if iscoroutinefunction(self.function):
             result = await self.function(**params.model_dump(), **kwargs)
+        elif self.timeout is not None or thread:
+            result = await asyncio.to_thread(
+                self.function, **params.model_dump(), **kwargs
+            )
         else:
             result = self.function(**params.model_dump(), **kwargs)
 
-        return str(result)
+        return self.result_policy.apply(result, self.serializer)
 
     def parse_args(self, args: str) -> pydantic.BaseModel:
         """
@@ -78,10 +254,10 @@ class _Tool:
         """
         return self.params.model_validate_json(args)
 
-    @property
-    def function_definition(self) -> T.FunctionDefinition:
+    @cached_property
+    def full_function_definition(self) -> T.FunctionDefinition:
         """
-        Returns the tool schema that is sent to the OpenAI API.
+        Returns the tool schema as generated by pydantic, with top-level titles removed.
         """
         schema = self.params.model_json_schema()
 
@@ -101,6 +277,74 @@ class _Tool:
 
         return definition
 
+    @cached_property
+    def function_definition(self) -> T.FunctionDefinition:
+        """
+        Returns the tool schema that is sent to the OpenAI API.
+        """
+        definition = self.full_function_definition
+        if not self.minimize:
+            return definition
+        minimized = T.FunctionDefinition(
+            name=definition["name"],
+            description=schema_.compress_whitespace(definition.get("description", "")),
+            parameters=schema_.minimize_schema(definition.get("parameters", {})),
+        )
+        if "strict" in definition:
+            minimized["strict"] = definition["strict"]
+        return minimized
+
+    @property
+    def tokens_saved(self) -> int:
+        """
+        The number of prompt tokens the schema minimization saves on every request.
+        """
+        return schema_.count_tokens(
+            json.dumps(self.full_function_definition)
+        ) - schema_.count_tokens(json.dumps(self.function_definition))
+
+
+class _InvalidToolCall(Exception):
+    """
+    Aborts a stream that is certain to produce an invalid tool call.
+    """
+
+
+class _ToolCallChecker:
+    """
+    Checks the tool calls of a stream while they arrive: names as soon as they are received,
+    and arguments incrementally, as far as they can be checked before they are complete.
+    """
+
+    def __init__(self, tools: list[_Tool], argument_errors: dict[str, str]) -> None:
+        """
+        Args:
+            tools: The tools of the agent.
+            argument_errors: Receives the errors of invalid arguments, by tool call id.
+        """
+        self._tools = {tool.name: tool for tool in tools}
+        self._checkers: dict[str, schema_.ArgumentPrefixChecker] = {}
+        self._checked: dict[str, int] = {}
+        self._argument_errors = argument_errors
+
+    def check(self, tool_calls: list[Any]) -> None:
+        for tool_call in tool_calls:
+            function = tool_call.function
+            checker = self._checkers.get(tool_call.id)
+            if checker is None:
+                tool = self._tools.get(function.name)
+                if tool is None:
+                    raise _InvalidToolCall()
+                checker = self._checkers[tool_call.id] = schema_.ArgumentPrefixChecker(
+                    dict(tool.full_function_definition.get("parameters", {}))
+                )
+            checked = self._checked.get(tool_call.id, 0)
+            error = checker.feed(function.arguments[checked:])
+            if error is not None:
+                self._argument_errors[tool_call.id] = error
+                raise _InvalidToolCall()
+            self._checked[tool_call.id] = len(function.arguments)
+
 
 _ResponseFormatT = TypeVar("_ResponseFormatT", bound=pydantic.BaseModel)
 
@@ -108,10 +352,17 @@ _ResponseFormatT = TypeVar("_ResponseFormatT", bound=pydantic.BaseModel)
 class StructuredAgentResponse(Generic[_ResponseFormatT]):
     messages: list[_ResponseFormatT]
     history: list[T.Message]
+    stats: S.ResponseStats
 
-    def __init__(self, messages: list[_ResponseFormatT], history: list[T.Message]):
+    def __init__(
+        self,
+        messages: list[_ResponseFormatT],
+        history: list[T.Message],
+        stats: S.ResponseStats | None = None,
+    ):
         self.messages = messages
         self.history = history
+        self.stats = stats or S.ResponseStats()
 
 
 class BaseAgent:
@@ -121,6 +372,15 @@ class BaseAgent:
         client: BaseClient | AsyncOpenAI,
         model: str = "gpt-4o-mini",
         graceful_errors: bool = False,
+        tracer: tracing.Tracer | None = None,
+        metrics: Metrics | None = None,
+        stable_prefix: bool = False,
+        prompt_cache_key: str | None = None,
+        tool_retriever: ToolRetriever | None = None,
+        minimize_schemas: bool = False,
+        tool_timeout_message: str = _TOOL_TIMEOUT_MESSAGE,
+        stream_delivery: StreamDelivery | None = None,
+        cascade: Cascade | None = None,
     ):
         """
         Initializes the agent with an instruction, OpenAI client, and model.
@@ -135,9 +395,44 @@ class BaseAgent:
                                 uninterpretable tool call is returned.
                              If set to True, the agent will try to explain the error
                                 to the model and continue the interaction.
+            tracer: A tracer that receives spans for each phase of the interaction.
+                    Defaults to a no-op tracer.
+            metrics: Metrics to record latencies, token counts and errors into.
+            stable_prefix: Whether to keep the start of the prompt identical across requests,
+                           so that providers can reuse their cached prompt prefix.
+                           Tools are sent in a deterministic order and variables are
+                           sent in a message after the history instead of in the instruction.
+            prompt_cache_key: A key that is sent with every request,
+                              to route requests that share a prefix to the same cache.
+            tool_retriever: Selects the tools that are sent with each request
+                            by their relevance to the latest user message.
+                            All tools are sent if not set.
+            minimize_schemas: Whether to minimize the tool schemas to save prompt tokens.
+                              Definitions are inlined and titles, null defaults
+                              and redundant whitespace are removed.
+            tool_timeout_message: The tool message sent to the model when a tool times out.
+                                  `{tool}` and `{timeout}` are replaced with the tool name
+                                  and its timeout.
+            stream_delivery: Delivers stream deltas to the stream callbacks from a separate task,
+                             coalesced over a time window, so that slow callbacks
+                             do not slow down reading the stream.
+                             Callbacks are awaited for every delta if not set.
+            cascade: Tries a list of models in order instead of `model`, escalating to the next one
+                     when an answer is invalid, rejected by its confidence hook or too slow.
         """
         self._model = model
         self._raw_instruction = textwrap.dedent(instruction).strip()
+        # The instruction is parsed once into literal text and variable placeholders.
+        self._instruction_parts = list(string.Formatter().parse(self._raw_instruction))
+        self._instruction_variables = list(
+            dict.fromkeys(
+                name for _, name, _, _ in self._instruction_parts if name is not None
+            )
+        )
+        # The clients import openai, which is slow, so they are imported once an agent is created.
+        # pylint: disable-next=import-outside-toplevel
+        from llmio.clients import BaseClient, AsyncOpenAI
+
         if isinstance(client, AsyncOpenAI):
             # Backward compatibility
             self._client = BaseClient(client=client)
@@ -146,14 +441,31 @@ class BaseAgent:
         self._instruction = textwrap.dedent(instruction).strip()
 
         self._graceful_errors = graceful_errors
+        self._tracer = tracer or tracing.Tracer()
+        self._metrics = metrics
+        self._stable_prefix = stable_prefix
+        self._prompt_cache_key = prompt_cache_key
+        self._tool_retriever = tool_retriever
+        self._minimize_schemas = minimize_schemas
+        self._tool_timeout_message = tool_timeout_message
+        self._stream_delivery = stream_delivery
+        self._cascade = cascade
+        # The instruction of stable prefix mode keeps the placeholders of the variables.
+        self._stable_instruction = "".join(
+            literal + ("" if name is None else f"{{{name}}}")
+            for literal, name, _, _ in self._instruction_parts
+        )
 
         self._tools: list[_Tool] = []
-        self._variables: dict[str, Callable] = {}
+        self._variables: dict[str, _Variable] = {}
+        self._result_stores: list[BlobStore] = []
 
-        self._prompt_inspectors: list[Callable] = []
-        self._output_inspectors: list[Callable] = []
-        self._message_callbacks: list[Callable] = []
+        self._prompt_inspectors: list[_Hook] = []
+        self._output_inspectors: list[_Hook] = []
+        self._message_callbacks: list[_Hook] = []
         self._stream_callbacks: list[Callable] = []
+        self._stop_conditions: list[Callable] = []
+        self._background_hooks: set[asyncio.Task] = set()
 
     async def _execute_variable(
         self, variable_name: str, context: _Context | None
@@ -161,7 +473,7 @@ class BaseAgent:
         """
         Executes a variable function by name.
         """
-        variable_function = self._variables[variable_name]
+        variable_function = self._variables[variable_name].function
 
         kwargs = {}
         if _CONTEXT_ARG_NAME in signature(variable_function).parameters:
@@ -173,24 +485,95 @@ class BaseAgent:
             else variable_function(**kwargs)
         )
 
-    async def _get_instruction(self, context: _Context | None) -> str:
+    async def _resolve_variable(
+        self, variable_name: str, context: _Context | None
+    ) -> Any:
         """
-        Returns the agent's instruction with variables replaced.
+        Returns the value of a variable, from its cache if possible.
+        """
+        variable = self._variables[variable_name]
+        if variable.cache == "speak":
+            return await self._execute_variable(variable_name, context)
+
+        key = variable.cache_key(context)
+        cached, value = variable.get(key)
+        if cached:
+            if self._metrics is not None:
+                self._metrics.cache_hits.inc(cache="variable")
+            return value
+        value = await self._execute_variable(variable_name, context)
+        variable.set(key, value)
+        return value
+
+    async def _get_variable_values(self, context: _Context | None) -> dict[str, Any]:
+        """
+        Returns the values of the variables in the instruction.
+        Independent variables are evaluated concurrently.
         """
-        variables = re.findall(r"\{(\w+)\}", self._raw_instruction)
-        for variable in variables:
+        for variable in self._instruction_variables:
             if variable not in self._variables:
                 raise errors.MissingVariable(f"Variable '{variable}' is not defined.")
 
-        variable_values = {
-            variable: await self._execute_variable(variable, context)
-            for variable in variables
-        }
-        instruction = self._raw_instruction.format(**variable_values)
-        return instruction
+        values = await asyncio.gather(
+            *[
+                self._resolve_variable(variable, context)
+                for variable in self._instruction_variables
+            ]
+        )
+        return dict(zip(self._instruction_variables, values))
+
+    @staticmethod
+    def _format_field(
+        value: Any, format_spec: str | None, conversion: str | None
+    ) -> str:
+        if conversion == "r":
+            value = repr(value)
+        elif conversion == "s":
+            value = str(value)
+        elif conversion == "a":
+            value = ascii(value)
+        return format(value, format_spec or "")
+
+    async def _get_instruction(self, context: _Context | None) -> str:
+        """
+        Returns the agent's instruction with variables replaced.
+        """
+        variable_values = await self._get_variable_values(context)
+
+        parts = []
+        for literal, name, format_spec, conversion in self._instruction_parts:
+            parts.append(literal)
+            if name is not None:
+                parts.append(
+                    self._format_field(variable_values[name], format_spec, conversion)
+                )
+        return "".join(parts)
 
     async def _get_system_prompt(self, context: _Context | None) -> T.SystemMessage:
-        return self._create_system_message(await self._get_instruction(context))
+        with self._tracer.span("llmio.instruction"):
+            if self._stable_prefix:
+                return self._create_system_message(self._stable_instruction)
+            return self._create_system_message(await self._get_instruction(context))
+
+    async def _get_variables_message(
+        self, context: _Context | None
+    ) -> T.SystemMessage | None:
+        """
+        In stable prefix mode, returns the message with the values of the variables,
+        which is sent after the history so that the prompt prefix does not change.
+        """
+        if not self._stable_prefix or not self._instruction_variables:
+            return None
+        with self._tracer.span("llmio.instruction"):
+            variable_values = await self._get_variable_values(context)
+        formats: dict[str, tuple[str | None, str | None]] = {}
+        for _, name, format_spec, conversion in self._instruction_parts:
+            if name is not None:
+                formats.setdefault(name, (format_spec, conversion))
+        lines = ["Current values of the variables in the instruction:"]
+        for name, value in variable_values.items():
+            lines.append(f"{name}: {self._format_field(value, *formats[name])}")
+        return self._create_system_message("\n".join(lines))
 
     def summary(self) -> str:
         """
@@ -199,6 +582,8 @@ class BaseAgent:
         lines = ["Tools:"]
         for tool in self._tools:
             lines.append(f"  - {tool.name}")
+            if tool.minimize:
+                lines.append(f"    Tokens saved: {tool.tokens_saved}")
             lines.append("    Schema:")
             lines.append(
                 textwrap.indent(pprint.pformat(tool.function_definition), "      ")
@@ -207,16 +592,40 @@ class BaseAgent:
         return "\n".join(lines)
 
     def tool(
-        self, tool_function: Callable | None = None, strict: bool = False
+        self,
+        tool_function: Callable | None = None,
+        strict: bool = False,
+        timeout: float | None = None,
+        result_policy: ResultPolicy | None = None,
+        tabular: bool = False,
     ) -> Callable:
         """
         Decorator to define a tool function.
+
+        Args:
+            strict: Whether to enable strict mode for the tool's arguments.
+            timeout: Seconds after which the tool is cancelled and the model is told
+                     that it timed out. Synchronous tools with a timeout run in a thread.
+            result_policy: How the result is converted to the tool message,
+                           such as `Truncate`, `Project` or `Spill`.
+                           The full result is sent if not set.
+            tabular: Whether lists of objects with the same fields are sent as a table
+                     of columns and rows, which saves repeating the field names.
         """
 
         def decorator(function: Callable) -> Callable:
             self._tools.append(
-                _Tool(function=function, strict=strict),
+                _Tool(
+                    function=function,
+                    strict=strict,
+                    minimize=self._minimize_schemas,
+                    timeout=timeout,
+                    result_policy=result_policy or ResultPolicy(),
+                    tabular=tabular,
+                ),
             )
+            if isinstance(result_policy, Spill):
+                self._register_result_store(result_policy.store)
             return function
 
         if tool_function is not None:
@@ -224,43 +633,153 @@ class BaseAgent:
 
         return decorator
 
-    def variable(self, function: Callable) -> Callable:
+    def _register_result_store(self, store: BlobStore) -> None:
+        """
+        Makes the results spilled to the store readable by the model,
+        through a `read_result` tool that is registered with the first store.
+        """
+        if any(existing is store for existing in self._result_stores):
+            return
+        self._result_stores.append(store)
+        if len(self._result_stores) > 1:
+            return
+
+        stores = self._result_stores
+
+        def read_result(handle: str, offset: int = 0, length: int = 4000) -> str:
+            """
+            Reads part of a large tool result that was stored under a handle.
+            """
+            for result_store in stores:
+                if handle in result_store:
+                    page = result_store.read(handle, offset, length)
+                    total = result_store.length(handle)
+                    return f"Characters {offset} to {offset + len(page)} of {total}:\n{page}"
+            return f"No stored result has the handle '{handle}'."
+
+        self._tools.append(_Tool(function=read_result, minimize=self._minimize_schemas))
+
+    def variable(
+        self,
+        variable_function: Callable | None = None,
+        cache: VariableCache = "speak",
+        ttl: float | None = None,
+        key: Callable[[Any], Hashable] | None = None,
+    ) -> Callable:
         """
         Decorator to define a variable function.
+
+        Args:
+            cache: How long the value of the variable is reused.
+                   "speak": The variable is evaluated once per interaction.
+                   "context": The value is cached per context, see `key`.
+                   "global": The value is shared by all interactions.
+            ttl: Seconds a cached value is reused. Cached values never expire if not set.
+            key: A function that returns the cache key for a context.
+                 Defaults to the context itself, which then must be hashable.
         """
-        self._variables[function.__name__] = function
-        return function
 
-    def inspect_prompt(self, function: Callable) -> Callable:
+        def decorator(function: Callable) -> Callable:
+            self._variables[function.__name__] = _Variable(
+                function=function, cache=cache, ttl=ttl, key=key
+            )
+            return function
+
+        if variable_function is not None:
+            return decorator(variable_function)
+
+        return decorator
+
+    @staticmethod
+    def _hook_decorator(
+        hooks: list[_Hook],
+        function: Callable | None,
+        concurrent: bool,
+        background: bool,
+        validate: Callable[[Callable], None] | None = None,
+    ) -> Callable:
+        if concurrent and background:
+            raise ValueError("A hook can be either concurrent or background, not both.")
+
+        def decorator(function: Callable) -> Callable:
+            if validate is not None:
+                validate(function)
+            hooks.append(
+                _Hook(function=function, concurrent=concurrent, background=background)
+            )
+            return function
+
+        if function is not None:
+            return decorator(function)
+
+        return decorator
+
+    def inspect_prompt(
+        self,
+        function: Callable | None = None,
+        concurrent: bool = False,
+        background: bool = False,
+    ) -> Callable:
         """
         Decorator to define a prompt inspector.
         The prompt inspector is called with the full prompt.
+
+        Args:
+            concurrent: Whether the inspector runs concurrently with the other prompt inspectors.
+            background: Whether the inspector runs in the background, without delaying the interaction.
+                        Its failures are logged instead of raised. See `flush`.
         """
-        self._prompt_inspectors.append(function)
-        return function
+        return self._hook_decorator(
+            self._prompt_inspectors, function, concurrent, background
+        )
 
-    def inspect_output(self, function: Callable) -> Callable:
+    def inspect_output(
+        self,
+        function: Callable | None = None,
+        concurrent: bool = False,
+        background: bool = False,
+    ) -> Callable:
         """
         Decorator to define an output inspector.
         The output inspector is called with the full generated message, including tool calls.
+
+        Args:
+            concurrent: Whether the inspector runs concurrently with the other output inspectors.
+            background: Whether the inspector runs in the background, without delaying the interaction.
+                        Its failures are logged instead of raised. See `flush`.
         """
-        self._output_inspectors.append(function)
-        return function
+        return self._hook_decorator(
+            self._output_inspectors, function, concurrent, background
+        )
 
-    def on_message(self, function: Callable) -> Callable:
+    def on_message(
+        self,
+        function: Callable | None = None,
+        concurrent: bool = False,
+        background: bool = False,
+    ) -> Callable:
         """
         Decorator to define a message callback.
+
+        Args:
+            concurrent: Whether the callback runs concurrently with the other message callbacks.
+            background: Whether the callback runs in the background, without delaying the interaction.
+                        Its failures are logged instead of raised. See `flush`.
         """
-        params = set(signature(function).parameters.keys())
-        if params not in [
-            {"message"},
-            {_CONTEXT_ARG_NAME, "message"},
-        ]:
-            raise ValueError(
-                "The message inspector must accept only 'message' or '_context, message' as arguments."
-            )
-        self._message_callbacks.append(function)
-        return function
+
+        def validate(function: Callable) -> None:
+            params = set(signature(function).parameters.keys())
+            if params not in [
+                {"message"},
+                {_CONTEXT_ARG_NAME, "message"},
+            ]:
+                raise ValueError(
+                    "The message inspector must accept only 'message' or '_context, message' as arguments."
+                )
+
+        return self._hook_decorator(
+            self._message_callbacks, function, concurrent, background, validate
+        )
 
     def on_stream(self, function: Callable) -> Callable:
         """
@@ -277,20 +796,114 @@ class BaseAgent:
         self._stream_callbacks.append(function)
         return function
 
+    def stop_when(self, function: Callable) -> Callable:
+        """
+        Decorator to define a stop condition for streamed messages.
+        The stop condition is called with the message content generated so far,
+        and the stream is closed as soon as it returns True.
+        The partial message is kept in the history.
+        Stream callbacks can also stop the stream by raising `StopStream`.
+        """
+        params = set(signature(function).parameters.keys())
+        if params not in [
+            {"content"},
+            {_CONTEXT_ARG_NAME, "content"},
+        ]:
+            raise ValueError(
+                "The stop condition must accept only 'content' or '_context, content' as arguments."
+            )
+        self._stop_conditions.append(function)
+        return function
+
+    async def _check_stop_conditions(
+        self, content: str, context: _Context | None
+    ) -> None:
+        """
+        Raises `StopStream` if a stop condition is met.
+        """
+        for condition in self._stop_conditions:
+            kwargs: dict[str, str | _Context | None] = {"content": content}
+            if _CONTEXT_ARG_NAME in signature(condition).parameters:
+                kwargs[_CONTEXT_ARG_NAME] = context
+            stop = (
+                await condition(**kwargs)
+                if iscoroutinefunction(condition)
+                else condition(**kwargs)
+            )
+            if stop:
+                raise errors.StopStream()
+
+    def _run_in_background(self, hook: _Hook, *args: Any, **kwargs: Any) -> None:
+        task = asyncio.create_task(hook(*args, **kwargs))
+        self._background_hooks.add(task)
+        task.add_done_callback(partial(self._on_background_hook_done, hook))
+
+    def _on_background_hook_done(self, hook: _Hook, task: asyncio.Task) -> None:
+        self._background_hooks.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        name = hook.function.__name__
+        _logger.error("Background hook %s failed", name, exc_info=task.exception())
+        if self._metrics is not None:
+            self._metrics.hook_errors.inc(hook=name)
+
+    async def _run_hooks(
+        self,
+        hooks: list[_Hook],
+        span_name: str,
+        context: _Context | None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Runs hooks in order, except for concurrent hooks, which run together with them,
+        and background hooks, which are only started.
+        """
+        if not hooks:
+            return
+        with self._tracer.span(span_name):
+            sequential = []
+            concurrent = []
+            for hook in hooks:
+                if hook.background:
+                    self._run_in_background(hook, context, *args, **kwargs)
+                elif hook.concurrent:
+                    concurrent.append(hook(context, *args, **kwargs))
+                else:
+                    sequential.append(hook)
+
+            async def run_sequential() -> None:
+                for hook in sequential:
+                    await hook(context, *args, **kwargs)
+
+            if concurrent:
+                await asyncio.gather(run_sequential(), *concurrent)
+            else:
+                await run_sequential()
+
+    async def flush(self, timeout: float | None = None) -> None:
+        """
+        Waits for the hooks running in the background to finish.
+        Call it before shutting down, so that their work is not lost.
+
+        Args:
+            timeout: Seconds to wait, after which the remaining hooks are cancelled.
+        """
+        if not self._background_hooks:
+            return
+        _, pending = await asyncio.wait(set(self._background_hooks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
     async def _run_prompt_inspectors(
         self, prompt: list[T.Message], context: _Context | None
     ) -> None:
         """
         Runs all prompt inspectors with the full prompt prior to sending it to the OpenAI API.
         """
-        for inspector in self._prompt_inspectors:
-            kwargs = {}
-            if _CONTEXT_ARG_NAME in signature(inspector).parameters:
-                kwargs[_CONTEXT_ARG_NAME] = context
-            if iscoroutinefunction(inspector):
-                await inspector(prompt, **kwargs)
-            else:
-                inspector(prompt, **kwargs)
+        await self._run_hooks(
+            self._prompt_inspectors, "llmio.prompt_inspectors", context, prompt
+        )
 
     async def _run_output_inspectors(
         self, content: T.AssistantMessage, context: _Context | None
@@ -298,14 +911,9 @@ class BaseAgent:
         """
         Runs all output inspectors with the full generated message, including tool calls.
         """
-        for inspector in self._output_inspectors:
-            kwargs = {}
-            if _CONTEXT_ARG_NAME in signature(inspector).parameters:
-                kwargs[_CONTEXT_ARG_NAME] = context
-            if iscoroutinefunction(inspector):
-                await inspector(content, **kwargs)
-            else:
-                inspector(content, **kwargs)
+        await self._run_hooks(
+            self._output_inspectors, "llmio.output_inspectors", context, content
+        )
 
     def _parse_message_inspector_content(self, message: str) -> Any:
         """
@@ -319,17 +927,14 @@ class BaseAgent:
         """
         Runs all message callbacks with the generated message content.
         """
-        for callback in self._message_callbacks:
-            kwargs: dict[str, str | _Context | None] = {
-                "message": self._parse_message_inspector_content(content),
-            }
-            if _CONTEXT_ARG_NAME in signature(callback).parameters:
-                kwargs[_CONTEXT_ARG_NAME] = context
-
-            if iscoroutinefunction(callback):
-                await callback(**kwargs)
-            else:
-                callback(**kwargs)
+        if not self._message_callbacks:
+            return
+        await self._run_hooks(
+            self._message_callbacks,
+            "llmio.message_callbacks",
+            context,
+            message=self._parse_message_inspector_content(content),
+        )
 
     async def _run_stream_inspectors(
         self, delta: str, context: _Context | None
@@ -349,6 +954,20 @@ class BaseAgent:
             else:
                 callback(**kwargs)
 
+    def _deliver_stream(
+        self, context: _Context | None
+    ) -> AsyncContextManager[Callable[[str], Awaitable[None]]]:
+        """
+        Returns a context manager that provides the function to pass stream deltas to.
+        """
+        run_callbacks = partial(self._run_stream_inspectors, context=context)
+        if self._stream_delivery is None or not self._stream_callbacks:
+            return nullcontext(run_callbacks)
+        on_drop = None
+        if self._metrics is not None:
+            on_drop = self._metrics.stream_chars_dropped.inc
+        return self._stream_delivery.start(run_callbacks, on_drop=on_drop)
+
     @staticmethod
     def _parse_completion(
         completion: models.ChatCompletionMessage,
@@ -376,6 +995,14 @@ class BaseAgent:
 
     @property
     def _tool_definitions(self) -> list[T.Tool]:
+        if self._stable_prefix:
+            return [
+                T.Tool(
+                    function=_sorted_schema(tool.function_definition),
+                    type="function",
+                )
+                for tool in sorted(self._tools, key=lambda tool: tool.name)
+            ]
         return [
             T.Tool(
                 function=tool.function_definition,
@@ -384,38 +1011,146 @@ class BaseAgent:
             for tool in self._tools
         ]
 
+    async def _select_tool_definitions(self, messages: list[T.Message]) -> list[T.Tool]:
+        """
+        Returns the definitions of the tools to send with a request.
+        """
+        definitions = self._tool_definitions
+        if self._tool_retriever is None:
+            return definitions
+        with self._tracer.span("llmio.tool_retrieval") as span:
+            selected = await self._tool_retriever.select(definitions, messages)
+            span.set_attribute("llmio.tools.selected", len(selected))
+        if self._result_stores:
+            # Spilled results tell the model to call read_result, so it is always sent.
+            names = {tool["function"]["name"] for tool in selected} | {"read_result"}
+            selected = [
+                tool for tool in definitions if tool["function"]["name"] in names
+            ]
+        return selected
+
+    def _request_options(self, timeout: float | None) -> dict[str, Any]:
+        """
+        Optional arguments of completion requests, only passed when set,
+        so that custom clients without support for them keep working.
+        """
+        options: dict[str, Any] = {}
+        if self._prompt_cache_key is not None:
+            options["prompt_cache_key"] = self._prompt_cache_key
+        if timeout is not None:
+            options["timeout"] = timeout
+        return options
+
     @property
     def response_format(self) -> ResponseFormatJSONSchema | None:
         return None
 
+    @property
+    def _first_model(self) -> str:
+        """
+        The model that is requested first.
+        """
+        return self._cascade.models[0] if self._cascade is not None else self._model
+
+    def _is_valid_completion(
+        self, completion: models.ChatCompletion, tools: list[T.Tool]
+    ) -> bool:
+        """
+        Returns whether the tool calls of a completion can be executed,
+        and whether its structured output can be parsed.
+        """
+        # pylint: disable-next=import-outside-toplevel
+        from llmio.racing import is_valid_completion
+
+        if not is_valid_completion(completion, tools, self.response_format):
+            return False
+        tool_calls: list[Any] = completion.choices[0].message.tool_calls or []
+        for tool_call in tool_calls:
+            try:
+                self._get_tool_by_name(tool_call.function.name).parse_args(
+                    tool_call.function.arguments
+                )
+            except (ValueError, pydantic.ValidationError):
+                return False
+        return True
+
     async def _get_completion(
         self,
         messages: list[T.Message],
+        timeout: float | None = None,
+        turn: S.TurnStats | None = None,
     ) -> models.ChatCompletion:
         """
         Sends the prompt to the OpenAI API and returns the completion.
+        With a cascade, the model that answered and the escalated attempts are recorded in `turn`.
         """
-        return await self._client.get_chat_completion(
-            model=self._model,
-            messages=messages,
-            tools=self._tool_definitions,
-            response_format=self.response_format,
+        tools = await self._select_tool_definitions(messages)
+
+        async def request(model: str) -> models.ChatCompletion:
+            token = S.current_turn.set(turn)
+            try:
+                return await self._client.get_chat_completion(
+                    model=model,
+                    messages=messages,
+                    tools=tools,
+                    response_format=self.response_format,
+                    **self._request_options(timeout),
+                )
+            finally:
+                S.current_turn.reset(token)
+
+        if self._cascade is None:
+            return await request(self._model)
+        model, completion, escalations = await self._cascade.run(
+            request, validate=partial(self._is_valid_completion, tools=tools)
         )
+        for escalation in escalations:
+            if self._metrics is not None:
+                self._metrics.cascade_escalations.inc(
+                    model=escalation.model, reason=escalation.reason
+                )
+            if turn is not None:
+                attempt = S.TurnStats(
+                    model=escalation.model, latency=escalation.latency
+                )
+                if escalation.completion is not None:
+                    attempt.record_usage(escalation.completion.usage)
+                turn.escalations.append(attempt)
+        if turn is not None:
+            turn.model = model
+        if self._metrics is not None:
+            self._metrics.cascade_answers.inc(model=model)
+        return completion
 
     async def _get_completion_stream(
         self,
         messages: list[T.Message],
-    ) -> AsyncIterator[models.ChatCompletionChunk]:
+        timeout: float | None = None,
+        turn: S.TurnStats | None = None,
+    ) -> AsyncGenerator[models.ChatCompletionChunk, None]:
         """
         Sends the prompt to the OpenAI API and returns the completion.
         """
-        async for chunk in self._client.stream_chat_completion(
-            model=self._model,
-            messages=messages,
-            tools=self._tool_definitions,
-            response_format=self.response_format,
-        ):
-            yield chunk
+        async with aclosing(
+            self._client.stream_chat_completion(
+                model=self._model,
+                messages=messages,
+                tools=await self._select_tool_definitions(messages),
+                response_format=self.response_format,
+                **self._request_options(timeout),
+            )
+        ) as chunks:
+            while True:
+                # The turn is only set while the client runs, as the consumer of
+                # this stream may resume it from another context.
+                token = S.current_turn.set(turn)
+                try:
+                    chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    S.current_turn.reset(token)
+                yield chunk
 
     def _create_user_message(self, message: str) -> T.UserMessage:
         return T.UserMessage(
@@ -442,11 +1177,19 @@ class BaseAgent:
         history: list[T.Message] | None = None,
         _context: _Context | None = None,
         stream: bool = False,
+        deadline: float | None = None,
     ) -> AgentResponse:
         """
         A full interaction loop with the agent.
         If tool calls are present in the completion, they are executed, and the loop continues.
+        If the interaction takes longer than `deadline` seconds, the pending completion
+        request or tools are cancelled and `DeadlineExceeded` is raised.
+        Synchronous tools run in a worker thread under a deadline, which is no longer
+        waited for, but runs to completion in the background.
         """
+        if stream and self._cascade is not None:
+            # Streamed text reaches the callbacks before it could be escalated.
+            raise ValueError("Agents with a cascade do not support streaming.")
         if not history:
             history = []
         else:
@@ -455,11 +1198,77 @@ class BaseAgent:
 
         new_messages: list[str] = []
 
-        async for message, history in self._iterate(
-            history=history, context=_context, stream=stream
-        ):
-            new_messages.append(message)
-        return AgentResponse(messages=new_messages, history=history)
+        if self._metrics is not None:
+            self._metrics.speaks_in_flight.inc()
+        try:
+            with self._tracer.span(
+                "llmio.speak",
+                {"gen_ai.request.model": self._first_model, "llmio.stream": stream},
+            ) as span:
+                state = _SpeakState(
+                    deadline=None if deadline is None else time.monotonic() + deadline
+                )
+
+                async def collect(prompt: list[T.Message]) -> list[T.Message]:
+                    result = prompt
+                    async for content, result in self._iterate(
+                        history=prompt, context=_context, stream=stream, state=state
+                    ):
+                        new_messages.append(content)
+                    return result
+
+                if deadline is None:
+                    history = await collect(history)
+                else:
+                    try:
+                        # Cancels the pending completion request, stream or tools on timeout.
+                        history = await asyncio.wait_for(collect(history), deadline)
+                    except asyncio.TimeoutError as e:
+                        if state.remaining():
+                            raise
+                        raise errors.DeadlineExceeded(
+                            f"The interaction did not complete within {deadline} seconds."
+                        ) from e
+                span.set_attribute("llmio.rounds", state.rounds)
+                span.set_attribute("llmio.retries", state.retries)
+        finally:
+            if self._metrics is not None:
+                self._metrics.speaks_in_flight.dec()
+        return AgentResponse(messages=new_messages, history=history, stats=state.stats)
+
+    async def _execute_tool(
+        self,
+        tool: _Tool,
+        params: pydantic.BaseModel,
+        context: _Context | None,
+        state: _SpeakState,
+    ) -> str:
+        with self._tracer.span("llmio.tool", {"gen_ai.tool.name": tool.name}):
+            if self._metrics is not None:
+                self._metrics.tools_in_flight.inc(tool=tool.name)
+            start = time.perf_counter()
+            # Under a deadline, synchronous tools run in a thread so that it can stop waiting.
+            execution = tool.execute(
+                params, context=context, thread=state.deadline is not None
+            )
+            try:
+                if tool.timeout is None:
+                    return await execution
+                return await asyncio.wait_for(execution, tool.timeout)
+            except asyncio.TimeoutError:
+                if tool.timeout is None or time.perf_counter() - start < tool.timeout:
+                    raise
+                if self._metrics is not None:
+                    self._metrics.tool_timeouts.inc(tool=tool.name)
+                return self._tool_timeout_message.format(
+                    tool=tool.name, timeout=tool.timeout
+                )
+            finally:
+                duration = time.perf_counter() - start
+                state.stats.tools.append(S.ToolStats(name=tool.name, duration=duration))
+                if self._metrics is not None:
+                    self._metrics.tools_in_flight.dec(tool=tool.name)
+                    self._metrics.tool_latency.observe(duration, tool=tool.name)
 
     def _get_tool_by_name(self, name: str) -> _Tool:
         for tool in self._tools:
@@ -483,6 +1292,7 @@ class BaseAgent:
                     assert tool_call_delta.function is not None
                     assert tool_call_delta.function.name is not None
                     accumulated.tool_calls = [
+                        *(accumulated.tool_calls or []),
                         models.ToolCall.construct(
                             id=tool_call_delta.id,
                             type="function",
@@ -490,7 +1300,7 @@ class BaseAgent:
                                 name=tool_call_delta.function.name,
                                 arguments=tool_call_delta.function.arguments or "",
                             ),
-                        )
+                        ),
                     ]
                 elif tool_call_delta.function.arguments is not None:
                     assert tool_call_delta.function
@@ -511,36 +1321,117 @@ class BaseAgent:
         context: _Context | None,
         system_message: T.SystemMessage | None = None,
         stream: bool = False,
+        state: _SpeakState | None = None,
+        variables_message: T.SystemMessage | None = None,
     ) -> AsyncIterator[tuple[str, list[T.Message]]]:
         """
         The main loop that sends the prompt to the OpenAI API and processes the response.
         """
-        system_message = system_message or await self._get_system_prompt(context)
-        prompt = [
+        state = state or _SpeakState()
+        state.rounds += 1
+        if system_message is None:
+            system_message = await self._get_system_prompt(context)
+            variables_message = await self._get_variables_message(context)
+        prompt: list[T.Message] = [
             system_message,
             *history,
         ]
+        if variables_message is not None:
+            prompt.append(variables_message)
         await self._run_prompt_inspectors(prompt, context)
 
-        if stream:
-            generated_message = models.ChatCompletionMessage.construct(
-                role="assistant",
-                content="",
-            )
-            async for chunk in self._get_completion_stream(
-                messages=prompt,
-            ):
-                delta_content, generated_message = self._parse_chunk(
-                    generated_message, chunk
-                )
-                if delta_content:
-                    await self._run_stream_inspectors(delta_content, context=context)
-
-        else:
-            completion = await self._get_completion(
-                messages=prompt,
-            )
-            generated_message = completion.choices[0].message
+        with self._tracer.span(
+            "llmio.completion",
+            {
+                "gen_ai.request.model": self._first_model,
+                "llmio.stream": stream,
+                "llmio.round": state.rounds,
+                "llmio.retries": state.retries,
+            },
+        ) as span:
+            turn = S.TurnStats(model=self._first_model)
+            start = time.perf_counter()
+            # Errors of tool call arguments found while streaming, by tool call id.
+            argument_errors: dict[str, str] = {}
+            try:
+                if stream:
+                    generated_message = models.ChatCompletionMessage.construct(
+                        role="assistant",
+                        content="",
+                    )
+                    usage = None
+                    tool_call_checker = _ToolCallChecker(self._tools, argument_errors)
+                    try:
+                        async with (
+                            self._deliver_stream(context) as deliver,
+                            aclosing(
+                                self._get_completion_stream(
+                                    messages=prompt,
+                                    timeout=state.remaining(),
+                                    turn=turn,
+                                )
+                            ) as chunks,
+                        ):
+                            async for chunk in chunks:
+                                if chunk.usage is not None:
+                                    usage = chunk.usage
+                                delta_content, generated_message = self._parse_chunk(
+                                    generated_message, chunk
+                                )
+                                if turn.time_to_first_token is None and (
+                                    delta_content or generated_message.tool_calls
+                                ):
+                                    turn.time_to_first_token = (
+                                        time.perf_counter() - start
+                                    )
+                                if delta_content:
+                                    await deliver(delta_content)
+                                    await self._check_stop_conditions(
+                                        generated_message.content or "", context
+                                    )
+                                if generated_message.tool_calls:
+                                    tool_call_checker.check(
+                                        generated_message.tool_calls
+                                    )
+                    except _InvalidToolCall:
+                        # The tool calls are validated below, which raises or starts
+                        # the graceful retry without waiting for the rest of the stream.
+                        span.set_attribute("llmio.invalid_tool_call", True)
+                    except errors.StopStream:
+                        # The partial message is kept. Incomplete tool calls are dropped,
+                        # as the history must not contain tool calls without results.
+                        turn.stopped = True
+                        generated_message.tool_calls = None
+                        span.set_attribute("llmio.stopped", True)
+
+                else:
+                    completion = await self._get_completion(
+                        messages=prompt,
+                        timeout=state.remaining(),
+                        turn=turn,
+                    )
+                    span.set_attribute("gen_ai.response.model", turn.model)
+                    generated_message = completion.choices[0].message
+                    usage = completion.usage
+            except asyncio.CancelledError:
+                # Interactions cancelled by their deadline still report the time spent waiting.
+                turn.latency = time.perf_counter() - start
+                if self._metrics is not None:
+                    self._metrics.record_turn(turn)
+                raise
+            turn.latency = time.perf_counter() - start
+            turn.record_usage(usage)
+            state.stats.turns.append(turn)
+            if self._metrics is not None:
+                self._metrics.record_turn(turn)
+            for key, value in {
+                "gen_ai.usage.input_tokens": turn.prompt_tokens,
+                "gen_ai.usage.output_tokens": turn.completion_tokens,
+                "llmio.usage.cached_tokens": turn.cached_tokens,
+                "llmio.time_to_first_token": turn.time_to_first_token,
+            }.items():
+                if value is not None:
+                    span.set_attribute(key, value)
         parsed_response = self._parse_completion(generated_message)
         await self._run_output_inspectors(parsed_response, context)
 
@@ -553,14 +1444,26 @@ class BaseAgent:
         if not generated_message.tool_calls:
             return
 
+        state.stats.tool_rounds += 1
         awaitables = []
         awaited_tool_calls = []
         for tool_call in generated_message.tool_calls:
             try:
-                tool = self._get_tool_by_name(tool_call.function.name)
-                params = tool.parse_args(tool_call.function.arguments)
+                with self._tracer.span(
+                    "llmio.validate", {"gen_ai.tool.name": tool_call.function.name}
+                ):
+                    tool = self._get_tool_by_name(tool_call.function.name)
+                    params = tool.parse_args(tool_call.function.arguments)
             except (ValueError, pydantic.ValidationError) as e:
                 error_message: str
+                if self._metrics is not None:
+                    self._metrics.bad_tool_calls.inc(
+                        reason=(
+                            "invalid_arguments"
+                            if isinstance(e, pydantic.ValidationError)
+                            else "unknown_tool"
+                        )
+                    )
                 if not self._graceful_errors:
                     match e:
                         case pydantic.ValidationError():
@@ -575,7 +1478,8 @@ class BaseAgent:
                             assert_never(e)
 
                 error_message = (
-                    f"The argument validation failed for the function call to {tool.name}: {e}"
+                    "The argument validation failed for the function call to "
+                    f"{tool.name}: {argument_errors.get(tool_call.id, e)}"
                     if isinstance(e, pydantic.ValidationError)
                     else str(e)
                 )
@@ -586,9 +1490,14 @@ class BaseAgent:
                         content=error_message,
                     )
                 )
+                state.retries += 1
+                if self._metrics is not None:
+                    self._metrics.retries.inc(model=turn.model)
                 continue
 
-            awaitables.append(tool.execute(params, context=context))
+            awaitables.append(
+                self._execute_tool(tool, params, context=context, state=state)
+            )
             awaited_tool_calls.append(tool_call)
 
         tool_results = await asyncio.gather(*awaitables)
@@ -605,6 +1514,8 @@ class BaseAgent:
             context=context,
             system_message=system_message,
             stream=stream,
+            state=state,
+            variables_message=variables_message,
         ):
             yield ans, hist
 
@@ -616,9 +1527,37 @@ class Agent(BaseAgent):
         history: list[T.Message] | None = None,
         _context: _Context | None = None,
         stream: bool = False,
+        deadline: float | None = None,
     ) -> AgentResponse:
         return await self._speak(
-            message, history=history, _context=_context, stream=stream
+            message,
+            history=history,
+            _context=_context,
+            stream=stream,
+            deadline=deadline,
+        )
+
+    def speak_sync(
+        self,
+        message: str,
+        history: list[T.Message] | None = None,
+        _context: _Context | None = None,
+        stream: bool = False,
+        deadline: float | None = None,
+    ) -> AgentResponse:
+        """
+        Blocking version of `speak`, for synchronous code.
+        Runs on an event loop thread shared by the process,
+        so the connections of the client are reused across calls.
+        """
+        return sync.run_sync(
+            self.speak(
+                message,
+                history=history,
+                _context=_context,
+                stream=stream,
+                deadline=deadline,
+            )
         )
 
 
@@ -630,12 +1569,28 @@ class StructuredAgent(BaseAgent, Generic[_ResponseFormatT]):
         response_format: Type[_ResponseFormatT],
         model: str = "gpt-4o-mini",
         graceful_errors: bool = False,
+        tracer: tracing.Tracer | None = None,
+        metrics: Metrics | None = None,
+        stable_prefix: bool = False,
+        prompt_cache_key: str | None = None,
+        tool_retriever: ToolRetriever | None = None,
+        minimize_schemas: bool = False,
+        tool_timeout_message: str = _TOOL_TIMEOUT_MESSAGE,
+        cascade: Cascade | None = None,
     ):
         super().__init__(
             instruction=instruction,
             client=client,
             model=model,
             graceful_errors=graceful_errors,
+            tracer=tracer,
+            metrics=metrics,
+            stable_prefix=stable_prefix,
+            prompt_cache_key=prompt_cache_key,
+            tool_retriever=tool_retriever,
+            minimize_schemas=minimize_schemas,
+            tool_timeout_message=tool_timeout_message,
+            cascade=cascade,
         )
         self._response_format = response_format
 
@@ -644,9 +1599,12 @@ class StructuredAgent(BaseAgent, Generic[_ResponseFormatT]):
         message: str,
         history: list[T.Message] | None = None,
         _context: _Context | None = None,
+        deadline: float | None = None,
     ) -> StructuredAgentResponse[_ResponseFormatT]:
         assert self._response_format is not None
-        response = await self._speak(message, history=history, _context=_context)
+        response = await self._speak(
+            message, history=history, _context=_context, deadline=deadline
+        )
         parsed_messages = [
             self._response_format.model_validate_json(message)
             for message in response.messages
@@ -654,14 +1612,46 @@ class StructuredAgent(BaseAgent, Generic[_ResponseFormatT]):
         return StructuredAgentResponse(
             messages=parsed_messages,
             history=response.history,
+            stats=response.stats,
+        )
+
+    def speak_sync(
+        self,
+        message: str,
+        history: list[T.Message] | None = None,
+        _context: _Context | None = None,
+        deadline: float | None = None,
+    ) -> StructuredAgentResponse[_ResponseFormatT]:
+        """
+        Blocking version of `speak`, for synchronous code.
+        Runs on an event loop thread shared by the process,
+        so the connections of the client are reused across calls.
+        """
+        return sync.run_sync(
+            self.speak(message, history=history, _context=_context, deadline=deadline)
         )
 
     @property
     def response_format(self) -> ResponseFormatJSONSchema:
+        # Deferred, since the parsing helpers are only needed by structured agents.
+        from openai.lib._parsing import (  # pylint: disable=import-outside-toplevel
+            type_to_response_format_param,
+        )
+
         schema: ResponseFormatJSONSchema = type_to_response_format_param(  # type: ignore
             self._response_format
         )
         return schema
 
+    def _is_valid_completion(
+        self, completion: models.ChatCompletion, tools: list[T.Tool]
+    ) -> bool:
+        # pylint: disable-next=import-outside-toplevel
+        from llmio.racing import is_valid_completion
+
+        return super()._is_valid_completion(completion, tools) and is_valid_completion(
+            completion, tools, self.response_format, self._response_format
+        )
+
     def _parse_message_inspector_content(self, message: str) -> _ResponseFormatT:
         return self._response_format.model_validate_json(message)
@@ -0,0 +1,13 @@
+from .server import MockServer, Step, Fixed, Uniform, LogNormal
+from .runner import BenchConfig, BenchResult, run
+
+__all__ = [
+    "MockServer",
+    "Step",
+    "Fixed",
+    "Uniform",
+    "LogNormal",
+    "BenchConfig",
+    "BenchResult",
+    "run",
+]
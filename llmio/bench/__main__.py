@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+
+from llmio.bench.runner import BenchConfig, run
+from llmio.bench.server import Fixed, LogNormal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m llmio.bench",
+        description="Benchmarks llmio agents against a local OpenAI-compatible mock server.",
+    )
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument(
+        "--turns", type=int, default=3, help="speak() calls per session"
+    )
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--raw", action="store_true", help="use the raw client mode")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="median server latency in seconds"
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.0,
+        help="sigma of a log-normal latency distribution; fixed latency if 0",
+    )
+    parser.add_argument("--chunks-per-second", type=float, default=None)
+    args = parser.parse_args()
+
+    config = BenchConfig(
+        sessions=args.sessions,
+        turns=args.turns,
+        concurrency=args.concurrency,
+        tool_rounds=args.tool_rounds,
+        stream=args.stream,
+        raw=args.raw,
+        latency=(
+            LogNormal(args.latency, args.latency_sigma)
+            if args.latency_sigma
+            else Fixed(args.latency)
+        ),
+        chunks_per_second=args.chunks_per_second,
+    )
+    print(asyncio.run(run(config)).report())
+
+
+if __name__ == "__main__":
+    main()
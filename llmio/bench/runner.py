@@ -0,0 +1,183 @@
+import asyncio
+import multiprocessing
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any
+
+from llmio.agent import Agent
+from llmio.clients import OpenAIClient
+from llmio.types import Message
+from llmio.bench.server import Distribution, Fixed, MockServer, Step
+
+
+@dataclass
+class BenchConfig:
+    sessions: int = 100
+    turns: int = 3
+    concurrency: int = 20
+    tool_rounds: int = 1
+    stream: bool = False
+    raw: bool = False
+    latency: Distribution = field(default_factory=lambda: Fixed(0.0))
+    chunks_per_second: float | None = None
+    reply: str = "This is a mocked reply from the benchmark server."
+
+
+@dataclass
+class BenchResult:
+    speaks: int
+    duration: float
+    latencies: list[float]
+    cpu_time: float
+    memory_per_session: float
+
+    @property
+    def speaks_per_second(self) -> float:
+        return self.speaks / self.duration
+
+    def _percentile(self, percent: int) -> float | None:
+        # quantiles() needs at least two samples.
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else None
+        # The inclusive method keeps percentiles within the observed latencies.
+        quantiles = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return quantiles[percent - 1]
+
+    @property
+    def p50(self) -> float | None:
+        return self._percentile(50)
+
+    @property
+    def p99(self) -> float | None:
+        return self._percentile(99)
+
+    @property
+    def cpu_per_turn(self) -> float:
+        return self.cpu_time / self.speaks
+
+    def report(self) -> str:
+        return "\n".join(
+            [
+                f"speaks:             {self.speaks}",
+                f"speaks/s:           {self.speaks_per_second:.1f}",
+                f"p50 latency:        {_milliseconds(self.p50)}",
+                f"p99 latency:        {_milliseconds(self.p99)}",
+                f"CPU per turn:       {self.cpu_per_turn * 1000:.3f} ms",
+                f"memory per session: {self.memory_per_session / 1024:.1f} KiB",
+            ]
+        )
+
+
+def _milliseconds(seconds: float | None) -> str:
+    return "n/a" if seconds is None else f"{seconds * 1000:.2f} ms"
+
+
+def _script(config: BenchConfig) -> list[Step]:
+    tool_steps = [
+        Step(tool_calls=[("lookup", {"query": f"query {i}"})])
+        for i in range(config.tool_rounds)
+    ]
+    return [*tool_steps, Step(content=config.reply)]
+
+
+def _serve(config: BenchConfig, connection: Connection) -> None:
+    async def serve() -> None:
+        server = MockServer(
+            script=_script(config),
+            latency=config.latency,
+            chunks_per_second=config.chunks_per_second,
+        )
+        await server.start()
+        connection.send(server.port)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def _agent(config: BenchConfig, url: str) -> Agent:
+    agent = Agent(
+        instruction="You are a benchmark agent.",
+        client=OpenAIClient(api_key="bench", base_url=url, raw=config.raw),
+    )
+
+    @agent.tool
+    def lookup(query: str) -> str:
+        return f"Result for {query}"
+
+    return agent
+
+
+async def _session(
+    agent: Agent,
+    config: BenchConfig,
+    semaphore: asyncio.Semaphore,
+    latencies: list[float],
+) -> list[Message]:
+    history: list[Message] = []
+    async with semaphore:
+        for turn in range(config.turns):
+            start = time.perf_counter()
+            response = await agent.speak(
+                f"Message {turn}", history=history, stream=config.stream
+            )
+            latencies.append(time.perf_counter() - start)
+            history = response.history
+    return history
+
+
+async def _run_sessions(
+    agent: Agent, config: BenchConfig, latencies: list[float]
+) -> list[Any]:
+    semaphore = asyncio.Semaphore(config.concurrency)
+    return await asyncio.gather(
+        *[_session(agent, config, semaphore, latencies) for _ in range(config.sessions)]
+    )
+
+
+async def run(config: BenchConfig) -> BenchResult:
+    """
+    Runs the benchmark against a mock server in a separate process,
+    so that the measured CPU time only covers llmio.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(config, sender), daemon=True
+    )
+    process.start()
+    try:
+        port = await asyncio.to_thread(receiver.recv)
+        agent = _agent(config, f"http://127.0.0.1:{port}/v1")
+        # Warm up imports, schemas and connections before measuring.
+        await _run_sessions(
+            agent, BenchConfig(**{**config.__dict__, "sessions": 1}), []
+        )
+
+        latencies: list[float] = []
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        await _run_sessions(agent, config, latencies)
+        duration = time.perf_counter() - start
+        cpu_time = time.process_time() - cpu_start
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            histories = await _run_sessions(agent, config, [])
+            memory = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        del histories
+
+        return BenchResult(
+            speaks=len(latencies),
+            duration=duration,
+            latencies=latencies,
+            cpu_time=cpu_time,
+            memory_per_session=memory / config.sessions,
+        )
+    finally:
+        process.terminate()
+        process.join()
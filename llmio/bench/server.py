@@ -0,0 +1,254 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from types import TracebackType
+from typing import Any, Callable, Type
+
+
+@dataclass
+class Fixed:
+    seconds: float
+
+    def __call__(self) -> float:
+        return self.seconds
+
+
+@dataclass
+class Uniform:
+    low: float
+    high: float
+
+    def __call__(self) -> float:
+        return random.uniform(self.low, self.high)
+
+
+@dataclass
+class LogNormal:
+    """
+    A long-tailed distribution, which resembles the latency of real APIs.
+    """
+
+    median: float
+    sigma: float
+
+    def __call__(self) -> float:
+        return self.median * random.lognormvariate(0, self.sigma)
+
+
+Distribution = Callable[[], float]
+
+
+@dataclass
+class Step:
+    """
+    A scripted assistant reply.
+    Tool calls are given as pairs of tool names and arguments.
+    """
+
+    content: str | None = None
+    tool_calls: list[tuple[str, dict[str, Any]]] = field(default_factory=list)
+
+
+def _words(text: str) -> list[str]:
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + words[-1:]
+
+
+class MockServer:
+    """
+    A local OpenAI-compatible chat completions server, for tests and benchmarks.
+
+    The reply to a request is picked from the script by the number of assistant
+    messages since the last user message, so a script of a tool call step followed
+    by a content step plays out one full tool round.
+    Replies past the end of the script repeat the last step.
+    """
+
+    def __init__(
+        self,
+        script: list[Step] | None = None,
+        latency: Distribution = Fixed(0.0),
+        chunks_per_second: float | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """
+        Args:
+            script: The replies to play back. Defaults to a short text reply.
+            latency: The delay before a response, or before the first chunk of a stream.
+            chunks_per_second: The rate at which streamed chunks are sent.
+                               Chunks are sent as fast as possible if not set.
+            host: The host to listen on.
+            port: The port to listen on. A free port is picked by default.
+        """
+        self.script = script or [Step(content="This is a mocked reply.")]
+        self.latency = latency
+        self.chunks_per_second = chunks_per_second
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def __aenter__(self) -> "MockServer":
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.stop()
+
+    def _step(self, messages: list[dict[str, Any]]) -> Step:
+        index = 0
+        for message in reversed(messages):
+            if message["role"] == "user":
+                break
+            if message["role"] == "assistant":
+                index += 1
+        return self.script[min(index, len(self.script) - 1)]
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if method == "POST" and path.split("?")[0].endswith(
+                    "/chat/completions"
+                ):
+                    self.requests += 1
+                    await self._complete(json.loads(body), writer)
+                else:
+                    self._write_response(writer, 404, b"{}")
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, body: bytes) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n".encode() + body
+        )
+
+    async def _complete(
+        self, request: dict[str, Any], writer: asyncio.StreamWriter
+    ) -> None:
+        step = self._step(request["messages"])
+        prompt_tokens = len(json.dumps(request["messages"])) // 4
+        tool_calls = [
+            {
+                "id": f"call_{i}_{time.monotonic_ns()}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+            for i, (name, arguments) in enumerate(step.tool_calls)
+        ]
+        completion_tokens = (len(step.content or "") + len(json.dumps(tool_calls))) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        base = {
+            "id": "chatcmpl-mock",
+            "created": int(time.time()),
+            "model": request["model"],
+        }
+        await asyncio.sleep(self.latency())
+
+        if not request.get("stream"):
+            message: dict[str, Any] = {"role": "assistant", "content": step.content}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            body = {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+            self._write_response(writer, 200, json.dumps(body).encode())
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"\r\n"
+        )
+        deltas: list[dict[str, Any]] = [{"role": "assistant", "content": ""}]
+        deltas += [{"content": word} for word in _words(step.content or "") if word]
+        deltas += [
+            {"tool_calls": [{"index": i, **tool_call}]}
+            for i, tool_call in enumerate(tool_calls)
+        ]
+        events = [
+            {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            }
+            for delta in deltas
+        ]
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append(
+                {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [],
+                    "usage": usage,
+                }
+            )
+        for i, event in enumerate(events):
+            if i and self.chunks_per_second:
+                await asyncio.sleep(1 / self.chunks_per_second)
+            self._write_chunk(writer, f"data: {json.dumps(event)}\n\n".encode())
+            await writer.drain()
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        self._write_chunk(writer, b"")
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
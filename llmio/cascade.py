@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass
+from inspect import isawaitable
+from typing import Awaitable, Callable, Literal, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from llmio.models import ChatCompletion
+
+EscalationReason = Literal["invalid", "rejected", "latency"]
+
+
+@dataclass
+class Escalation:
+    """
+    An attempt of a model whose answer was not kept.
+    """
+
+    model: str
+    reason: EscalationReason
+    latency: float
+    # None if the model did not answer within the latency budget.
+    completion: ChatCompletion | None
+
+
+class Cascade:
+    """
+    Tries an ordered list of models, usually from cheapest to most capable,
+    and escalates to the next model when an answer is not good enough.
+
+    An answer escalates when its tool calls or structured output are invalid,
+    when the `confidence` hook rejects it, or when the model does not answer
+    within `latency_budget`. The last model's answer is always used.
+    Cascades do not support streaming, since streamed text cannot be taken back
+    once it reached the stream callbacks.
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str],
+        confidence: Callable[[ChatCompletion], bool | Awaitable[bool]] | None = None,
+        latency_budget: float | None = None,
+    ) -> None:
+        """
+        Args:
+            models: The models to try, in order.
+            confidence: Returns whether an answer is good enough to keep. Can be async.
+            latency_budget: Seconds to wait for each model but the last before escalating.
+        """
+        if not models:
+            raise ValueError("At least one model is required.")
+        self.models = list(models)
+        self.confidence = confidence
+        self.latency_budget = latency_budget
+        # The number of answers kept from each model.
+        self.hits: Counter[str] = Counter()
+
+    def hit_rates(self) -> dict[str, float]:
+        """
+        Returns the share of answers that each model provided.
+        """
+        total = sum(self.hits.values())
+        return {
+            model: self.hits[model] / total if total else 0.0 for model in self.models
+        }
+
+    async def run(
+        self,
+        request: Callable[[str], Awaitable[ChatCompletion]],
+        validate: Callable[[ChatCompletion], bool],
+    ) -> tuple[str, ChatCompletion, list[Escalation]]:
+        """
+        Requests a completion from each model in turn until one is kept.
+        Returns the model that answered, its completion, and the attempts that were escalated.
+
+        Args:
+            request: Requests a completion from the given model.
+            validate: Returns whether the tool calls and output of a completion are valid.
+        """
+        *cheaper, last = self.models
+        escalations: list[Escalation] = []
+        for model in cheaper:
+            start = time.perf_counter()
+            completion, reason = await self._try(model, request, validate)
+            if reason is None:
+                assert completion is not None
+                self.hits[model] += 1
+                return model, completion, escalations
+            escalations.append(
+                Escalation(model, reason, time.perf_counter() - start, completion)
+            )
+        completion = await request(last)
+        self.hits[last] += 1
+        return last, completion, escalations
+
+    async def _try(
+        self,
+        model: str,
+        request: Callable[[str], Awaitable[ChatCompletion]],
+        validate: Callable[[ChatCompletion], bool],
+    ) -> tuple[ChatCompletion | None, EscalationReason | None]:
+        """
+        Returns the completion of the model, and why it is not kept if it is not.
+        """
+        try:
+            completion = await asyncio.wait_for(request(model), self.latency_budget)
+        except asyncio.TimeoutError:
+            return None, "latency"
+        if not validate(completion):
+            return completion, "invalid"
+        if self.confidence is not None:
+            accepted = self.confidence(completion)
+            if isawaitable(accepted):
+                accepted = await accepted
+            if not accepted:
+                return completion, "rejected"
+        return completion, None
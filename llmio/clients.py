@@ -1,64 +1,389 @@
-from collections.abc import AsyncIterator
-from typing import Any
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from types import TracebackType
+from typing import Any, Type, TypeVar, cast
 
-from openai import AsyncOpenAI, AsyncAzureOpenAI, AsyncStream
+import httpx
+from openai import (
+    AsyncOpenAI,
+    AsyncAzureOpenAI,
+    AsyncStream,
+    DefaultAsyncHttpxClient,
+    DEFAULT_CONNECTION_LIMITS,
+    DEFAULT_TIMEOUT,
+)
 from openai.types.shared_params import ResponseFormatJSONSchema
 from llmio.models import ChatCompletionChunk
 
-from llmio import types as T, models
+from llmio import types as T, models, raw as raw_
+from llmio.metrics import Metrics
+
+_ClientT = TypeVar("_ClientT", bound="BaseClient")
+
+
+def create_http_client(
+    max_connections: int | None = DEFAULT_CONNECTION_LIMITS.max_connections,
+    max_keepalive_connections: int | None = (
+        DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+    ),
+    keepalive_expiry: float | None = DEFAULT_CONNECTION_LIMITS.keepalive_expiry,
+    http2: bool = False,
+    timeout: float | httpx.Timeout | None = DEFAULT_TIMEOUT,
+) -> httpx.AsyncClient:
+    """
+    Creates an HTTP client with a tunable connection pool.
+    The returned client can be shared between several llmio clients,
+    which then reuse the same pool of open connections.
+
+    Args:
+        max_connections: The maximum number of concurrent connections.
+        max_keepalive_connections: The maximum number of idle connections kept open.
+        keepalive_expiry: Seconds an idle connection is kept open.
+        http2: Whether to enable HTTP/2. Requires the `h2` package.
+        timeout: The default request timeout in seconds.
+    """
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        http2=http2,
+        timeout=timeout,
+    )
 
 
 class BaseClient:
-    def __init__(self, client: AsyncOpenAI) -> None:
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        owns_http_client: bool = True,
+        raw: bool = False,
+        metrics: Metrics | None = None,
+        stream_usage: bool = False,
+    ) -> None:
+        """
+        Args:
+            client: The OpenAI client to use for API requests.
+            owns_http_client: Whether `close` should close the client's connection pool.
+            raw: Whether to call the HTTP endpoint directly and decode responses into
+                 the lightweight structures in `llmio.raw`, skipping the SDK's models.
+                 Requests made in raw mode are not retried.
+            metrics: Metrics to record the outcome of requests into.
+            stream_usage: Whether streams request token usage with `stream_options`,
+                          which not every OpenAI-compatible API accepts.
+        """
         self._client = client
+        self._owns_http_client = owns_http_client
+        self._raw = raw
+        self._metrics = metrics
+        self._stream_usage = stream_usage
 
-    async def get_chat_completion(
+    def _record_request(self, model: str, error: BaseException | None) -> None:
+        if self._metrics is None:
+            return
+        match error:
+            case None:
+                outcome = "ok"
+            case asyncio.CancelledError():
+                outcome = "cancelled"
+            case GeneratorExit():
+                # The stream was closed before it ended, for example by a stop condition.
+                outcome = "closed"
+            case _:
+                outcome = type(error).__name__
+        self._metrics.client_requests.inc(model=model, outcome=outcome)
+
+    @property
+    def _http_client(self) -> httpx.AsyncClient:
+        return self._client._client  # pylint: disable=protected-access
+
+    async def warmup(self, connections: int = 1) -> None:
+        """
+        Pre-opens connections to the API, so that DNS, TCP and TLS setup
+        is not paid by the first requests.
+        The response status of the warmup requests is ignored.
+        """
+
+        async def _touch() -> None:
+            response = await self._http_client.get(self._client.base_url)
+            await response.aclose()
+
+        await asyncio.gather(*[_touch() for _ in range(connections)])
+
+    async def close(self) -> None:
+        """
+        Closes the connection pool, unless it is shared with other clients.
+        """
+        if self._owns_http_client:
+            await self._client.close()
+
+    async def __aenter__(self: _ClientT) -> _ClientT:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    def _raw_path(self, model: str) -> str:  # pylint: disable=unused-argument
+        return "chat/completions"
+
+    def _raw_headers(self) -> dict[str, str]:
+        return {
+            key: value
+            for key, value in self._client.default_headers.items()
+            if isinstance(value, str)
+        }
+
+    def _raw_request(
+        self, body: dict[str, Any], timeout: float | None = None
+    ) -> httpx.Request:
+        return self._http_client.build_request(
+            "POST",
+            self._client.base_url.join(self._raw_path(body["model"])),
+            json=body,
+            headers=self._raw_headers(),
+            params=cast(Any, self._client.default_query),
+            timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+        )
+
+    async def _raise_for_status(self, response: httpx.Response) -> None:
+        if response.is_success:
+            return
+        await response.aread()
+        raise self._client._make_status_error_from_response(  # pylint: disable=protected-access
+            response
+        )
+
+    def _request_kwargs(
         self,
-        model: str,
-        messages: list[T.Message],
         tools: list[T.Tool],
         response_format: ResponseFormatJSONSchema | None,
-    ) -> models.ChatCompletion:
+        prompt_cache_key: str | None,
+    ) -> dict[str, Any]:
+        """
+        Returns the optional fields of a completion request body.
+        """
         kwargs: dict[str, Any] = {}
         if response_format:
             kwargs["response_format"] = response_format
         if tools:
             kwargs["tools"] = tools
+        if prompt_cache_key is not None:
+            kwargs["prompt_cache_key"] = prompt_cache_key
+        return kwargs
+
+    @staticmethod
+    def _sdk_kwargs(kwargs: dict[str, Any], timeout: float | None) -> dict[str, Any]:
+        """
+        Passes fields that older SDK versions do not know through `extra_body`,
+        and the request timeout as a request option.
+        """
+        kwargs = dict(kwargs)
+        if "prompt_cache_key" in kwargs:
+            kwargs["extra_body"] = {"prompt_cache_key": kwargs.pop("prompt_cache_key")}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    async def get_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> models.ChatCompletion:
+        try:
+            completion = await self._request_chat_completion(
+                model=model,
+                messages=messages,
+                tools=tools,
+                response_format=response_format,
+                prompt_cache_key=prompt_cache_key,
+                timeout=timeout,
+            )
+        except BaseException as e:
+            self._record_request(model, e)
+            raise
+        self._record_request(model, None)
+        return completion
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> AsyncGenerator[ChatCompletionChunk, None]:
+        error: BaseException | None = None
+        try:
+            # Closing the stream early closes the HTTP response right away.
+            async with aclosing(
+                self._request_chat_completion_stream(
+                    model=model,
+                    messages=messages,
+                    tools=tools,
+                    response_format=response_format,
+                    prompt_cache_key=prompt_cache_key,
+                    timeout=timeout,
+                )
+            ) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record_request(model, error)
+
+    async def _request_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> models.ChatCompletion:
+        kwargs = self._request_kwargs(tools, response_format, prompt_cache_key)
+        if self._raw:
+            response = await self._http_client.send(
+                self._raw_request(
+                    {"model": model, "messages": messages, **kwargs}, timeout
+                )
+            )
+            await self._raise_for_status(response)
+            # The raw structures expose the attributes of the SDK models that llmio reads.
+            return cast(models.ChatCompletion, raw_.decode_completion(response.json()))
         return await self._client.chat.completions.create(
             model=model,
             messages=messages,
-            **kwargs,
+            **self._sdk_kwargs(kwargs, timeout),
         )
 
-    async def stream_chat_completion(
+    async def _request_chat_completion_stream(
         self,
         model: str,
         messages: list[T.Message],
         tools: list[T.Tool],
         response_format: ResponseFormatJSONSchema | None,
-    ) -> AsyncIterator[ChatCompletionChunk]:
-        kwargs: dict[str, Any] = {}
-        if response_format:
-            kwargs["response_format"] = response_format
-        if tools:
-            kwargs["tools"] = tools
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> AsyncGenerator[ChatCompletionChunk, None]:
+        kwargs = self._request_kwargs(tools, response_format, prompt_cache_key)
+        if self._stream_usage:
+            kwargs["stream_options"] = {"include_usage": True}
+        if self._raw:
+            response = await self._http_client.send(
+                self._raw_request(
+                    {"model": model, "messages": messages, "stream": True, **kwargs},
+                    timeout,
+                ),
+                stream=True,
+            )
+            try:
+                await self._raise_for_status(response)
+                async for data in raw_.iter_sse_data(response):
+                    yield cast(ChatCompletionChunk, raw_.decode_chunk(data))
+            finally:
+                await response.aclose()
+            return
         stream: AsyncStream[ChatCompletionChunk] = (
             await self._client.chat.completions.create(
                 model=model,
                 messages=messages,
                 stream=True,
-                **kwargs,
+                **self._sdk_kwargs(kwargs, timeout),
             )
         )
-        async for chunk in stream:
-            assert isinstance(chunk, ChatCompletionChunk)
-            yield chunk
+        try:
+            async for chunk in stream:
+                assert isinstance(chunk, ChatCompletionChunk)
+                yield chunk
+        finally:
+            await stream.close()
+
+
+def _pooled_http_client(
+    http_client: httpx.AsyncClient | None,
+    max_connections: int | None,
+    max_keepalive_connections: int | None,
+    keepalive_expiry: float | None,
+    http2: bool,
+    timeout: float | httpx.Timeout | None,
+) -> httpx.AsyncClient:
+    if http_client is not None:
+        return http_client
+    return create_http_client(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+        http2=http2,
+        timeout=timeout,
+    )
 
 
 class OpenAIClient(BaseClient):
-    def __init__(self, api_key: str, base_url: str | None = None) -> None:
-        client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-        super().__init__(client=client)
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str | None = None,
+        *,
+        http_client: httpx.AsyncClient | None = None,
+        max_connections: int | None = DEFAULT_CONNECTION_LIMITS.max_connections,
+        max_keepalive_connections: int | None = (
+            DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+        ),
+        keepalive_expiry: float | None = DEFAULT_CONNECTION_LIMITS.keepalive_expiry,
+        http2: bool = False,
+        timeout: float | httpx.Timeout | None = DEFAULT_TIMEOUT,
+        raw: bool = False,
+        metrics: Metrics | None = None,
+        stream_usage: bool = True,
+    ) -> None:
+        """
+        Args:
+            api_key: The OpenAI API key.
+            base_url: An optional base URL for OpenAI-compatible APIs.
+            http_client: An HTTP client to share between several clients, see `create_http_client`.
+                         If set, the pool options below are ignored.
+            max_connections: The maximum number of concurrent connections.
+            max_keepalive_connections: The maximum number of idle connections kept open.
+            keepalive_expiry: Seconds an idle connection is kept open.
+            http2: Whether to enable HTTP/2. Requires the `h2` package.
+            timeout: The default request timeout in seconds.
+            raw: Whether to skip the SDK's response models, see `BaseClient`.
+            metrics: Metrics to record the outcome of requests into.
+            stream_usage: Whether streams request token usage, see `BaseClient`.
+        """
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=_pooled_http_client(
+                http_client,
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                timeout=timeout,
+            ),
+        )
+        super().__init__(
+            client=client,
+            owns_http_client=http_client is None,
+            raw=raw,
+            metrics=metrics,
+            stream_usage=stream_usage,
+        )
 
 
 class AzureOpenAIClient(BaseClient):
@@ -67,15 +392,92 @@ class AzureOpenAIClient(BaseClient):
         api_key: str,
         endpoint: str,
         api_version: str,
+        *,
+        http_client: httpx.AsyncClient | None = None,
+        max_connections: int | None = DEFAULT_CONNECTION_LIMITS.max_connections,
+        max_keepalive_connections: int | None = (
+            DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+        ),
+        keepalive_expiry: float | None = DEFAULT_CONNECTION_LIMITS.keepalive_expiry,
+        http2: bool = False,
+        timeout: float | httpx.Timeout | None = DEFAULT_TIMEOUT,
+        raw: bool = False,
+        metrics: Metrics | None = None,
+        stream_usage: bool = False,
     ) -> None:
+        """
+        See `OpenAIClient` for a description of the options.
+        Streams only request token usage with `stream_usage=True`,
+        as not every version of the API accepts it.
+        """
         client = AsyncAzureOpenAI(
-            api_key=api_key, azure_endpoint=endpoint, api_version=api_version
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            http_client=_pooled_http_client(
+                http_client,
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                timeout=timeout,
+            ),
         )
-        super().__init__(client=client)
+        super().__init__(
+            client=client,
+            owns_http_client=http_client is None,
+            raw=raw,
+            metrics=metrics,
+            stream_usage=stream_usage,
+        )
+
+    def _raw_path(self, model: str) -> str:
+        return f"deployments/{model}/chat/completions"
+
+    def _raw_headers(self) -> dict[str, str]:
+        return {**super()._raw_headers(), "api-key": self._client.api_key}
 
 
 class GeminiClient(BaseClient):
-    def __init__(self, api_key: str, base_url: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        *,
+        http_client: httpx.AsyncClient | None = None,
+        max_connections: int | None = DEFAULT_CONNECTION_LIMITS.max_connections,
+        max_keepalive_connections: int | None = (
+            DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+        ),
+        keepalive_expiry: float | None = DEFAULT_CONNECTION_LIMITS.keepalive_expiry,
+        http2: bool = False,
+        timeout: float | httpx.Timeout | None = DEFAULT_TIMEOUT,
+        raw: bool = False,
+        metrics: Metrics | None = None,
+        stream_usage: bool = False,
+    ) -> None:
+        """
+        See `OpenAIClient` for a description of the options.
+        Streams only request token usage with `stream_usage=True`,
+        as not every version of the API accepts it.
+        """
         assert base_url is not None
-        client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-        super().__init__(client=client)
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=_pooled_http_client(
+                http_client,
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                timeout=timeout,
+            ),
+        )
+        super().__init__(
+            client=client,
+            owns_http_client=http_client is None,
+            raw=raw,
+            metrics=metrics,
+            stream_usage=stream_usage,
+        )
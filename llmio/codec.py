@@ -0,0 +1,254 @@
+"""
+A compact binary encoding of conversation histories.
+
+A blob starts with a magic header, followed by frames. Each frame holds a batch
+of messages, so new messages are appended to a blob as a new frame without
+re-encoding the messages before them. Frames are optionally compressed.
+
+Frame layout:
+    length: u32, flags: u8, payload[length]
+Payload layout:
+    integer count: u32, string count: u32,
+    integers: u32[], string lengths in characters: u32[], strings: UTF-8
+The integers hold the structure of the messages: the number of interned strings,
+the number of messages, and per message its role, field flags, tool call counts
+and indices of interned tool names. The strings hold the interned strings,
+followed by the contents, ids and arguments of the messages in order.
+Messages with fields that the compact layout does not cover are stored as JSON,
+so every message round-trips.
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Any, cast
+
+from llmio import types as T
+
+MAGIC = b"LLH\x01"
+
+_FRAME_HEADER = struct.Struct("<IB")
+_FRAME_COUNTS = struct.Struct("<II")
+
+_COMPRESSED = 1
+
+_ROLES = ("system", "user", "assistant", "tool", "developer", "function")
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+# Flags of the fields present in a message.
+_CONTENT = 1
+_NULL_CONTENT = 2
+_TOOL_CALLS = 4
+_TOOL_CALL_ID = 8
+_NAME = 16
+_JSON = 128
+
+_COMPACT_KEYS = {"role", "content", "tool_calls", "tool_call_id", "name"}
+_MISSING = object()
+
+
+def _is_compact_tool_call(tool_call: Any) -> bool:
+    function = tool_call.get("function")
+    return (
+        tool_call.keys() == {"id", "type", "function"}
+        and tool_call["type"] == "function"
+        and isinstance(function, dict)
+        and function.keys() == {"name", "arguments"}
+    )
+
+
+def _is_compact(message: Any) -> bool:
+    return (
+        message.get("role") in _ROLE_CODES
+        and message.keys() <= _COMPACT_KEYS
+        and isinstance(message.get("content"), (str, type(None)))
+        # Null tool calls, as dumped from the SDK models, are kept as JSON to round-trip.
+        and isinstance(message.get("tool_calls", []), list)
+        and all(_is_compact_tool_call(call) for call in message.get("tool_calls") or ())
+    )
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.ints: list[int] = []
+        self.strings: list[str] = []
+        self.interned: dict[str, int] = {}
+
+    def intern(self, value: str) -> None:
+        index = self.interned.get(value)
+        if index is None:
+            index = self.interned[value] = len(self.interned)
+        self.ints.append(index)
+
+    def message(self, message: Any) -> None:
+        ints, strings = self.ints, self.strings
+        if not _is_compact(message):
+            ints += (0, _JSON)
+            strings.append(json.dumps(message, separators=(",", ":")))
+            return
+
+        flags = 0
+        content = message.get("content", _MISSING)
+        if isinstance(content, str):
+            flags |= _CONTENT
+        elif content is None:
+            flags |= _NULL_CONTENT
+        if "tool_calls" in message:
+            flags |= _TOOL_CALLS
+        if "tool_call_id" in message:
+            flags |= _TOOL_CALL_ID
+        if "name" in message:
+            flags |= _NAME
+        ints += (_ROLE_CODES[message["role"]], flags)
+
+        if flags & _CONTENT:
+            strings.append(content)
+        if flags & _TOOL_CALLS:
+            ints.append(len(message["tool_calls"]))
+            for tool_call in message["tool_calls"]:
+                function = tool_call["function"]
+                strings.append(tool_call["id"])
+                strings.append(function["arguments"])
+                self.intern(function["name"])
+        if flags & _TOOL_CALL_ID:
+            strings.append(message["tool_call_id"])
+        if flags & _NAME:
+            self.intern(message["name"])
+
+
+def _u32_array(values: list[int]) -> array:
+    result = array("I", values)
+    if sys.byteorder == "big":
+        result.byteswap()
+    return result
+
+
+def _read_u32_array(data: bytes | memoryview, offset: int, count: int) -> array:
+    result = array("I")
+    result.frombytes(data[offset : offset + count * 4])
+    if sys.byteorder == "big":
+        result.byteswap()
+    return result
+
+
+def _encode_frame(messages: list[T.Message], compress: bool) -> bytes:
+    writer = _Writer()
+    for message in messages:
+        writer.message(message)
+
+    # The interned strings come first, so that they can be looked up by index.
+    strings = [*writer.interned, *writer.strings]
+    ints = _u32_array([len(writer.interned), len(messages), *writer.ints])
+    lengths = _u32_array([len(string) for string in strings])
+    payload = b"".join(
+        [
+            _FRAME_COUNTS.pack(len(ints), len(lengths)),
+            ints.tobytes(),
+            lengths.tobytes(),
+            "".join(strings).encode(),
+        ]
+    )
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload)
+        flags |= _COMPRESSED
+    return _FRAME_HEADER.pack(len(payload), flags) + payload
+
+
+def _decode_frame(payload: bytes | memoryview) -> list[T.Message]:
+    int_count, string_count = _FRAME_COUNTS.unpack_from(payload)
+    offset = _FRAME_COUNTS.size
+    ints = iter(_read_u32_array(payload, offset, int_count))
+    offset += int_count * 4
+    lengths = _read_u32_array(payload, offset, string_count)
+    offset += string_count * 4
+
+    # All strings are decoded at once and sliced by their lengths in characters.
+    text = str(payload[offset:], "utf-8")
+    ends = list(accumulate(lengths))
+    all_strings = [text[start:end] for start, end in zip([0, *ends], ends)]
+
+    interned = all_strings[: next(ints)]
+    strings = iter(all_strings[len(interned) :])
+    messages = []
+    for _ in range(next(ints)):
+        role, flags = next(ints), next(ints)
+        if flags & _JSON:
+            messages.append(cast(T.Message, json.loads(next(strings))))
+            continue
+
+        message: dict[str, Any] = {"role": _ROLES[role]}
+        if flags & _CONTENT:
+            message["content"] = next(strings)
+        elif flags & _NULL_CONTENT:
+            message["content"] = None
+        if flags & _TOOL_CALLS:
+            tool_calls = []
+            for _ in range(next(ints)):
+                tool_call_id = next(strings)
+                arguments = next(strings)
+                tool_calls.append(
+                    {
+                        "id": tool_call_id,
+                        "type": "function",
+                        "function": {
+                            "name": interned[next(ints)],
+                            "arguments": arguments,
+                        },
+                    }
+                )
+            message["tool_calls"] = tool_calls
+        if flags & _TOOL_CALL_ID:
+            message["tool_call_id"] = next(strings)
+        if flags & _NAME:
+            message["name"] = interned[next(ints)]
+        messages.append(cast(T.Message, message))
+    return messages
+
+
+def encode_history(messages: list[T.Message], compress: bool = False) -> bytes:
+    """
+    Encodes a conversation history.
+
+    Args:
+        messages: The history, as returned in `AgentResponse.history`.
+        compress: Whether to compress the messages with zlib.
+    """
+    return MAGIC + _encode_frame(messages, compress)
+
+
+def append_history(
+    blob: bytes, messages: list[T.Message], compress: bool = False
+) -> bytes:
+    """
+    Returns the blob with the messages appended as a new frame.
+    The messages already in the blob are not decoded or re-encoded.
+    """
+    if not blob:
+        return encode_history(messages, compress=compress)
+    if not blob.startswith(MAGIC):
+        raise ValueError("Not an encoded history.")
+    return blob + _encode_frame(messages, compress)
+
+
+def decode_history(blob: bytes) -> list[T.Message]:
+    """
+    Decodes a history encoded by `encode_history` and `append_history`.
+    """
+    if not blob.startswith(MAGIC):
+        raise ValueError("Not an encoded history.")
+    view = memoryview(blob)
+    messages: list[T.Message] = []
+    offset = len(MAGIC)
+    while offset < len(blob):
+        length, flags = _FRAME_HEADER.unpack_from(view, offset)
+        offset += _FRAME_HEADER.size
+        payload: bytes | memoryview = view[offset : offset + length]
+        offset += length
+        if flags & _COMPRESSED:
+            payload = zlib.decompress(payload)
+        messages.extend(_decode_frame(payload))
+    return messages
@@ -0,0 +1,136 @@
+import asyncio
+from types import TracebackType
+from typing import Awaitable, Callable, Literal, Type
+
+Overflow = Literal["block", "drop", "unbounded"]
+
+
+class StreamDelivery:
+    """
+    Delivers stream deltas to the stream callbacks from a separate task,
+    so that slow callbacks do not slow down reading the stream from the provider.
+
+    Deltas are buffered and coalesced: the callbacks receive the text that arrived
+    within `interval` seconds in one call, or earlier once `max_chars` characters arrived.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.02,
+        max_chars: int = 1024,
+        max_buffer: int = 65536,
+        overflow: Overflow = "block",
+    ) -> None:
+        """
+        Args:
+            interval: Seconds to collect deltas for before delivering them.
+            max_chars: Buffered characters that are delivered without waiting for the interval.
+            max_buffer: Characters that are buffered while the callbacks are busy.
+            overflow: What happens to deltas that arrive when the buffer is full:
+                      "block" waits until the callbacks caught up, "drop" discards them,
+                      and "unbounded" buffers them regardless.
+        """
+        if overflow not in ("block", "drop", "unbounded"):
+            raise ValueError(f"Invalid overflow behaviour: {overflow}")
+        self.interval = interval
+        self.max_chars = max_chars
+        self.max_buffer = max_buffer
+        self.overflow = overflow
+
+    def start(
+        self,
+        deliver: Callable[[str], Awaitable[None]],
+        on_drop: Callable[[int], None] | None = None,
+    ) -> "_Delivery":
+        return _Delivery(self, deliver, on_drop)
+
+
+class _Delivery:
+    """
+    The buffer and delivery task of one stream.
+    Used as an async context manager that returns the function to put deltas with.
+    Leaving it delivers the rest of the buffer, unless it is left with an exception.
+    """
+
+    def __init__(
+        self,
+        config: StreamDelivery,
+        deliver: Callable[[str], Awaitable[None]],
+        on_drop: Callable[[int], None] | None,
+    ) -> None:
+        self._config = config
+        self._deliver = deliver
+        self._on_drop = on_drop
+        self._buffer: list[str] = []
+        self._buffered = 0
+        self._closed = False
+        # Set when deltas arrive, when enough deltas arrived, and when the buffer was taken.
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._taken = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Callable[[str], Awaitable[None]]:
+        self._task = asyncio.create_task(self._run())
+        return self.put
+
+    async def __aexit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        assert self._task is not None
+        if exc is not None:
+            self._task.cancel()
+            return
+        self._closed = True
+        self._pending.set()
+        self._full.set()
+        await self._task
+
+    async def put(self, delta: str) -> None:
+        assert self._task is not None
+        if self._task.done():
+            # The callbacks failed, so their exception is raised to the stream.
+            self._task.result()
+        if self._buffered >= self._config.max_buffer:
+            if self._config.overflow == "drop":
+                if self._on_drop is not None:
+                    self._on_drop(len(delta))
+                return
+            if self._config.overflow == "block":
+                self._taken.clear()
+                taken = asyncio.ensure_future(self._taken.wait())
+                await asyncio.wait(
+                    [taken, self._task], return_when=asyncio.FIRST_COMPLETED
+                )
+                taken.cancel()
+                if self._task.done():
+                    self._task.result()
+        self._buffer.append(delta)
+        self._buffered += len(delta)
+        self._pending.set()
+        if self._buffered >= self._config.max_chars:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._pending.wait()
+            # Deltas that arrive within the interval are delivered together.
+            if not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), self._config.interval)
+                except asyncio.TimeoutError:
+                    pass
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+            self._pending.clear()
+            self._full.clear()
+            self._taken.set()
+            if text:
+                await self._deliver(text)
+            # Deltas that arrived during the delivery are still pending.
+            if self._closed and not self._buffer:
+                return
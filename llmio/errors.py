@@ -8,3 +8,21 @@ class BadToolCall(LLMIOError):
 
 class MissingVariable(LLMIOError):
     pass
+
+
+class MissingRecording(LLMIOError):
+    pass
+
+
+class DeadlineExceeded(LLMIOError):
+    pass
+
+
+class WorkerError(LLMIOError):
+    pass
+
+
+class StopStream(LLMIOError):
+    """
+    Raised by stream callbacks to stop the stream early.
+    """
@@ -0,0 +1,372 @@
+import bisect
+import math
+import threading
+from typing import Any, Iterable, Sequence, TYPE_CHECKING
+
+from llmio.stats import TurnStats
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base class for metrics.
+    Values are recorded into a shard owned by the recording thread,
+    so recording never takes a lock. Shards are merged when rendering.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards: dict[int, dict[tuple[str, ...], Any]] = {}
+
+    def _shard(self) -> dict[tuple[str, ...], Any]:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(
+                f"Metric '{self.name}' expects the labels {self.labelnames}, got {tuple(labels)}."
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _merged_values(self) -> dict[tuple[str, ...], float]:
+        merged: dict[tuple[str, ...], float] = {}
+        for shard in list(self._shards.values()):
+            for key, value in list(shard.items()):
+                merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._merged_values().items())
+        ]
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self._samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented.")
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._merged_values().get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """
+    A gauge tracking a level, such as the number of operations in flight.
+    """
+
+    type_name = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._merged_values().get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        series = shard.get(key)
+        if series is None:
+            # Bucket counts, followed by the sum and the count of observations.
+            series = shard[key] = [0.0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def _merged_series(self) -> dict[tuple[str, ...], list[float]]:
+        merged: dict[tuple[str, ...], list[float]] = {}
+        for shard in list(self._shards.values()):
+            for key, series in list(shard.items()):
+                total = merged.setdefault(key, [0.0] * len(series))
+                for i, value in enumerate(list(series)):
+                    total[i] += value
+        return merged
+
+    def count(self, **labels: str) -> float:
+        series = self._merged_series().get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, series in sorted(self._merged_series().items()):
+            cumulative = 0.0
+            for bound, count in zip([*self.buckets, math.inf], series):
+                cumulative += count
+                labels = _format_labels(
+                    [*self.labelnames, "le"], [*key, _format_value(bound)]
+                )
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """
+    A collection of metrics that can be rendered in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric) or (
+            existing.labelnames != metric.labelnames
+        ):
+            raise ValueError(
+                f"Metric '{metric.name}' is already registered with another type or labels."
+            )
+        return existing
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() + "\n" for metric in metrics)
+
+
+def start_http_server(
+    registry: Registry, port: int, host: str = ""
+) -> "ThreadingHTTPServer":
+    """
+    Serves the metrics of the registry for scraping from a background thread.
+    Call `shutdown()` on the returned server to stop it.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # pylint: disable-next=redefined-builtin
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Metrics:
+    """
+    The metrics recorded by agents and clients.
+    Several agents and clients can record into the same instance.
+    """
+
+    def __init__(self, registry: Registry | None = None) -> None:
+        self.registry = registry or Registry()
+        self.completion_latency = self.registry.histogram(
+            "llmio_completion_latency_seconds",
+            "Time until a completion was fully received.",
+            ["model"],
+        )
+        self.time_to_first_token = self.registry.histogram(
+            "llmio_time_to_first_token_seconds",
+            "Time until the first token of a streamed completion was received.",
+            ["model"],
+        )
+        self.prompt_tokens = self.registry.histogram(
+            "llmio_prompt_tokens",
+            "Prompt tokens per completion.",
+            ["model"],
+            buckets=TOKEN_BUCKETS,
+        )
+        self.cached_tokens = self.registry.counter(
+            "llmio_cached_prompt_tokens_total",
+            "Prompt tokens served from the provider's prompt cache.",
+            ["model"],
+        )
+        self.tool_latency = self.registry.histogram(
+            "llmio_tool_latency_seconds",
+            "Tool execution time.",
+            ["tool"],
+        )
+        self.tool_timeouts = self.registry.counter(
+            "llmio_tool_timeouts_total",
+            "Tool executions cancelled after their timeout.",
+            ["tool"],
+        )
+        self.stream_chars_dropped = self.registry.counter(
+            "llmio_stream_chars_dropped_total",
+            "Streamed characters not delivered to stream callbacks because their buffer was full.",
+        )
+        self.hook_errors = self.registry.counter(
+            "llmio_background_hook_errors_total",
+            "Background hooks that raised an exception.",
+            ["hook"],
+        )
+        self.bad_tool_calls = self.registry.counter(
+            "llmio_bad_tool_calls_total",
+            "Tool calls with an unknown tool name or invalid arguments.",
+            ["reason"],
+        )
+        self.retries = self.registry.counter(
+            "llmio_graceful_retries_total",
+            "Invalid tool calls explained to the model instead of raising.",
+            ["model"],
+        )
+        self.cache_hits = self.registry.counter(
+            "llmio_cache_hits_total",
+            "Cache hits, by cache.",
+            ["cache"],
+        )
+        self.speaks_in_flight = self.registry.gauge(
+            "llmio_speaks_in_flight",
+            "Interactions with agents currently in progress.",
+        )
+        self.tools_in_flight = self.registry.gauge(
+            "llmio_tool_executions_in_flight",
+            "Tool executions currently in progress.",
+            ["tool"],
+        )
+        self.client_requests = self.registry.counter(
+            "llmio_client_requests_total",
+            "Completion requests sent by clients, by outcome.",
+            ["model", "outcome"],
+        )
+
+        self.race_wins = self.registry.counter(
+            "llmio_race_wins_total",
+            "Races won by each candidate of a RacingClient.",
+            ["candidate"],
+        )
+        self.cascade_answers = self.registry.counter(
+            "llmio_cascade_answers_total",
+            "Answers kept from each model of a cascade.",
+            ["model"],
+        )
+        self.cascade_escalations = self.registry.counter(
+            "llmio_cascade_escalations_total",
+            "Answers of a cascade model that were passed on to the next model, by reason.",
+            ["model", "reason"],
+        )
+        self.routed_requests = self.registry.counter(
+            "llmio_routed_requests_total",
+            "Requests sent to each route of an AdaptiveRouter.",
+            ["route"],
+        )
+
+    def record_turn(self, turn: TurnStats) -> None:
+        self.completion_latency.observe(turn.latency, model=turn.model)
+        if turn.time_to_first_token is not None:
+            self.time_to_first_token.observe(turn.time_to_first_token, model=turn.model)
+        if turn.prompt_tokens is not None:
+            self.prompt_tokens.observe(turn.prompt_tokens, model=turn.model)
+        if turn.cached_tokens:
+            self.cache_hits.inc(cache="prompt")
+            self.cached_tokens.inc(turn.cached_tokens, model=turn.model)
+        for escalation in turn.escalations:
+            self.record_turn(escalation)
+
+    def render(self) -> str:
+        return self.registry.render()
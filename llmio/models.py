@@ -1,13 +1,16 @@
-from openai.types.chat import (
-    ChatCompletion,
-    ChatCompletionMessage,
-    ChatCompletionMessageToolCall as ToolCall,
-    ChatCompletionChunk,
-)
-from openai.types.chat.chat_completion import Choice
-from openai.types.chat.chat_completion_message_tool_call import (
-    Function,
-)
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from openai.types.chat import (
+        ChatCompletion,
+        ChatCompletionMessage,
+        ChatCompletionMessageToolCall as ToolCall,
+        ChatCompletionChunk,
+    )
+    from openai.types.chat.chat_completion import Choice
+    from openai.types.chat.chat_completion_message_tool_call import (
+        Function,
+    )
 
 
 __all__ = [
@@ -18,3 +21,23 @@ __all__ = [
     "Choice",
     "ChatCompletionChunk",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing openai is slow, so the models are only imported once they are used.
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # pylint: disable=import-outside-toplevel
+    from openai.types import chat
+    from openai.types.chat import chat_completion, chat_completion_message_tool_call
+
+    values = {
+        "ChatCompletion": chat.ChatCompletion,
+        "ChatCompletionMessage": chat.ChatCompletionMessage,
+        "ToolCall": chat.ChatCompletionMessageToolCall,
+        "Function": chat_completion_message_tool_call.Function,
+        "Choice": chat_completion.Choice,
+        "ChatCompletionChunk": chat.ChatCompletionChunk,
+    }
+    globals().update(values)
+    return values[name]
@@ -0,0 +1,320 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import os
+import threading
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from types import TracebackType
+from typing import Any, Callable, Type
+
+from llmio import errors, types as T
+from llmio.agent import AgentResponse, BaseAgent
+
+# Requests to workers are (request id, kind, payload) tuples, and replies are
+# (request id, ok, payload) tuples, where payload is the result or the exception.
+_SPEAK = "speak"
+_PING = "ping"
+_STOP = "stop"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class _HashRing:
+    """
+    Maps keys to worker slots by consistent hashing, with virtual nodes to even out the load.
+    """
+
+    def __init__(self, slots: int, virtual_nodes: int) -> None:
+        points = sorted(
+            (_hash(f"{slot}:{node}"), slot)
+            for slot in range(slots)
+            for node in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._slots = [slot for _, slot in points]
+
+    def slot(self, key: str) -> int:
+        position = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._slots[position]
+
+
+async def _serve(
+    factory: Callable[[], BaseAgent], requests: Connection, replies: Connection
+) -> None:
+    agent = factory()
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    tasks: set[asyncio.Task] = set()
+
+    def reply(request_id: int, ok: bool, payload: Any) -> None:
+        try:
+            replies.send((request_id, ok, payload))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # The result or exception could not be pickled.
+            replies.send((request_id, False, errors.WorkerError(repr(e))))
+
+    async def speak(request_id: int, kwargs: dict[str, Any]) -> None:
+        try:
+            response = await agent.speak(**kwargs)  # type: ignore[attr-defined]
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            reply(request_id, False, e)
+        else:
+            reply(request_id, True, response)
+
+    def dispatch(request: tuple[int, str, Any]) -> None:
+        request_id, kind, payload = request
+        if kind == _SPEAK:
+            task = loop.create_task(speak(request_id, payload))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif kind == _PING:
+            # Answered from the event loop, so a blocked loop fails the health check.
+            reply(request_id, True, None)
+        else:
+            stopped.set()
+
+    def receive() -> None:
+        while True:
+            try:
+                request = requests.recv()
+            except (EOFError, OSError):
+                request = (0, _STOP, None)
+            loop.call_soon_threadsafe(dispatch, request)
+            if request[1] == _STOP:
+                return
+
+    threading.Thread(target=receive, daemon=True).start()
+    await stopped.wait()
+    for task in tasks:
+        task.cancel()
+    await agent.flush(timeout=5)
+
+
+def _worker_main(
+    factory: Callable[[], BaseAgent], requests: Connection, replies: Connection
+) -> None:
+    asyncio.run(_serve(factory, requests, replies))
+
+
+@dataclass
+class _Worker:
+    slot: int
+    process: BaseProcess
+    requests: Connection
+    replies: Connection
+    pending: dict[int, asyncio.Future] = field(default_factory=dict)
+
+
+class AgentPool:
+    """
+    Runs an agent in several worker processes, so that one service can use all cores.
+
+    Each worker builds its own agent with `factory`, which must be picklable,
+    such as a function defined at module level. Requests with a `session_key`
+    are routed to workers by consistent hashing, so the requests of a session
+    keep hitting the same worker and its caches. Workers that exit or stop
+    responding to health checks are restarted.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], BaseAgent],
+        workers: int | None = None,
+        virtual_nodes: int = 64,
+        health_interval: float = 5.0,
+        health_timeout: float = 30.0,
+    ) -> None:
+        """
+        Args:
+            factory: Builds the agent in each worker process.
+            workers: The number of worker processes. Defaults to the number of CPUs.
+            virtual_nodes: The number of points per worker on the hash ring.
+            health_interval: Seconds between health checks.
+            health_timeout: Seconds a worker may take to answer a health check
+                            before it is restarted.
+        """
+        self._factory = factory
+        self._size = workers or os.cpu_count() or 1
+        self._ring = _HashRing(self._size, virtual_nodes)
+        self._health_interval = health_interval
+        self._health_timeout = health_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: list[_Worker] = []
+        self._request_ids = itertools.count(1)
+        self._round_robin = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._health_task: asyncio.Task | None = None
+        self._closing = False
+        self.restarts = 0
+
+    def _spawn(self, slot: int) -> _Worker:
+        # One-way pipes return their receiving end first.
+        child_requests, parent_requests = self._context.Pipe(duplex=False)
+        parent_replies, child_replies = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._factory, child_requests, child_replies),
+            daemon=True,
+        )
+        process.start()
+        # The child's ends are only needed in the child.
+        child_requests.close()
+        child_replies.close()
+        worker = _Worker(
+            slot=slot, process=process, requests=parent_requests, replies=parent_replies
+        )
+        threading.Thread(target=self._read, args=(worker,), daemon=True).start()
+        return worker
+
+    def _read(self, worker: _Worker) -> None:
+        """
+        Receives the replies of a worker on a thread, and resolves them on the event loop.
+        """
+        assert self._loop is not None
+        while True:
+            try:
+                request_id, ok, payload = worker.replies.recv()
+            except (EOFError, OSError):
+                self._loop.call_soon_threadsafe(self._on_exit, worker)
+                return
+            self._loop.call_soon_threadsafe(
+                self._resolve, worker, request_id, ok, payload
+            )
+
+    @staticmethod
+    def _resolve(worker: _Worker, request_id: int, ok: bool, payload: Any) -> None:
+        future = worker.pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(payload)
+
+    def _on_exit(self, worker: _Worker) -> None:
+        if not self._closing and self._workers[worker.slot] is worker:
+            self._restart(worker)
+
+    def _restart(self, worker: _Worker) -> None:
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(
+                    errors.WorkerError(
+                        f"Worker {worker.slot} exited or stopped responding."
+                    )
+                )
+        worker.pending.clear()
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.requests.close()
+        self.restarts += 1
+        self._workers[worker.slot] = self._spawn(worker.slot)
+
+    def _request(self, worker: _Worker, kind: str, payload: Any) -> asyncio.Future:
+        assert self._loop is not None
+        request_id = next(self._request_ids)
+        future = self._loop.create_future()
+        worker.pending[request_id] = future
+        try:
+            worker.requests.send((request_id, kind, payload))
+        except (OSError, ValueError) as e:
+            del worker.pending[request_id]
+            future.set_exception(errors.WorkerError(str(e)))
+        return future
+
+    async def _check_health(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_interval)
+            for worker in list(self._workers):
+                if not worker.process.is_alive():
+                    self._on_exit(worker)
+                    continue
+                try:
+                    await asyncio.wait_for(
+                        self._request(worker, _PING, None), self._health_timeout
+                    )
+                except (asyncio.TimeoutError, errors.WorkerError):
+                    self._on_exit(worker)
+
+    async def start(self) -> None:
+        """
+        Starts the worker processes.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        self._workers = [self._spawn(slot) for slot in range(self._size)]
+        self._health_task = asyncio.create_task(self._check_health())
+
+    async def close(self) -> None:
+        """
+        Stops the worker processes. Pending requests fail with `WorkerError`.
+        """
+        self._closing = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for worker in self._workers:
+            try:
+                worker.requests.send((0, _STOP, None))
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, 5)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.requests.close()
+            for future in worker.pending.values():
+                if not future.done():
+                    future.set_exception(errors.WorkerError("The pool was closed."))
+        self._workers = []
+
+    async def __aenter__(self) -> "AgentPool":
+        await self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    def worker_for(self, session_key: str | None) -> int:
+        """
+        Returns the slot of the worker that handles the session.
+        Requests without a session key are spread over the workers in turn.
+        """
+        if session_key is None:
+            return next(self._round_robin) % self._size
+        return self._ring.slot(session_key)
+
+    async def speak(
+        self,
+        message: str,
+        history: list[T.Message] | None = None,
+        _context: Any = None,
+        stream: bool = False,
+        deadline: float | None = None,
+        session_key: str | None = None,
+    ) -> AgentResponse:
+        """
+        Runs `speak` on the agent of a worker process. Arguments and the response are pickled.
+        Stream and message callbacks registered by the factory run in the worker.
+        """
+        if not self._workers:
+            raise errors.WorkerError("The pool is not started.")
+        worker = self._workers[self.worker_for(session_key)]
+        kwargs: dict[str, Any] = {"message": message, "history": history}
+        if _context is not None:
+            kwargs["_context"] = _context
+        if stream:
+            kwargs["stream"] = stream
+        if deadline is not None:
+            kwargs["deadline"] = deadline
+        return await self._request(worker, _SPEAK, kwargs)
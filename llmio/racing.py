@@ -0,0 +1,297 @@
+import asyncio
+import json
+from collections import Counter
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, Callable, Sequence, Type
+
+import pydantic
+from openai.types.shared_params import ResponseFormatJSONSchema
+
+from llmio import types as T, models, stats as S
+from llmio.clients import BaseClient
+from llmio.metrics import Metrics
+from llmio.schema import ArgumentPrefixChecker
+
+
+@dataclass
+class Candidate:
+    """
+    A client and model that takes part in a race.
+
+    Args:
+        client: The client to send the request with.
+        model: The model to request. Defaults to the model of the agent.
+        cost: The cost of a request relative to the other candidates, checked against `max_cost`.
+        delay: Seconds to wait for another candidate to answer before sending the request.
+        name: The name the candidate is reported by. Defaults to the model.
+    """
+
+    client: BaseClient
+    model: str | None = None
+    cost: float = 1.0
+    delay: float = 0.0
+    name: str | None = None
+
+
+def is_valid_completion(
+    completion: models.ChatCompletion,
+    tools: list[T.Tool],
+    response_format: ResponseFormatJSONSchema | None,
+    response_model: Type[pydantic.BaseModel] | None = None,
+) -> bool:
+    """
+    Returns whether the tool calls of a completion call known tools with arguments
+    that are a JSON object of the right shape, and whether structured output is valid JSON.
+    With a `response_model`, structured output must also parse into the model.
+    """
+    if not completion.choices:
+        return False
+    message = completion.choices[0].message
+    schemas = {
+        tool["function"]["name"]: dict(tool["function"].get("parameters", {}))
+        for tool in tools
+    }
+    for tool_call in message.tool_calls or []:
+        function: Any = getattr(tool_call, "function", None)
+        if function is None or function.name not in schemas:
+            return False
+        if ArgumentPrefixChecker(schemas[function.name]).feed(function.arguments):
+            return False
+        try:
+            arguments = json.loads(function.arguments)
+        except ValueError:
+            return False
+        if not isinstance(arguments, dict):
+            return False
+    if (response_format or response_model) and not message.tool_calls:
+        try:
+            if response_model is not None:
+                response_model.model_validate_json(message.content or "")
+            else:
+                json.loads(message.content or "")
+        except ValueError:
+            return False
+    return True
+
+
+class RacingClient(BaseClient):
+    """
+    Sends each request to several candidates at once, and returns the first valid response.
+    The requests of the other candidates are cancelled.
+
+    A response is valid if its tool calls and structured output can be parsed,
+    see `is_valid_completion`. Structured output is only checked against the schema
+    with a `response_model`, for example the response format of a `StructuredAgent`.
+    If no response is valid, the first response is returned,
+    so that the agent handles it as usual. Streams are raced to their first chunk.
+    The model of the winner is reported as the model of the agent's turn.
+    """
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(
+        self,
+        candidates: Sequence[Candidate | BaseClient],
+        max_cost: float | None = None,
+        validate: Callable[[models.ChatCompletion], bool] | None = None,
+        response_model: Type[pydantic.BaseModel] | None = None,
+        metrics: Metrics | None = None,
+    ) -> None:
+        """
+        Args:
+            candidates: The candidates, in order of preference. Clients are raced with the agent's model.
+            max_cost: The maximum total cost of the candidates that are sent a request.
+                      Candidates are added in order while they fit, and the first one always is.
+            validate: An additional check that responses must pass to win.
+            response_model: The model that structured output must parse into.
+                            Without it, structured output only has to be valid JSON.
+            metrics: Metrics to record the winning candidates into.
+        """
+        if not candidates:
+            raise ValueError("At least one candidate is required.")
+        self.candidates = [
+            candidate if isinstance(candidate, Candidate) else Candidate(candidate)
+            for candidate in candidates
+        ]
+        self.max_cost = max_cost
+        self._validate = validate
+        self._response_model = response_model
+        self._metrics = metrics
+        self.wins: Counter[str] = Counter()
+
+    def _name(self, index: int) -> str:
+        candidate = self.candidates[index]
+        return candidate.name or candidate.model or f"candidate-{index}"
+
+    def _racers(self) -> list[int]:
+        """
+        Returns the indices of the candidates that fit within the cost cap.
+        """
+        racers: list[int] = []
+        total = 0.0
+        for index, candidate in enumerate(self.candidates):
+            if (
+                racers
+                and self.max_cost is not None
+                and total + candidate.cost > self.max_cost
+            ):
+                continue
+            racers.append(index)
+            total += candidate.cost
+        return racers
+
+    def _record_win(self, index: int, model: str) -> None:
+        name = self._name(index)
+        self.wins[name] += 1
+        turn = S.current_turn.get()
+        if turn is not None:
+            turn.model = self.candidates[index].model or model
+        if self._metrics is not None:
+            self._metrics.race_wins.inc(candidate=name)
+
+    def _is_valid(
+        self,
+        completion: models.ChatCompletion,
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+    ) -> bool:
+        return is_valid_completion(
+            completion, tools, response_format, self._response_model
+        ) and (self._validate is None or self._validate(completion))
+
+    async def get_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> models.ChatCompletion:
+        async def run(index: int) -> models.ChatCompletion:
+            candidate = self.candidates[index]
+            if candidate.delay:
+                await asyncio.sleep(candidate.delay)
+            return await candidate.client.get_chat_completion(
+                model=candidate.model or model,
+                messages=messages,
+                tools=tools,
+                response_format=response_format,
+                prompt_cache_key=prompt_cache_key,
+                timeout=timeout,
+            )
+
+        tasks = {asyncio.create_task(run(index)): index for index in self._racers()}
+        pending = set(tasks)
+        first: tuple[int, models.ChatCompletion] | None = None
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    completion = task.result()
+                    if self._is_valid(completion, tools, response_format):
+                        self._record_win(tasks[task], model)
+                        return completion
+                    first = first or (tasks[task], completion)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if first is None:
+            assert error is not None
+            raise error
+        self._record_win(first[0], model)
+        return first[1]
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> AsyncGenerator[models.ChatCompletionChunk, None]:
+        async def first_chunk(
+            index: int,
+        ) -> tuple[
+            AsyncGenerator[models.ChatCompletionChunk, None],
+            models.ChatCompletionChunk | None,
+        ]:
+            candidate = self.candidates[index]
+            if candidate.delay:
+                await asyncio.sleep(candidate.delay)
+            stream = candidate.client.stream_chat_completion(
+                model=candidate.model or model,
+                messages=messages,
+                tools=tools,
+                response_format=response_format,
+                prompt_cache_key=prompt_cache_key,
+                timeout=timeout,
+            )
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        tasks = {
+            asyncio.create_task(first_chunk(index)): index for index in self._racers()
+        }
+        pending = set(tasks)
+        winner = None
+        error: BaseException | None = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        # Another candidate answered at the same time.
+                        await task.result()[0].aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Candidates may have answered before they were cancelled,
+            # for example while the streams above were closed.
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, tuple):
+                    await result[0].aclose()
+
+        if winner is None:
+            assert error is not None
+            raise error
+        self._record_win(tasks[winner], model)
+        stream, chunk = winner.result()
+        async with aclosing(stream):
+            if chunk is None:
+                return
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+
+    @property
+    def _clients(self) -> list[BaseClient]:
+        # Candidates may share a client with different models.
+        return list({id(c.client): c.client for c in self.candidates}.values())
+
+    async def warmup(self, connections: int = 1) -> None:
+        await asyncio.gather(*(client.warmup(connections) for client in self._clients))
+
+    async def close(self) -> None:
+        for client in self._clients:
+            await client.close()
@@ -0,0 +1,224 @@
+"""
+Lightweight response structures for the raw client mode.
+
+The raw client mode decodes JSON responses and SSE chunks directly into the
+`__slots__` classes below instead of the openai SDK's pydantic models.
+They expose the same attributes as the SDK models that the agent loop reads.
+"""
+
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+import openai
+
+
+class Function:
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name: str | None, arguments: str | None) -> None:
+        self.name = name
+        self.arguments = arguments
+
+
+class ToolCall:
+    __slots__ = ("index", "id", "type", "function")
+
+    def __init__(
+        self,
+        index: int | None,
+        id: str | None,  # pylint: disable=redefined-builtin
+        type: str | None,  # pylint: disable=redefined-builtin
+        function: Function | None,
+    ) -> None:
+        self.index = index
+        self.id = id
+        self.type = type
+        self.function = function
+
+
+class Message:
+    __slots__ = ("role", "content", "tool_calls")
+
+    def __init__(
+        self, role: str | None, content: str | None, tool_calls: list[ToolCall] | None
+    ) -> None:
+        self.role = role
+        self.content = content
+        self.tool_calls = tool_calls
+
+
+class Choice:
+    __slots__ = ("index", "message", "delta", "finish_reason")
+
+    def __init__(
+        self,
+        index: int,
+        message: Message | None,
+        delta: Message | None,
+        finish_reason: str | None,
+    ) -> None:
+        self.index = index
+        self.message = message
+        self.delta = delta
+        self.finish_reason = finish_reason
+
+
+class PromptTokensDetails:
+    __slots__ = ("cached_tokens",)
+
+    def __init__(self, cached_tokens: int | None) -> None:
+        self.cached_tokens = cached_tokens
+
+
+class Usage:
+    __slots__ = (
+        "prompt_tokens",
+        "completion_tokens",
+        "total_tokens",
+        "prompt_tokens_details",
+    )
+
+    def __init__(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        total_tokens: int,
+        prompt_tokens_details: PromptTokensDetails | None,
+    ) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+        self.prompt_tokens_details = prompt_tokens_details
+
+
+class Completion:
+    """
+    A chat completion or a streamed chat completion chunk.
+    """
+
+    __slots__ = ("id", "model", "choices", "usage")
+
+    def __init__(
+        self,
+        id: str | None,  # pylint: disable=redefined-builtin
+        model: str | None,
+        choices: list[Choice],
+        usage: Usage | None,
+    ) -> None:
+        self.id = id
+        self.model = model
+        self.choices = choices
+        self.usage = usage
+
+
+def _decode_tool_call(data: dict[str, Any]) -> ToolCall:
+    function = data.get("function")
+    return ToolCall(
+        index=data.get("index"),
+        id=data.get("id"),
+        type=data.get("type"),
+        function=(
+            Function(name=function.get("name"), arguments=function.get("arguments"))
+            if function is not None
+            else None
+        ),
+    )
+
+
+def _decode_message(data: dict[str, Any]) -> Message:
+    tool_calls = data.get("tool_calls")
+    return Message(
+        role=data.get("role"),
+        content=data.get("content"),
+        tool_calls=(
+            [_decode_tool_call(tool_call) for tool_call in tool_calls]
+            if tool_calls
+            else None
+        ),
+    )
+
+
+def _decode_usage(data: dict[str, Any] | None) -> Usage | None:
+    if data is None:
+        return None
+    details = data.get("prompt_tokens_details")
+    return Usage(
+        prompt_tokens=data.get("prompt_tokens", 0),
+        completion_tokens=data.get("completion_tokens", 0),
+        total_tokens=data.get("total_tokens", 0),
+        prompt_tokens_details=(
+            PromptTokensDetails(cached_tokens=details.get("cached_tokens"))
+            if details is not None
+            else None
+        ),
+    )
+
+
+def decode_completion(data: dict[str, Any]) -> Completion:
+    """
+    Decodes a chat completion response body.
+    """
+    return Completion(
+        id=data.get("id"),
+        model=data.get("model"),
+        choices=[
+            Choice(
+                index=choice.get("index", 0),
+                message=_decode_message(choice["message"]),
+                delta=None,
+                finish_reason=choice.get("finish_reason"),
+            )
+            for choice in data.get("choices") or []
+        ],
+        usage=_decode_usage(data.get("usage")),
+    )
+
+
+def decode_chunk(data: dict[str, Any]) -> Completion:
+    """
+    Decodes a streamed chat completion chunk.
+    """
+    return Completion(
+        id=data.get("id"),
+        model=data.get("model"),
+        choices=[
+            Choice(
+                index=choice.get("index", 0),
+                message=None,
+                delta=_decode_message(choice.get("delta") or {}),
+                finish_reason=choice.get("finish_reason"),
+            )
+            for choice in data.get("choices") or []
+        ],
+        usage=_decode_usage(data.get("usage")),
+    )
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[dict[str, Any]]:
+    """
+    Yields the decoded `data` payloads of a server-sent event stream,
+    until the stream ends or the `[DONE]` sentinel is received.
+    Raises `openai.APIError` for error payloads, like the SDK does.
+    """
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data.startswith("[DONE]"):
+            return
+        payload = json.loads(data)
+        if isinstance(payload, dict) and payload.get("error"):
+            error = payload["error"]
+            message = error.get("message") if isinstance(error, dict) else None
+            raise openai.APIError(
+                message=(
+                    message
+                    if isinstance(message, str) and message
+                    else "An error occurred during streaming"
+                ),
+                request=response.request,
+                body=error,
+            )
+        yield payload
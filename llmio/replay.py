@@ -0,0 +1,254 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import mmap
+import struct
+import time
+import zlib
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from typing import Any, BinaryIO, cast
+
+from openai.types.shared_params import ResponseFormatJSONSchema
+
+from llmio import errors, types as T, models, raw
+from llmio.clients import BaseClient
+
+# Index entries are a 16 byte request hash followed by the record's offset in the log.
+_INDEX_ENTRY = struct.Struct("<16sQ")
+_RECORD_HEADER = struct.Struct("<I")
+
+
+def request_key(
+    model: str,
+    messages: list[T.Message],
+    tools: list[T.Tool],
+    response_format: ResponseFormatJSONSchema | None,
+    stream: bool,
+) -> bytes:
+    """
+    Returns the hash that identifies a request in a recording.
+    """
+    canonical = json.dumps(
+        [model, messages, tools, response_format, stream],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+
+def _dump(value: Any) -> Any:
+    """
+    Converts SDK models and the raw client's structures to JSON-compatible values.
+    """
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_unset=True)
+    if hasattr(value, "__slots__"):
+        return {name: _dump(getattr(value, name)) for name in value.__slots__}
+    if isinstance(value, list):
+        return [_dump(item) for item in value]
+    return value
+
+
+class RecordingClient(BaseClient):
+    """
+    Wraps a client and records all requests and responses to a log on disk,
+    including the timing of streamed chunks. Replay the log with `ReplayClient`.
+
+    The log is written to `path`, and its index to `path + ".idx"` when the client is closed.
+    """
+
+    def __init__(self, client: BaseClient, path: str) -> None:
+        super().__init__(
+            client=client._client,  # pylint: disable=protected-access
+            owns_http_client=False,
+        )
+        self._wrapped = client
+        self._path = path
+        self._log: BinaryIO = open(path, "wb")  # pylint: disable=consider-using-with
+        self._index: list[tuple[bytes, int]] = []
+
+    def _write(self, key: bytes, record: dict[str, Any]) -> None:
+        payload = zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+        self._index.append((key, self._log.tell()))
+        self._log.write(_RECORD_HEADER.pack(len(payload)))
+        self._log.write(payload)
+
+    async def get_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> models.ChatCompletion:
+        start = time.perf_counter()
+        completion = await self._wrapped.get_chat_completion(
+            model=model,
+            messages=messages,
+            tools=tools,
+            response_format=response_format,
+            prompt_cache_key=prompt_cache_key,
+            timeout=timeout,
+        )
+        self._write(
+            request_key(model, messages, tools, response_format, stream=False),
+            {
+                "request": {"model": model, "messages": messages, "tools": tools},
+                "latency": time.perf_counter() - start,
+                "response": _dump(completion),
+            },
+        )
+        return completion
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> AsyncGenerator[models.ChatCompletionChunk, None]:
+        start = time.perf_counter()
+        chunks = []
+        async with aclosing(
+            self._wrapped.stream_chat_completion(
+                model=model,
+                messages=messages,
+                tools=tools,
+                response_format=response_format,
+                prompt_cache_key=prompt_cache_key,
+                timeout=timeout,
+            )
+        ) as stream:
+            async for chunk in stream:
+                chunks.append((time.perf_counter() - start, _dump(chunk)))
+                yield chunk
+        self._write(
+            request_key(model, messages, tools, response_format, stream=True),
+            {
+                "request": {"model": model, "messages": messages, "tools": tools},
+                "chunks": chunks,
+            },
+        )
+
+    async def warmup(self, connections: int = 1) -> None:
+        await self._wrapped.warmup(connections=connections)
+
+    async def close(self) -> None:
+        """
+        Writes the index of the recording and closes the wrapped client.
+        """
+        if not self._log.closed:
+            self._log.close()
+            with open(self._path + ".idx", "wb") as index:
+                for key, offset in sorted(self._index):
+                    index.write(_INDEX_ENTRY.pack(key, offset))
+        await self._wrapped.close()
+
+
+class _IndexKeys:
+    """
+    A sequence view over the request hashes of a sorted index, for binary search.
+    """
+
+    def __init__(self, index: mmap.mmap | bytes) -> None:
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index) // _INDEX_ENTRY.size
+
+    def __getitem__(self, position: int) -> bytes:
+        start = position * _INDEX_ENTRY.size
+        return bytes(self._index[start : start + 16])
+
+
+def _map(path: str) -> mmap.mmap | bytes:
+    with open(path, "rb") as file:
+        try:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped.
+            return b""
+
+
+class ReplayClient(BaseClient):
+    """
+    Serves responses recorded by `RecordingClient`.
+    The log and its index are memory mapped, so opening a recording
+    of any size is instant, and each request is looked up by binary search.
+    Responses are decoded into the lightweight structures of the raw client mode.
+    """
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(self, path: str, speed: float | None = None):
+        """
+        Args:
+            path: The path of the recording.
+            speed: Replays with the recorded latencies and chunk timings divided by `speed`.
+                   Responses are returned immediately if not set.
+        """
+        self._log = _map(path)
+        self._index = _map(path + ".idx")
+        self._keys = _IndexKeys(self._index)
+        self._speed = speed
+
+    def _lookup(self, key: bytes) -> dict[str, Any]:
+        position = bisect.bisect_left(self._keys, key)
+        if position == len(self._keys) or self._keys[position] != key:
+            raise errors.MissingRecording("No recorded response matches the request.")
+        _, offset = _INDEX_ENTRY.unpack_from(self._index, position * _INDEX_ENTRY.size)
+        (length,) = _RECORD_HEADER.unpack_from(self._log, offset)
+        start = offset + _RECORD_HEADER.size
+        return json.loads(zlib.decompress(self._log[start : start + length]))
+
+    async def _wait_until(self, start: float, offset: float) -> None:
+        if self._speed is not None:
+            delay = start + offset / self._speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def get_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> models.ChatCompletion:
+        start = time.perf_counter()
+        record = self._lookup(
+            request_key(model, messages, tools, response_format, stream=False)
+        )
+        await self._wait_until(start, record["latency"])
+        return cast(models.ChatCompletion, raw.decode_completion(record["response"]))
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> AsyncGenerator[models.ChatCompletionChunk, None]:
+        start = time.perf_counter()
+        record = self._lookup(
+            request_key(model, messages, tools, response_format, stream=True)
+        )
+        for offset, chunk in record["chunks"]:
+            await self._wait_until(start, offset)
+            yield cast(models.ChatCompletionChunk, raw.decode_chunk(chunk))
+
+    async def warmup(self, connections: int = 1) -> None:
+        pass
+
+    async def close(self) -> None:
+        for mapping in (self._log, self._index):
+            if isinstance(mapping, mmap.mmap):
+                mapping.close()
@@ -0,0 +1,243 @@
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+from types import TracebackType
+from typing import Any, Callable, Sequence, Type
+
+import pydantic
+import pydantic_core
+
+# Characters discarded per read while seeking to an offset in a stored result.
+_SEEK_CHUNK = 1 << 16
+
+
+class ResultSerializer:
+    """
+    Serializes tool results to compact JSON, with a pydantic `TypeAdapter`
+    that is compiled once for the tool's return type.
+    Strings are sent as they are.
+    """
+
+    def __init__(self, annotation: Any = Any, tabular: bool = False) -> None:
+        """
+        Args:
+            annotation: The return type of the tool.
+            tabular: Whether to encode lists of objects with the same fields as a table,
+                     with the field names sent once instead of in every object.
+        """
+        try:
+            self._adapter: pydantic.TypeAdapter = pydantic.TypeAdapter(annotation)
+        except pydantic.PydanticSchemaGenerationError:
+            self._adapter = pydantic.TypeAdapter(Any)
+        self.tabular = tabular
+
+    def __call__(self, result: Any) -> str:
+        if isinstance(result, str):
+            return result
+        try:
+            if self.tabular:
+                return _tabular(
+                    self._adapter.dump_python(result, mode="json", warnings=False)
+                )
+            return self._adapter.dump_json(result, warnings=False).decode()
+        except pydantic_core.PydanticSerializationError:
+            return str(result)
+
+
+def _tabular(value: Any) -> str:
+    if (
+        isinstance(value, list)
+        and len(value) > 1
+        and all(isinstance(item, dict) for item in value)
+        and all(item.keys() == value[0].keys() for item in value)
+    ):
+        value = {
+            "columns": list(value[0]),
+            "rows": [list(item.values()) for item in value],
+        }
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class ResultPolicy:
+    """
+    Converts the return value of a tool to the content of its tool message.
+    The base class sends the full serialized result.
+    """
+
+    def apply(self, result: Any, serialize: Callable[[Any], str] = str) -> str:
+        return serialize(result)
+
+
+class Truncate(ResultPolicy):
+    """
+    Cuts results longer than `max_chars` and marks how much was left out.
+    """
+
+    def __init__(
+        self,
+        max_chars: int,
+        marker: str = "\n[... {omitted} more characters truncated]",
+    ) -> None:
+        self.max_chars = max_chars
+        self.marker = marker
+
+    def apply(self, result: Any, serialize: Callable[[Any], str] = str) -> str:
+        text = super().apply(result, serialize)
+        if len(text) <= self.max_chars:
+            return text
+        omitted = len(text) - self.max_chars
+        return text[: self.max_chars] + self.marker.format(omitted=omitted)
+
+
+class Project(ResultPolicy):
+    """
+    Keeps only the given fields of results that are mappings, pydantic models or objects,
+    and of each item of results that are lists.
+    """
+
+    def __init__(self, fields: Sequence[str], then: ResultPolicy | None = None) -> None:
+        """
+        Args:
+            fields: The names of the fields to keep.
+            then: A policy applied to the projected result, such as `Truncate`.
+        """
+        self.fields = list(fields)
+        self.then = then or ResultPolicy()
+
+    def _project(self, value: Any) -> Any:
+        if isinstance(value, (list, tuple)):
+            return [self._project(item) for item in value]
+        if isinstance(value, pydantic.BaseModel):
+            return value.model_dump(include=set(self.fields))
+        if isinstance(value, dict):
+            return {field: value[field] for field in self.fields if field in value}
+        if hasattr(value, "__dict__"):
+            return {
+                field: getattr(value, field)
+                for field in self.fields
+                if hasattr(value, field)
+            }
+        return value
+
+    def apply(self, result: Any, serialize: Callable[[Any], str] = str) -> str:
+        return self.then.apply(self._project(result), serialize)
+
+
+class BlobStore:
+    """
+    Stores large tool results in files, to be read back in pages by the model.
+    `close` deletes the stored results. A temporary directory is also deleted
+    when the store is garbage collected or the interpreter exits.
+    """
+
+    def __init__(
+        self, directory: str | None = None, max_read_chars: int = 4000
+    ) -> None:
+        """
+        Args:
+            directory: Where results are stored. Defaults to a new temporary directory.
+            max_read_chars: The maximum number of characters returned by a single read.
+        """
+        self.max_read_chars = max_read_chars
+        self._lengths: dict[str, int] = {}
+        if directory is None:
+            self.directory = tempfile.mkdtemp(prefix="llmio-results-")
+            self._cleanup: Callable[[], Any] = weakref.finalize(
+                self, shutil.rmtree, self.directory, ignore_errors=True
+            )
+        else:
+            self.directory = directory
+            os.makedirs(self.directory, exist_ok=True)
+            self._cleanup = self._remove_results
+
+    def _remove_results(self) -> None:
+        for handle in self._lengths:
+            try:
+                os.remove(self._path(handle))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.directory, handle)
+
+    def __contains__(self, handle: str) -> bool:
+        return handle in self._lengths
+
+    def put(self, text: str) -> str:
+        """
+        Stores the text and returns its handle.
+        """
+        handle = f"result-{uuid.uuid4().hex[:12]}"
+        # Newlines are kept as they are, so that offsets count the characters of the text.
+        with open(self._path(handle), "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        self._lengths[handle] = len(text)
+        return handle
+
+    def length(self, handle: str) -> int:
+        return self._lengths[handle]
+
+    def read(self, handle: str, offset: int, length: int) -> str:
+        """
+        Returns `length` characters of the stored text, starting at `offset`,
+        at most `max_read_chars`.
+        """
+        if handle not in self._lengths:
+            raise KeyError(handle)
+        length = max(0, min(length, self.max_read_chars))
+        with open(self._path(handle), encoding="utf-8", newline="") as file:
+            # Characters have variable widths in UTF-8, so the offset is read past in chunks.
+            while offset > 0:
+                skipped = file.read(min(offset, _SEEK_CHUNK))
+                if not skipped:
+                    break
+                offset -= len(skipped)
+            return file.read(length)
+
+    def close(self) -> None:
+        """
+        Deletes the stored results, and the directory if it is temporary.
+        """
+        self._cleanup()
+        self._lengths.clear()
+
+    def __enter__(self) -> "BlobStore":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class Spill(ResultPolicy):
+    """
+    Stores results longer than `max_chars` in a blob store.
+    The tool message then only holds a preview and a handle, and the model
+    can read the full result in pages with the `read_result` tool,
+    which is registered automatically.
+    """
+
+    def __init__(
+        self, store: BlobStore, max_chars: int = 4000, preview_chars: int = 500
+    ) -> None:
+        self.store = store
+        self.max_chars = max_chars
+        self.preview_chars = preview_chars
+
+    def apply(self, result: Any, serialize: Callable[[Any], str] = str) -> str:
+        text = super().apply(result, serialize)
+        if len(text) <= self.max_chars:
+            return text
+        handle = self.store.put(text)
+        return (
+            f"The result has {len(text)} characters and was stored as '{handle}'. "
+            "Call read_result with the handle to read it in parts. "
+            f"It starts with:\n{text[: self.preview_chars]}"
+        )
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Any, Iterable, Protocol, Sequence
+
+from llmio import types as T
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_CAMEL_CASE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase terms. Identifiers in snake case and camel case are split into words.
+    """
+    return _TOKEN.findall(_CAMEL_CASE.sub(" ", text).lower())
+
+
+class BM25:
+    """
+    A BM25 index over a fixed set of documents.
+    The postings of each term are computed up front, so scoring a query
+    only touches the documents that contain its terms.
+    """
+
+    def __init__(
+        self, documents: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75
+    ) -> None:
+        self.size = len(documents)
+        average_length = sum(len(doc) for doc in documents) / (self.size or 1) or 1.0
+        self._postings: dict[str, list[tuple[int, float]]] = {}
+        for position, document in enumerate(documents):
+            norm = k1 * (1 - b + b * len(document) / average_length)
+            for term, frequency in Counter(document).items():
+                weight = frequency * (k1 + 1) / (frequency + norm)
+                self._postings.setdefault(term, []).append((position, weight))
+        self._idf = {
+            term: math.log(
+                1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for term, postings in self._postings.items()
+        }
+
+    def scores(self, query: Iterable[str]) -> list[float]:
+        scores = [0.0] * self.size
+        for term in set(query):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for position, weight in self._postings[term]:
+                scores[position] += idf * weight
+        return scores
+
+
+class EmbeddingBackend(Protocol):
+    """
+    Computes embeddings for tool descriptions and queries, for semantic tool retrieval.
+    """
+
+    async def embed(self, texts: list[str]) -> list[list[float]]: ...
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _tool_document(tool: T.Tool) -> str:
+    """
+    Returns the text a tool is retrieved by: its name, description and parameter descriptions.
+    """
+    function = tool["function"]
+    parts = [function["name"], function.get("description", "")]
+    parameters: Any = function.get("parameters") or {}
+    properties = parameters.get("properties", {})
+    for name, schema in properties.items():
+        parts.append(name)
+        if isinstance(schema, dict):
+            parts.append(str(schema.get("description", "")))
+    return " ".join(parts)
+
+
+def _latest_user_message(messages: Sequence[T.Message]) -> str:
+    for message in reversed(messages):
+        if message["role"] == "user":
+            content: Any = message.get("content")
+            return content if isinstance(content, str) else ""
+    return ""
+
+
+def _called_tools(messages: Sequence[T.Message]) -> set[str]:
+    names = set()
+    for message in messages:
+        if message["role"] == "assistant":
+            for tool_call in message.get("tool_calls") or []:
+                if tool_call["type"] == "function":
+                    names.add(tool_call["function"]["name"])
+    return names
+
+
+class ToolRetriever:
+    """
+    Selects the tools that are relevant to the latest user message,
+    so that agents with large tool catalogs do not send every schema with every request.
+
+    Tools are ranked by BM25 over their names, descriptions and parameter descriptions.
+    With an embedding backend, the BM25 ranking and the embedding similarity ranking
+    are combined by reciprocal rank fusion.
+    Pinned tools and tools that were already called in the history are always sent.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 10,
+        pinned: Iterable[str] = (),
+        embeddings: EmbeddingBackend | None = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        """
+        Args:
+            top_k: The number of relevant tools to send, in addition to pinned and called tools.
+            pinned: Names of tools that are always sent.
+            embeddings: An optional backend for semantic retrieval.
+            k1: The BM25 term frequency saturation.
+            b: The BM25 document length normalization.
+        """
+        self.top_k = top_k
+        self.pinned = set(pinned)
+        self._embeddings = embeddings
+        self._k1 = k1
+        self._b = b
+        self._indexed: tuple[str, ...] = ()
+        self._bm25 = BM25([])
+        self._tool_embeddings: list[list[float]] = []
+
+    async def _index(self, tools: Sequence[T.Tool]) -> None:
+        """
+        Builds the index when the set of tools changed since the last call.
+        """
+        documents = tuple(_tool_document(tool) for tool in tools)
+        if documents == self._indexed:
+            return
+        self._bm25 = BM25(
+            [tokenize(document) for document in documents], k1=self._k1, b=self._b
+        )
+        if self._embeddings is not None:
+            self._tool_embeddings = await self._embeddings.embed(list(documents))
+        self._indexed = documents
+
+    async def _rank(self, query: str) -> list[int]:
+        """
+        Returns the positions of the tools, most relevant first.
+        """
+        bm25 = self._bm25.scores(tokenize(query))
+        # Tools that share no term with the query are not ranked lexically.
+        ranking = sorted(
+            (i for i in range(len(bm25)) if bm25[i] > 0), key=lambda i: -bm25[i]
+        )
+        if self._embeddings is None:
+            return ranking
+
+        (query_embedding,) = await self._embeddings.embed([query])
+        similarity = [_cosine(query_embedding, e) for e in self._tool_embeddings]
+        semantic = sorted(range(len(similarity)), key=lambda i: -similarity[i])
+        # Reciprocal rank fusion, with the constant from the original paper.
+        fused = [0.0] * len(similarity)
+        for ranks in (ranking, semantic):
+            for rank, position in enumerate(ranks):
+                fused[position] += 1 / (60 + rank)
+        return sorted(range(len(fused)), key=lambda i: -fused[i])
+
+    async def select(
+        self, tools: Sequence[T.Tool], messages: Sequence[T.Message]
+    ) -> list[T.Tool]:
+        """
+        Returns the tools to send with a request, in their original order.
+        """
+        if len(tools) <= self.top_k:
+            return list(tools)
+        await self._index(tools)
+        selected = self.pinned | _called_tools(messages)
+        query = _latest_user_message(messages)
+        if query:
+            for position in (await self._rank(query))[: self.top_k]:
+                selected.add(tools[position]["function"]["name"])
+        return [tool for tool in tools if tool["function"]["name"] in selected]
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import math
+import random
+import time
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Sequence
+
+from openai.types.shared_params import ResponseFormatJSONSchema
+
+from llmio import types as T, models
+from llmio.clients import BaseClient
+from llmio.metrics import Metrics
+
+
+@dataclass
+class Route:
+    """
+    A deployment and model that requests can be routed to.
+
+    Args:
+        client: The client of the deployment.
+        model: The model to request. Defaults to the model of the agent.
+        name: The name the route is reported by. Defaults to the model.
+    """
+
+    client: BaseClient
+    model: str | None = None
+    name: str | None = None
+
+
+class _LatencySketch:
+    """
+    A percentile sketch of latencies with logarithmic buckets, so that
+    percentiles are accurate to `accuracy` relative to their value.
+    Older observations are decayed, so that the percentiles follow recent latencies.
+    """
+
+    def __init__(self, accuracy: float = 0.02, decay: float = 0.01) -> None:
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._decay = decay
+        self._buckets: dict[int, float] = {}
+        self.count = 0.0
+
+    def add(self, value: float) -> None:
+        if self._decay:
+            keep = 1 - self._decay
+            for key in self._buckets:
+                self._buckets[key] *= keep
+            self.count *= keep
+        key = math.ceil(math.log(max(value, 1e-6)) / self._log_gamma)
+        self._buckets[key] = self._buckets.get(key, 0.0) + 1
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Returns the latency below which a share `q` of the observations fall.
+        """
+        if not self._buckets:
+            return None
+        rank = q * self.count
+        seen = 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen >= rank:
+                break
+        # The middle of the bucket, in relative terms.
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+
+@dataclass
+class RouteStats:
+    """
+    The online statistics of a route.
+    Latencies are in seconds, and None until the route completed a request.
+    """
+
+    name: str
+    requests: int
+    errors: int
+    error_rate: float
+    latency: float | None
+    p50: float | None
+    p95: float | None
+    p99: float | None
+    # The latency predicted for a prompt of the typical size of the route.
+    predicted: float | None
+
+
+class _RouteState:
+    """
+    Exponentially weighted statistics of one route. The latency is predicted
+    by a weighted least squares fit of latency over prompt size.
+    """
+
+    def __init__(self, alpha: float, sketch_decay: float) -> None:
+        self.alpha = alpha
+        self.requests = 0
+        self.errors = 0
+        self.completed = 0
+        self.error_rate = 0.0
+        self.sketch = _LatencySketch(decay=sketch_decay)
+        # Weighted means of the prompt size x, the latency y, x², and xy.
+        self.x = self.y = self.xx = self.xy = 0.0
+
+    def record_error(self) -> None:
+        self.errors += 1
+        self.error_rate += self.alpha * (1 - self.error_rate)
+
+    def record_latency(self, prompt_tokens: float, latency: float) -> None:
+        self.error_rate -= self.alpha * self.error_rate
+        self.sketch.add(latency)
+        self.completed += 1
+        # The first observation is taken as is, rather than weighted against zeros.
+        alpha = 1.0 if self.completed == 1 else self.alpha
+        self.x += alpha * (prompt_tokens - self.x)
+        self.y += alpha * (latency - self.y)
+        self.xx += alpha * (prompt_tokens * prompt_tokens - self.xx)
+        self.xy += alpha * (prompt_tokens * latency - self.xy)
+
+    def predict(self, prompt_tokens: float) -> float | None:
+        if not self.completed:
+            return None
+        variance = self.xx - self.x * self.x
+        # Latency does not shrink with longer prompts, so a negative slope is noise.
+        slope = (
+            max((self.xy - self.x * self.y) / variance, 0.0) if variance > 1 else 0.0
+        )
+        latency = max(self.y + slope * (prompt_tokens - self.x), 0.0)
+        # The expected time until a request succeeds, if failed requests are retried.
+        return latency / max(1 - self.error_rate, 0.05)
+
+
+def _prompt_tokens(messages: list[T.Message], tools: list[T.Tool]) -> int:
+    # A rough estimate, which only has to be consistent between requests.
+    return len(json.dumps(messages)) // 4 + len(json.dumps(tools)) // 4
+
+
+class AdaptiveRouter(BaseClient):
+    """
+    Routes each request to the route with the lowest predicted completion time,
+    based on online latency and error statistics of each route.
+
+    The latency of a route is predicted from its recent latencies and the size of the prompt,
+    and divided by its recent success rate. Routes that have not completed a request yet
+    are tried first, and a share `exploration` of the requests goes to a random route,
+    so that routes that recovered are noticed.
+    """
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(
+        self,
+        routes: Sequence[Route | BaseClient],
+        exploration: float = 0.05,
+        alpha: float = 0.1,
+        sketch_decay: float = 0.01,
+        metrics: Metrics | None = None,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Args:
+            routes: The routes to choose from. Clients are routed with the agent's model.
+            exploration: The share of requests that are sent to a random route.
+            alpha: The weight of the latest request in the averages of a route.
+            sketch_decay: How fast older latencies fade from the percentiles.
+            metrics: Metrics to record the routed requests into.
+            seed: Seeds the random choice of routes to explore.
+        """
+        if not routes:
+            raise ValueError("At least one route is required.")
+        self.routes = [
+            route if isinstance(route, Route) else Route(route) for route in routes
+        ]
+        self.exploration = exploration
+        self._metrics = metrics
+        self._random = random.Random(seed)
+        self._states = [_RouteState(alpha, sketch_decay) for _ in self.routes]
+
+    def _name(self, index: int) -> str:
+        route = self.routes[index]
+        return route.name or route.model or f"route-{index}"
+
+    def _choose(self, prompt_tokens: int) -> int:
+        untried = [
+            index for index, state in enumerate(self._states) if not state.requests
+        ]
+        if untried:
+            return untried[0]
+        if self._random.random() < self.exploration:
+            return self._random.randrange(len(self.routes))
+
+        def predicted(index: int) -> float:
+            state = self._states[index]
+            prediction = state.predict(prompt_tokens)
+            # Routes that only failed so far are ranked last.
+            return math.inf if prediction is None else prediction
+
+        return min(range(len(self.routes)), key=predicted)
+
+    def _start(self, index: int) -> None:
+        self._states[index].requests += 1
+        if self._metrics is not None:
+            self._metrics.routed_requests.inc(route=self._name(index))
+
+    def stats(self) -> list[RouteStats]:
+        """
+        Returns the statistics of each route, in the order of the routes.
+        """
+        return [
+            RouteStats(
+                name=self._name(index),
+                requests=state.requests,
+                errors=state.errors,
+                error_rate=state.error_rate,
+                latency=state.y if state.completed else None,
+                p50=state.sketch.quantile(0.5),
+                p95=state.sketch.quantile(0.95),
+                p99=state.sketch.quantile(0.99),
+                predicted=state.predict(state.x),
+            )
+            for index, state in enumerate(self._states)
+        ]
+
+    async def get_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> models.ChatCompletion:
+        prompt_tokens = _prompt_tokens(messages, tools)
+        index = self._choose(prompt_tokens)
+        route, state = self.routes[index], self._states[index]
+        self._start(index)
+        start = time.perf_counter()
+        try:
+            completion = await route.client.get_chat_completion(
+                model=route.model or model,
+                messages=messages,
+                tools=tools,
+                response_format=response_format,
+                prompt_cache_key=prompt_cache_key,
+                timeout=timeout,
+            )
+        except Exception:
+            state.record_error()
+            raise
+        state.record_latency(prompt_tokens, time.perf_counter() - start)
+        return completion
+
+    async def stream_chat_completion(
+        self,
+        model: str,
+        messages: list[T.Message],
+        tools: list[T.Tool],
+        response_format: ResponseFormatJSONSchema | None,
+        prompt_cache_key: str | None = None,
+        timeout: float | None = None,
+    ) -> AsyncGenerator[models.ChatCompletionChunk, None]:
+        prompt_tokens = _prompt_tokens(messages, tools)
+        index = self._choose(prompt_tokens)
+        route, state = self.routes[index], self._states[index]
+        self._start(index)
+        # Only the time spent waiting for the route is measured,
+        # not the time the consumer spends on each chunk.
+        waited = 0.0
+        try:
+            async with aclosing(
+                route.client.stream_chat_completion(
+                    model=route.model or model,
+                    messages=messages,
+                    tools=tools,
+                    response_format=response_format,
+                    prompt_cache_key=prompt_cache_key,
+                    timeout=timeout,
+                )
+            ) as chunks:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        chunk = await anext(chunks)
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        waited += time.perf_counter() - start
+                    yield chunk
+        except Exception:
+            state.record_error()
+            raise
+        # Streams that were closed early are not recorded, as their latency is partial.
+        state.record_latency(prompt_tokens, waited)
+
+    @property
+    def _clients(self) -> list[BaseClient]:
+        # Routes may share a client with different models.
+        return list({id(r.client): r.client for r in self.routes}.values())
+
+    async def warmup(self, connections: int = 1) -> None:
+        await asyncio.gather(*(client.warmup(connections) for client in self._clients))
+
+    async def close(self) -> None:
+        for client in self._clients:
+            await client.close()
@@ -0,0 +1,328 @@
+import json
+import re
+from collections import Counter
+from typing import Any
+
+# Definitions up to this size, in characters of JSON, are inlined even when referenced more than once.
+SMALL_DEFINITION_SIZE = 256
+
+_DEF_PREFIX = "#/$defs/"
+# Keywords whose values are data rather than subschemas.
+_DATA_KEYWORDS = {"default", "enum", "const", "examples", "required"}
+
+
+def compress_whitespace(text: str) -> str:
+    """
+    Collapses runs of spaces and blank lines, as found in indented docstrings.
+    """
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" ?\n[ \n]*", "\n", text)
+    return text.strip()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Returns the number of tokens of the text.
+    Uses `tiktoken` if it is installed, and estimates four characters per token otherwise.
+    """
+    try:
+        # pylint: disable-next=import-outside-toplevel
+        import tiktoken  # type: ignore[import-not-found]
+    except ImportError:
+        return (len(text) + 3) // 4
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def _refs(node: Any) -> Counter[str]:
+    counts: Counter[str] = Counter()
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith(_DEF_PREFIX):
+            counts[ref[len(_DEF_PREFIX) :]] += 1
+        for key, value in node.items():
+            if key not in _DATA_KEYWORDS:
+                counts.update(_refs(value))
+    elif isinstance(node, list):
+        for item in node:
+            counts.update(_refs(item))
+    return counts
+
+
+def _collapse_nullable(node: dict[str, Any]) -> dict[str, Any]:
+    """
+    Rewrites `anyOf: [{"type": X}, {"type": "null"}]` to `type: [X, "null"]`.
+    """
+    any_of = node.get("anyOf")
+    if (
+        not isinstance(any_of, list)
+        or len(any_of) != 2
+        or {"type": "null"} not in any_of
+    ):
+        return node
+    (other,) = [branch for branch in any_of if branch != {"type": "null"}]
+    if (
+        not isinstance(other, dict)
+        or not isinstance(other.get("type"), str)
+        or other.keys() & {"enum", "const", "$ref", "anyOf"}
+    ):
+        return node
+    collapsed = {key: value for key, value in node.items() if key != "anyOf"}
+    return {**other, **collapsed, "type": [other["type"], "null"]}
+
+
+def minimize_schema(schema: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns an equivalent JSON schema that costs fewer prompt tokens:
+    small and single-use `$defs` are inlined, titles are dropped at every depth,
+    `null` defaults and nullable `anyOf` unions are simplified,
+    and whitespace in descriptions is compressed.
+    Recursive definitions are kept as references.
+    """
+    definitions: dict[str, Any] = schema.get("$defs", {})
+    counts = _refs(schema)
+    kept: set[str] = set()
+
+    def inlinable(name: str) -> bool:
+        return (
+            counts[name] == 1
+            or len(json.dumps(definitions[name])) <= SMALL_DEFINITION_SIZE
+        )
+
+    def walk(node: Any, stack: frozenset[str]) -> Any:
+        if isinstance(node, list):
+            return [walk(item, stack) for item in node]
+        if not isinstance(node, dict):
+            return node
+
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith(_DEF_PREFIX):
+            name = ref[len(_DEF_PREFIX) :]
+            siblings = walk({k: v for k, v in node.items() if k != "$ref"}, stack)
+            if name in definitions and name not in stack and inlinable(name):
+                return {**walk(definitions[name], stack | {name}), **siblings}
+            if name in definitions:
+                kept.add(name)
+            return {"$ref": ref, **siblings}
+
+        result: dict[str, Any] = {}
+        for key, value in node.items():
+            if key in ("title", "$defs") or (key == "default" and value is None):
+                continue
+            if key == "properties" and isinstance(value, dict):
+                # The keys of `properties` are parameter names, which may well be "title".
+                result[key] = {
+                    name: walk(subschema, stack) for name, subschema in value.items()
+                }
+            elif key == "description" and isinstance(value, str):
+                result[key] = compress_whitespace(value)
+            elif key in _DATA_KEYWORDS:
+                result[key] = value
+            else:
+                result[key] = walk(value, stack)
+        return _collapse_nullable(result)
+
+    minimized = walk(schema, frozenset())
+    kept_definitions: dict[str, Any] = {}
+    while pending := kept - kept_definitions.keys():
+        for name in pending:
+            kept_definitions[name] = walk(definitions[name], frozenset({name}))
+    if kept_definitions:
+        minimized["$defs"] = kept_definitions
+    return minimized
+
+
+# The characters a JSON value of a schema type can start with, as accepted by pydantic.
+# Strings and booleans are accepted for numbers, and NaN and Infinity for floats.
+_FIRST_CHARS = {
+    "string": '"',
+    "array": "[",
+    "object": "{",
+    "null": "n",
+    "integer": '-0123456789"tf',
+    "number": '-0123456789"tfNI',
+}
+_LITERALS = {"t": "true", "f": "false", "n": "null", "N": "NaN", "I": "Infinity"}
+_NUMBER_CHARS = frozenset("0123456789+-.eEInfinity")
+
+# What the parser expects next.
+_VALUE = 0
+_VALUE_OR_END = 1
+_KEY = 2
+_KEY_OR_END = 3
+_COLON = 4
+_AFTER_VALUE = 5
+
+
+def _first_chars(schema: Any) -> tuple[str, str] | None:
+    """
+    Returns the characters a value of the schema can start with and a description of its type,
+    or None if the schema is not simple enough to tell.
+    """
+    if not isinstance(schema, dict):
+        return None
+    if "anyOf" in schema:
+        branches = [_first_chars(branch) for branch in schema["anyOf"]]
+        if any(branch is None for branch in branches):
+            return None
+        return (
+            "".join(chars for chars, _ in branches),  # type: ignore[misc]
+            " or ".join(kind for _, kind in branches),  # type: ignore[misc]
+        )
+    types = schema.get("type")
+    if isinstance(types, str):
+        types = [types]
+    # Formats such as date-time also accept numbers.
+    if not types or "format" in schema or any(t not in _FIRST_CHARS for t in types):
+        return None
+    return "".join(_FIRST_CHARS[t] for t in types), " or ".join(types)
+
+
+class ArgumentPrefixChecker:
+    """
+    Checks the arguments of a tool call while they are streamed, and reports arguments
+    that can no longer become valid: invalid JSON, or values of top-level parameters
+    that start with the wrong type.
+    The checks are conservative, so arguments that pass may still fail validation.
+    """
+
+    def __init__(self, schema: dict[str, Any]) -> None:
+        self._properties: dict[str, Any] = schema.get("properties", {})
+        self._first_chars: dict[str, tuple[str, str] | None] = {}
+        self._stack: list[str] = []
+        self._expect = _VALUE
+        self._in_string = False
+        self._is_key = False
+        self._escape = False
+        self._key: list[str] = []
+        self._current_key = ""
+        self._literal: str | None = None
+        self._literal_position = 0
+        self._in_number = False
+        self.position = 0
+        self.error: str | None = None
+
+    def feed(self, text: str) -> str | None:
+        """
+        Checks the next part of the arguments, and returns the error if they became invalid.
+        """
+        if self.error is not None:
+            return self.error
+        for char in text:
+            error = self._step(char)
+            if error is not None:
+                self.error = f"{error} at position {self.position} of the arguments."
+                return self.error
+            self.position += 1
+        return None
+
+    def _check_type(self, char: str) -> str | None:
+        if self._stack != ["{"] or self._current_key not in self._properties:
+            return None
+        if self._current_key not in self._first_chars:
+            self._first_chars[self._current_key] = _first_chars(
+                self._properties[self._current_key]
+            )
+        expected = self._first_chars[self._current_key]
+        if expected is None or char in expected[0]:
+            return None
+        return f"The argument '{self._current_key}' must be of type {expected[1]}"
+
+    def _start_value(self, char: str) -> str | None:
+        if not self._stack and char != "{":
+            return "The arguments must be a JSON object"
+        error = self._check_type(char)
+        if error is not None:
+            return error
+        if char == "{":
+            self._stack.append("{")
+            self._expect = _KEY_OR_END
+        elif char == "[":
+            self._stack.append("[")
+            self._expect = _VALUE_OR_END
+        elif char == '"':
+            self._in_string = True
+            self._is_key = False
+        elif char in "-0123456789":
+            self._in_number = True
+        elif char in _LITERALS:
+            self._literal = _LITERALS[char]
+            self._literal_position = 1
+        else:
+            return f"Unexpected character {char!r}"
+        return None
+
+    def _end_container(self, char: str) -> bool:
+        if self._stack and char == {"{": "}", "[": "]"}[self._stack[-1]]:
+            self._stack.pop()
+            self._expect = _AFTER_VALUE
+            return True
+        return False
+
+    # pylint: disable-next=too-many-return-statements,too-many-branches
+    def _step(self, char: str) -> str | None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+                if char not in '"\\/bfnrtu':
+                    return "Invalid escape sequence"
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._is_key:
+                    self._current_key = "".join(self._key)
+                    self._expect = _COLON
+                else:
+                    self._expect = _AFTER_VALUE
+                return None
+            if self._is_key:
+                self._key.append(char)
+            return None
+
+        if self._literal is not None:
+            if char != self._literal[self._literal_position]:
+                return f"Unexpected character {char!r}"
+            self._literal_position += 1
+            if self._literal_position == len(self._literal):
+                self._literal = None
+                self._expect = _AFTER_VALUE
+            return None
+
+        if self._in_number:
+            if char in _NUMBER_CHARS:
+                return None
+            self._in_number = False
+            self._expect = _AFTER_VALUE
+
+        if char in " \t\n\r":
+            return None
+
+        if self._expect in (_VALUE, _VALUE_OR_END):
+            if self._expect == _VALUE_OR_END and self._end_container(char):
+                return None
+            return self._start_value(char)
+
+        if self._expect in (_KEY, _KEY_OR_END):
+            if self._expect == _KEY_OR_END and self._end_container(char):
+                return None
+            if char != '"':
+                return "Expected a property name"
+            self._in_string = True
+            self._is_key = True
+            self._key = []
+            return None
+
+        if self._expect == _COLON:
+            if char != ":":
+                return "Expected ':'"
+            self._expect = _VALUE
+            return None
+
+        if not self._stack:
+            return "Unexpected data after the arguments"
+        if char == ",":
+            self._expect = _KEY if self._stack[-1] == "{" else _VALUE
+            return None
+        if self._end_container(char):
+            return None
+        return f"Unexpected character {char!r}"
@@ -0,0 +1,125 @@
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class TurnStats:
+    """
+    Statistics of a single completion request within an interaction.
+    Token counts are None when the API does not report usage.
+    """
+
+    model: str
+    latency: float = 0.0
+    time_to_first_token: float | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    cached_tokens: int | None = None
+    # Whether the stream was stopped before the model finished the message.
+    stopped: bool = False
+    # The attempts of cheaper models of a cascade whose answers were not kept.
+    escalations: list["TurnStats"] = field(default_factory=list)
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """
+        The generation speed of a streamed completion, after the first token.
+        """
+        if self.completion_tokens is None or self.time_to_first_token is None:
+            return None
+        generation_time = self.latency - self.time_to_first_token
+        if generation_time <= 0:
+            return None
+        return self.completion_tokens / generation_time
+
+    def record_usage(self, usage: Any) -> None:
+        """
+        Copies the token counts from the usage reported by the API.
+        """
+        if usage is None:
+            return
+        self.prompt_tokens = usage.prompt_tokens
+        self.completion_tokens = usage.completion_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details is not None:
+            self.cached_tokens = details.cached_tokens
+
+
+# The turn whose completion is being requested, so that clients which choose between
+# models per request can record the model that answered.
+current_turn: ContextVar[TurnStats | None] = ContextVar(
+    "llmio_current_turn", default=None
+)
+
+
+@dataclass
+class ToolStats:
+    """
+    Statistics of a single tool execution.
+    """
+
+    name: str
+    duration: float
+
+
+@dataclass
+class ResponseStats:
+    """
+    Statistics of a full interaction with the agent.
+    """
+
+    turns: list[TurnStats] = field(default_factory=list)
+    tools: list[ToolStats] = field(default_factory=list)
+    tool_rounds: int = 0
+
+    @property
+    def requests(self) -> list[TurnStats]:
+        """
+        All completion requests, including the escalated attempts of cascades.
+        """
+        return [request for turn in self.turns for request in (*turn.escalations, turn)]
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(turn.prompt_tokens or 0 for turn in self.requests)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(turn.completion_tokens or 0 for turn in self.requests)
+
+    @property
+    def cached_tokens(self) -> int:
+        return sum(turn.cached_tokens or 0 for turn in self.requests)
+
+    @property
+    def stopped(self) -> bool:
+        """
+        Whether a stream was stopped early by a stop condition or a stream callback.
+        """
+        return any(turn.stopped for turn in self.turns)
+
+    @property
+    def cache_hit_rate(self) -> float | None:
+        """
+        The share of prompt tokens that were served from the provider's prompt cache.
+        None if the API did not report usage.
+        """
+        if not self.prompt_tokens:
+            return None
+        return self.cached_tokens / self.prompt_tokens
+
+    @property
+    def latency(self) -> float:
+        """
+        The total time spent waiting for completions.
+        """
+        return sum(turn.latency for turn in self.turns)
+
+    @property
+    def tool_time(self) -> float:
+        """
+        The total time spent executing tools.
+        Tools executed in parallel are counted separately.
+        """
+        return sum(tool.duration for tool in self.tools)
@@ -0,0 +1,105 @@
+import asyncio
+import atexit
+import os
+import threading
+from typing import Any, Coroutine, TypeVar
+
+_T = TypeVar("_T")
+
+
+class _LoopThread:
+    """
+    An event loop running forever on a daemon thread, shared by the whole process.
+    Keeping one loop alive keeps the connection pools of the clients alive with it.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run, name="llmio-event-loop", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+_lock = threading.Lock()
+_loop_thread: _LoopThread | None = None
+
+
+def _get_loop_thread() -> _LoopThread:
+    global _loop_thread  # pylint: disable=global-statement
+    with _lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        return _loop_thread
+
+
+def _shutdown() -> None:
+    if _loop_thread is not None:
+        _loop_thread.stop()
+
+
+def _reset_after_fork() -> None:
+    # The loop thread does not survive a fork, so forked workers start their own.
+    global _loop_thread, _lock  # pylint: disable=global-statement
+    _lock = threading.Lock()
+    _loop_thread = None
+
+
+atexit.register(_shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def run_sync(coroutine: Coroutine[Any, Any, _T]) -> _T:
+    """
+    Runs the coroutine on the shared background event loop and blocks until it is done.
+    Safe to call from any number of threads at once.
+    If the calling thread is interrupted, the coroutine is cancelled.
+    """
+    loop_thread = _get_loop_thread()
+    if threading.current_thread() is loop_thread.thread:
+        coroutine.close()
+        raise RuntimeError(
+            "run_sync cannot be called from the background event loop, as it would deadlock. "
+            "Await the coroutine instead."
+        )
+    future = asyncio.run_coroutine_threadsafe(coroutine, loop_thread.loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+class SyncAgent:
+    """
+    A blocking interface to an agent, for synchronous code such as WSGI applications.
+
+    Calls run on the shared background event loop instead of a new loop per call
+    with `asyncio.run`, so the connection pool of the client stays warm between calls.
+    Other attributes are those of the wrapped agent.
+    """
+
+    def __init__(self, agent: Any) -> None:
+        """
+        Args:
+            agent: An `Agent` or `StructuredAgent`.
+        """
+        self.agent = agent
+
+    def speak(self, *args: Any, **kwargs: Any) -> Any:
+        """
+        Blocking version of the `speak` method of the agent, with the same arguments.
+        """
+        return run_sync(self.agent.speak(*args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.agent, name)
@@ -0,0 +1,76 @@
+from types import TracebackType
+from typing import Any, ContextManager, Iterator, Type
+import contextlib
+
+
+class Span:
+    """
+    A span covering one phase of the agent loop.
+    The base class records nothing.
+    """
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Type[BaseException] | None,
+        exc: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        pass
+
+
+_NOOP_SPAN = Span()
+
+
+class Tracer:
+    """
+    Creates spans around the phases of the agent loop.
+    The base class is a no-op tracer, which is used by default.
+    Subclass it and override `span` to send spans to a tracing backend.
+    Spans opened while another span is active are expected to become its children.
+    """
+
+    def span(
+        self, name: str, attributes: dict[str, Any] | None = None
+    ) -> ContextManager[Span]:
+        """
+        Returns a context manager that opens a span with the given name and attributes.
+        """
+        return _NOOP_SPAN
+
+
+class _OpenTelemetrySpan(Span):
+    def __init__(self, span: Any) -> None:
+        self._span = span
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self._span.set_attribute(key, value)
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Sends spans to OpenTelemetry. Requires the `opentelemetry-api` package.
+    """
+
+    def __init__(self, tracer: Any = None) -> None:
+        """
+        Args:
+            tracer: An OpenTelemetry tracer. Defaults to the global tracer named `llmio`.
+        """
+        if tracer is None:
+            from opentelemetry import trace  # pylint: disable=import-outside-toplevel
+
+            tracer = trace.get_tracer("llmio")
+        self._tracer = tracer
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, attributes: dict[str, Any] | None = None
+    ) -> Iterator[Span]:
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield _OpenTelemetrySpan(span)
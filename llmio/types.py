@@ -1,25 +1,29 @@
-from openai.types.chat import (
-    ChatCompletionMessageParam,
-    ChatCompletionToolParam,
-    ChatCompletionToolMessageParam,
-    ChatCompletionAssistantMessageParam,
-    ChatCompletionUserMessageParam,
-    ChatCompletionSystemMessageParam,
-    ChatCompletionMessageToolCallParam,
-)
-from openai.types.shared_params import FunctionDefinition as FunctionDefinition_
-import openai.types.chat.chat_completion_message_tool_call_param
+from typing import TYPE_CHECKING, Any
 
+if TYPE_CHECKING:
+    from openai.types.chat import (
+        ChatCompletionMessageParam,
+        ChatCompletionToolParam,
+        ChatCompletionToolMessageParam,
+        ChatCompletionAssistantMessageParam,
+        ChatCompletionUserMessageParam,
+        ChatCompletionSystemMessageParam,
+        ChatCompletionMessageToolCallParam,
+    )
+    from openai.types.shared_params import FunctionDefinition as FunctionDefinition_
+    import openai.types.chat.chat_completion_message_tool_call_param
 
-Message = ChatCompletionMessageParam
-Tool = ChatCompletionToolParam
-ToolMessage = ChatCompletionToolMessageParam
-AssistantMessage = ChatCompletionAssistantMessageParam
-UserMessage = ChatCompletionUserMessageParam
-SystemMessage = ChatCompletionSystemMessageParam
-ToolCall = ChatCompletionMessageToolCallParam
-ToolCallFunction = openai.types.chat.chat_completion_message_tool_call_param.Function
-FunctionDefinition = FunctionDefinition_
+    Message = ChatCompletionMessageParam
+    Tool = ChatCompletionToolParam
+    ToolMessage = ChatCompletionToolMessageParam
+    AssistantMessage = ChatCompletionAssistantMessageParam
+    UserMessage = ChatCompletionUserMessageParam
+    SystemMessage = ChatCompletionSystemMessageParam
+    ToolCall = ChatCompletionMessageToolCallParam
+    ToolCallFunction = (
+        openai.types.chat.chat_completion_message_tool_call_param.Function
+    )
+    FunctionDefinition = FunctionDefinition_
 
 
 __all__ = [
@@ -33,3 +37,26 @@ __all__ = [
     "ToolCallFunction",
     "FunctionDefinition",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing openai is slow, so the types are only imported once they are used.
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # pylint: disable=import-outside-toplevel
+    from openai.types import chat, shared_params
+    from openai.types.chat import chat_completion_message_tool_call_param
+
+    values = {
+        "Message": chat.ChatCompletionMessageParam,
+        "Tool": chat.ChatCompletionToolParam,
+        "ToolMessage": chat.ChatCompletionToolMessageParam,
+        "AssistantMessage": chat.ChatCompletionAssistantMessageParam,
+        "UserMessage": chat.ChatCompletionUserMessageParam,
+        "SystemMessage": chat.ChatCompletionSystemMessageParam,
+        "ToolCall": chat.ChatCompletionMessageToolCallParam,
+        "ToolCallFunction": chat_completion_message_tool_call_param.Function,
+        "FunctionDefinition": shared_params.FunctionDefinition,
+    }
+    globals().update(values)
+    return values[name]
@@ -0,0 +1,80 @@
+import httpx
+import pytest
+
+from llmio import Agent, OpenAIClient
+from llmio.bench import BenchConfig, BenchResult, MockServer, Step, run
+
+
+def _agent(server: MockServer, raw: bool) -> Agent:
+    agent = Agent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc", base_url=server.url, raw=raw),
+    )
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    return agent
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("raw", [False, True])
+async def test_mock_server(stream: bool, raw: bool) -> None:
+    script = [
+        Step(content="Adding.", tool_calls=[("add", {"num1": 1, "num2": 2})]),
+        Step(content="The answer is 3"),
+    ]
+    async with MockServer(script=script) as server:
+        agent = _agent(server, raw=raw)
+        response = await agent.speak("What is 1 + 2?", stream=stream)
+        response = await agent.speak("Thanks!", history=response.history, stream=stream)
+
+    assert response.messages == ["Adding.", "The answer is 3"]
+    assert [message["role"] for message in response.history] == [
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+    ]
+    assert response.history[2]["content"] == "3.0"
+    assert response.stats.prompt_tokens > 0
+    assert server.requests == 4
+
+
+async def test_run() -> None:
+    result = await run(BenchConfig(sessions=4, turns=2, concurrency=2))
+
+    assert result.speaks == 8
+    assert result.speaks_per_second > 0
+    assert result.p50 is not None and result.p99 is not None
+    assert 0 < result.p50 <= result.p99
+    assert result.cpu_per_turn > 0
+    assert "speaks/s" in result.report()
+
+
+def test_percentiles_of_few_samples() -> None:
+    result = BenchResult(
+        speaks=1, duration=1.0, latencies=[0.5], cpu_time=0.1, memory_per_session=0
+    )
+    assert result.p50 == result.p99 == 0.5
+    assert "500.00 ms" in result.report()
+
+    result.latencies = [0.1, 0.2]
+    assert result.p99 is not None and result.p99 <= 0.2
+
+    result.latencies = []
+    assert result.p50 is None
+    assert "n/a" in result.report()
+
+
+async def test_status_phrase() -> None:
+    async with MockServer() as server, httpx.AsyncClient() as client:
+        response = await client.get(f"{server.url}/models")
+
+    assert response.status_code == 404
+    assert response.reason_phrase == "Not Found"
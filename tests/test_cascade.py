@@ -0,0 +1,218 @@
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import pydantic
+import pytest
+from openai.types import CompletionUsage
+
+from llmio import Agent, Cascade, OpenAIClient, StructuredAgent, models
+from llmio.metrics import Metrics
+
+
+def _completion(
+    content: str | None = None,
+    tool_call: tuple[str, str] | None = None,
+    prompt_tokens: int = 10,
+) -> models.ChatCompletion:
+    tool_calls: Any = None
+    if tool_call is not None:
+        tool_calls = [
+            models.ToolCall(
+                id="call_1",
+                type="function",
+                function=models.Function(name=tool_call[0], arguments=tool_call[1]),
+            )
+        ]
+    return models.ChatCompletion.construct(
+        choices=[
+            models.Choice.construct(
+                message=models.ChatCompletionMessage(
+                    role="assistant", content=content, tool_calls=tool_calls
+                )
+            )
+        ],
+        usage=CompletionUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=5,
+            total_tokens=prompt_tokens + 5,
+        ),
+    )
+
+
+class _Models:
+    """
+    Answers each model with its scripted completions, after a delay.
+    """
+
+    def __init__(self, **script: list[models.ChatCompletion]) -> None:
+        self.script = script
+        self.delays: dict[str, float] = {}
+        self.requested: list[str] = []
+
+    async def complete(self, model: str, **kwargs: Any) -> models.ChatCompletion:
+        self.requested.append(model)
+        await asyncio.sleep(self.delays.get(model, 0))
+        return self.script[model].pop(0)
+
+
+def _agent(cascade: Cascade, metrics: Metrics | None = None) -> Agent:
+    agent = Agent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc"),
+        cascade=cascade,
+        metrics=metrics,
+    )
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    return agent
+
+
+async def test_invalid_answers_escalate() -> None:
+    metrics = Metrics()
+    cascade = Cascade(["small", "large"])
+    mock = _Models(
+        small=[
+            _completion(tool_call=("subtract", '{"num1": 1, "num2": 2}')),
+            _completion("The answer is 3"),
+        ],
+        large=[_completion(tool_call=("add", '{"num1": 1, "num2": 2}'))],
+    )
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion", side_effect=mock.complete
+    ):
+        response = await _agent(cascade, metrics).speak("What is 1 + 2?")
+
+    assert response.messages == ["The answer is 3"]
+    assert mock.requested == ["small", "large", "small"]
+    assert [turn.model for turn in response.stats.turns] == ["large", "small"]
+    assert cascade.hit_rates() == {"small": 0.5, "large": 0.5}
+    rendered = metrics.render()
+    assert 'llmio_cascade_answers_total{model="small"} 1' in rendered
+    assert (
+        'llmio_cascade_escalations_total{model="small",reason="invalid"} 1' in rendered
+    )
+
+
+async def test_confidence_and_latency_budget() -> None:
+    async def confident(completion: models.ChatCompletion) -> bool:
+        return "not sure" not in (completion.choices[0].message.content or "")
+
+    cascade = Cascade(
+        ["small", "medium", "large"], confidence=confident, latency_budget=0.1
+    )
+    mock = _Models(
+        small=[_completion("I am not sure"), _completion("Hello")],
+        medium=[_completion("Hi"), _completion("Hey")],
+        large=[_completion("Good day")],
+    )
+    mock.delays["medium"] = 0.2
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion", side_effect=mock.complete
+    ):
+        agent = _agent(cascade)
+        first = await agent.speak("Hello")
+        second = await agent.speak("Hello")
+
+    # The last model is kept regardless of the confidence hook and the budget.
+    assert first.messages == ["Good day"]
+    assert second.messages == ["Hello"]
+    assert cascade.hits == {"small": 1, "large": 1}
+
+
+async def test_streaming_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        await _agent(Cascade(["small", "large"])).speak("Hello", stream=True)
+
+
+async def test_invalid_arguments_escalate() -> None:
+    mock = _Models(
+        small=[
+            _completion(tool_call=("add", '{"num1": 1}')),
+            _completion("The answer is 3"),
+        ],
+        large=[_completion(tool_call=("add", '{"num1": 1, "num2": 2}'))],
+    )
+    cascade = Cascade(["small", "large"])
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion", side_effect=mock.complete
+    ):
+        response = await _agent(cascade).speak("What is 1 + 2?")
+
+    assert response.messages == ["The answer is 3"]
+    assert mock.requested == ["small", "large", "small"]
+
+
+class Answer(pydantic.BaseModel):
+    value: int
+
+
+async def test_structured_output_escalates() -> None:
+    mock = _Models(
+        small=[_completion('{"value": "three"}')],
+        large=[_completion('{"value": 3}')],
+    )
+    agent = StructuredAgent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc"),
+        response_format=Answer,
+        cascade=Cascade(["small", "large"]),
+    )
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion", side_effect=mock.complete
+    ):
+        response = await agent.speak("What is 1 + 2?")
+
+    assert response.messages == [Answer(value=3)]
+
+
+async def test_escalated_usage_is_recorded() -> None:
+    metrics = Metrics()
+    mock = _Models(
+        small=[_completion("I am not sure", prompt_tokens=10)],
+        large=[_completion("Hello", prompt_tokens=100)],
+    )
+    cascade = Cascade(
+        ["small", "large"],
+        confidence=lambda completion: "not sure"
+        not in (completion.choices[0].message.content or ""),
+    )
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion", side_effect=mock.complete
+    ):
+        response = await _agent(cascade, metrics).speak("Hello")
+
+    (turn,) = response.stats.turns
+    assert turn.model == "large"
+    assert [(e.model, e.prompt_tokens) for e in turn.escalations] == [("small", 10)]
+    assert response.stats.prompt_tokens == 110
+    assert response.stats.completion_tokens == 10
+    rendered = metrics.render()
+    assert 'llmio_prompt_tokens_count{model="small"} 1' in rendered
+    assert 'llmio_prompt_tokens_count{model="large"} 1' in rendered
+
+
+async def test_lax_arguments_do_not_escalate() -> None:
+    mock = _Models(
+        small=[
+            _completion(tool_call=("add", '{"num1": true, "num2": 2}')),
+            _completion("The answer is 3"),
+        ],
+    )
+    cascade = Cascade(["small", "large"])
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion", side_effect=mock.complete
+    ):
+        response = await _agent(cascade).speak("What is true + 2?")
+
+    assert response.messages == ["The answer is 3"]
+    assert mock.requested == ["small", "small"]
+    assert cascade.hits == {"small": 2}
+
+
+def test_no_models() -> None:
+    with pytest.raises(ValueError):
+        Cascade([])
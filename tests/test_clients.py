@@ -0,0 +1,64 @@
+import httpx
+
+from llmio import OpenAIClient, AzureOpenAIClient, GeminiClient, create_http_client
+
+
+def _counting_transport() -> tuple[httpx.MockTransport, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler), requests
+
+
+async def test_warmup() -> None:
+    transport, requests = _counting_transport()
+    http_client = httpx.AsyncClient(transport=transport)
+    client = OpenAIClient(
+        api_key="abc", base_url="http://localhost:8000/v1", http_client=http_client
+    )
+
+    await client.warmup(connections=3)
+
+    assert len(requests) == 3
+    assert all(str(r.url) == "http://localhost:8000/v1/" for r in requests)
+
+
+async def test_shared_http_client_is_not_closed() -> None:
+    transport, _ = _counting_transport()
+    http_client = httpx.AsyncClient(transport=transport)
+
+    async with OpenAIClient(api_key="abc", http_client=http_client):
+        pass
+    async with GeminiClient(
+        api_key="abc", base_url="http://localhost:8000", http_client=http_client
+    ):
+        pass
+
+    assert not http_client.is_closed
+    await http_client.aclose()
+
+
+async def test_owned_http_client_is_closed() -> None:
+    async with AzureOpenAIClient(
+        api_key="abc",
+        endpoint="http://localhost:8000",
+        api_version="2024.01.01",
+        max_connections=10,
+        max_keepalive_connections=5,
+        keepalive_expiry=30,
+        timeout=10,
+    ) as client:
+        assert not client._http_client.is_closed
+
+    assert client._http_client.is_closed
+
+
+def test_create_http_client() -> None:
+    http_client = create_http_client(max_connections=7, timeout=3)
+
+    assert http_client.timeout == httpx.Timeout(3)
+    client = OpenAIClient(api_key="abc", http_client=http_client)
+    assert client._http_client is http_client
@@ -0,0 +1,67 @@
+import json
+from typing import Any
+
+import pytest
+
+from llmio import models, types as T
+from llmio.codec import append_history, decode_history, encode_history
+
+HISTORY: list[T.Message] = [
+    {"role": "system", "content": "You are a calculator."},
+    {"role": "user", "content": "What is 1 + 2? 🧮 æøå"},
+    {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": "add_1",
+                "type": "function",
+                "function": {"name": "add", "arguments": '{"num1": 1, "num2": 2}'},
+            },
+            {
+                "id": "add_2",
+                "type": "function",
+                "function": {"name": "add", "arguments": "{}"},
+            },
+        ],
+    },
+    {"role": "tool", "content": "3.0", "tool_call_id": "add_1"},
+    {"role": "assistant", "content": ""},
+    # Messages outside the compact layout are kept as JSON.
+    {"role": "user", "content": [{"type": "text", "text": "Thanks"}]},
+    {"role": "assistant", "content": "Bye", "refusal": None},
+]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(compress: bool) -> None:
+    blob = encode_history(HISTORY, compress=compress)
+    assert decode_history(blob) == HISTORY
+    assert len(blob) < len(json.dumps(HISTORY).encode())
+
+
+def test_append() -> None:
+    blob = encode_history(HISTORY[:3])
+    blob = append_history(blob, HISTORY[3:5], compress=True)
+    blob = append_history(blob, HISTORY[5:])
+
+    assert decode_history(blob) == HISTORY
+    assert blob.startswith(encode_history(HISTORY[:3]))
+    assert decode_history(append_history(b"", HISTORY)) == HISTORY
+    assert decode_history(encode_history([])) == []
+
+
+def test_null_tool_calls() -> None:
+    message = models.ChatCompletionMessage(role="assistant", content="Hi")
+    history: Any = [
+        {"role": "assistant", "content": "Hi", "tool_calls": None},
+        message.model_dump(),
+    ]
+    assert decode_history(encode_history(history)) == history
+
+
+def test_invalid_blob() -> None:
+    with pytest.raises(ValueError):
+        decode_history(json.dumps(HISTORY).encode())
+    with pytest.raises(ValueError):
+        append_history(b"[]", HISTORY)
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from llmio import Agent, OpenAIClient, StreamDelivery
+from llmio.bench import MockServer, Step
+
+
+async def test_coalescing() -> None:
+    delivered: list[str] = []
+
+    async def deliver(text: str) -> None:
+        delivered.append(text)
+
+    async with StreamDelivery(interval=0.05).start(deliver) as put:
+        for i in range(100):
+            await put(f"{i} ")
+
+    assert "".join(delivered) == "".join(f"{i} " for i in range(100))
+    assert len(delivered) == 1
+
+    delivered.clear()
+    async with StreamDelivery(interval=10, max_chars=10).start(deliver) as put:
+        for _ in range(5):
+            await put("a" * 10)
+            await asyncio.sleep(0)
+
+    assert delivered == ["a" * 10] * 5
+
+
+@pytest.mark.parametrize("overflow", ["block", "drop", "unbounded"])
+async def test_overflow(overflow: str) -> None:
+    delivered: list[str] = []
+    dropped: list[int] = []
+
+    async def deliver(text: str) -> None:
+        await asyncio.sleep(0.02)
+        delivered.append(text)
+
+    delivery = StreamDelivery(
+        interval=0, max_chars=1, max_buffer=10, overflow=overflow  # type: ignore[arg-type]
+    )
+    async with delivery.start(deliver, on_drop=dropped.append) as put:
+        for _ in range(20):
+            await put("a" * 5)
+
+    total = len("".join(delivered))
+    if overflow == "drop":
+        assert total + sum(dropped) == 100
+        assert dropped
+    else:
+        assert total == 100
+        assert not dropped
+    if overflow == "block":
+        assert max(len(text) for text in delivered) <= 15
+
+
+async def test_callback_errors() -> None:
+    async def deliver(text: str) -> None:
+        raise ValueError(text)
+
+    with pytest.raises(ValueError, match="a"):
+        async with StreamDelivery(interval=0).start(deliver) as put:
+            await put("a")
+            await asyncio.sleep(0.01)
+            await put("b")
+
+
+async def test_agent_stream_delivery() -> None:
+    content = " ".join(f"word{i}" for i in range(200))
+    async with MockServer(script=[Step(content=content)]) as server:
+        agent = Agent(
+            instruction="You are a helpful assistant",
+            client=OpenAIClient(api_key="abc", base_url=server.url),
+            stream_delivery=StreamDelivery(interval=0.01),
+        )
+        deltas: list[str] = []
+
+        @agent.on_stream
+        async def on_stream(delta: str) -> None:
+            # A slow consumer, such as a websocket write.
+            await asyncio.sleep(0.005)
+            deltas.append(delta)
+
+        response = await agent.speak("Hello", stream=True)
+
+    assert response.messages == [content]
+    assert "".join(deltas) == content
+    assert len(deltas) < 200
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from llmio import Agent, OpenAIClient, types as T
+from llmio.bench import MockServer
+from llmio.metrics import Metrics
+
+
+def _agent(server: MockServer, metrics: Metrics | None = None) -> Agent:
+    return Agent(
+        instruction="You are a helpful assistant",
+        client=OpenAIClient(api_key="abc", base_url=server.url),
+        metrics=metrics,
+    )
+
+
+async def test_concurrent_hooks() -> None:
+    async with MockServer() as server:
+        agent = _agent(server)
+        calls = []
+
+        @agent.inspect_prompt(concurrent=True)
+        async def first(prompt: list[T.Message]) -> None:
+            start = time.perf_counter()
+            await asyncio.sleep(0.1)
+            calls.append(("first", start, time.perf_counter()))
+
+        @agent.inspect_prompt(concurrent=True)
+        def second(prompt: list[T.Message]) -> None:
+            start = time.perf_counter()
+            time.sleep(0.1)
+            calls.append(("second", start, time.perf_counter()))
+
+        @agent.inspect_prompt
+        async def third(prompt: list[T.Message]) -> None:
+            start = time.perf_counter()
+            await asyncio.sleep(0.1)
+            calls.append(("third", start, time.perf_counter()))
+
+        await agent.speak("Hello")
+
+    assert sorted(name for name, _, _ in calls) == ["first", "second", "third"]
+    # The hooks ran at the same time rather than one after another.
+    assert max(end for _, _, end in calls) - min(start for _, start, _ in calls) < 0.2
+
+
+async def test_background_hooks(caplog: pytest.LogCaptureFixture) -> None:
+    metrics = Metrics()
+    async with MockServer() as server:
+        agent = _agent(server, metrics)
+        released = asyncio.Event()
+        outputs = []
+        messages = []
+
+        @agent.inspect_output(background=True)
+        async def log_output(output: T.AssistantMessage) -> None:
+            await released.wait()
+            outputs.append(output["content"])
+
+        @agent.on_message(background=True)
+        def log_message(_context: str, message: str) -> None:
+            messages.append((_context, message))
+
+        @agent.on_message(background=True)
+        async def failing(message: str) -> None:
+            raise ValueError("analytics are down")
+
+        # The interaction does not wait for the background hooks.
+        response = await agent.speak("Hello", _context="ctx")
+        assert response.messages == ["This is a mocked reply."]
+        assert outputs == []
+
+        released.set()
+        with caplog.at_level(logging.ERROR, logger="llmio"):
+            await agent.flush()
+
+    assert outputs == ["This is a mocked reply."]
+    assert messages == [("ctx", "This is a mocked reply.")]
+    assert "Background hook failing failed" in caplog.text
+    assert 'llmio_background_hook_errors_total{hook="failing"} 1' in metrics.render()
+
+
+async def test_flush_timeout() -> None:
+    async with MockServer() as server:
+        agent = _agent(server)
+        cancelled = False
+
+        @agent.inspect_prompt(background=True)
+        async def slow(prompt: list[T.Message]) -> None:
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        await agent.speak("Hello")
+        await agent.flush(timeout=0.01)
+        await asyncio.sleep(0)
+
+    assert cancelled
+
+
+def test_invalid_hook() -> None:
+    agent = Agent(instruction="", client=OpenAIClient(api_key="abc"))
+    with pytest.raises(ValueError):
+        agent.inspect_prompt(concurrent=True, background=True)
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+# Cumulative import time of `import llmio`, in microseconds.
+# The package itself is tiny, so exceeding this means something heavy is imported eagerly.
+IMPORT_TIME_THRESHOLD_US = 50_000
+
+# Import time of `from llmio import Agent`, in seconds.
+# Importing openai alone takes longer, so exceeding this means the SDK is imported eagerly.
+AGENT_IMPORT_TIME_THRESHOLD = 0.4
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_is_lazy() -> None:
+    result = _run(
+        "import sys, llmio; print('openai' in sys.modules, 'pydantic' in sys.modules)"
+    )
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_import_time() -> None:
+    result = _run("import llmio", "-X", "importtime")
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    cumulative = [
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.split("|")[-1].strip() == "llmio"
+    ]
+    assert cumulative and cumulative[0] < IMPORT_TIME_THRESHOLD_US
+
+
+def test_agent_import_is_lazy() -> None:
+    result = _run(
+        "import sys, time; start = time.perf_counter(); from llmio import Agent; "
+        "print(time.perf_counter() - start, 'openai' in sys.modules)"
+    )
+    elapsed, openai_imported = result.stdout.split()
+    assert openai_imported == "False"
+    assert float(elapsed) < AGENT_IMPORT_TIME_THRESHOLD
+
+
+def test_lazy_attributes() -> None:
+    import llmio  # pylint: disable=import-outside-toplevel
+    from llmio import agent  # pylint: disable=import-outside-toplevel
+
+    assert llmio.Agent is agent.Agent
+    assert set(llmio.__all__) <= set(dir(llmio))
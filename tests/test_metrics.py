@@ -0,0 +1,177 @@
+import json
+import threading
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from llmio import Agent, errors, models, OpenAIClient
+from llmio.bench import MockServer, Step
+from llmio.metrics import Metrics, Registry, start_http_server
+
+from tests.utils import mocked_async_openai_replies
+
+
+def test_render() -> None:
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests.", ["path"])
+    gauge = registry.gauge("in_flight", "In flight.")
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=[0.1, 1])
+
+    counter.inc(path='/a"b')
+    counter.inc(2, path='/a"b')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(5)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/a\\"b"} 3.0\n'
+        "# HELP in_flight In flight.\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 1.0\n"
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 2.0\n'
+        'latency_seconds_bucket{le="1.0"} 2.0\n'
+        'latency_seconds_bucket{le="+Inf"} 3.0\n'
+        "latency_seconds_sum 5.15\n"
+        "latency_seconds_count 3.0\n"
+    )
+
+
+def test_registration() -> None:
+    registry = Registry()
+    counter = registry.counter("total", "Total.", ["label"])
+
+    assert registry.counter("total", "Total.", ["label"]) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("total", "Total.", ["label"])
+    with pytest.raises(ValueError):
+        counter.inc(other="value")
+
+
+def test_recording_from_threads() -> None:
+    counter = Registry().counter("total", "Total.")
+
+    def record() -> None:
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value() == 8000
+
+
+def test_http_server() -> None:
+    registry = Registry()
+    registry.counter("total", "Total.").inc()
+    server = start_http_server(registry, port=0, host="127.0.0.1")
+    try:
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        ) as response:
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
+
+
+async def test_agent_metrics() -> None:
+    metrics = Metrics()
+    agent = Agent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc", metrics=metrics),
+        graceful_errors=True,
+        metrics=metrics,
+    )
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    mocks = [
+        models.ChatCompletionMessage.construct(
+            role="assistant",
+            tool_calls=[
+                models.ToolCall.construct(
+                    id="add_1",
+                    type="function",
+                    function=models.Function.construct(
+                        name="add", arguments=json.dumps({"num1": 1})
+                    ),
+                ),
+                models.ToolCall.construct(
+                    id="add_2",
+                    type="function",
+                    function=models.Function.construct(
+                        name="add", arguments=json.dumps({"num1": 1, "num2": 2})
+                    ),
+                ),
+            ],
+        ),
+        models.ChatCompletionMessage.construct(role="assistant", content="3"),
+    ]
+    with mocked_async_openai_replies(mocks):
+        await agent.speak("What is 1 + 2?")
+
+    assert metrics.completion_latency.count(model="gpt-4o-mini") == 2
+    assert metrics.tool_latency.count(tool="add") == 1
+    assert metrics.bad_tool_calls.value(reason="invalid_arguments") == 1
+    assert metrics.retries.value(model="gpt-4o-mini") == 1
+    assert metrics.speaks_in_flight.value() == 0
+    assert metrics.tools_in_flight.value(tool="add") == 0
+    assert 'llmio_tool_latency_seconds_count{tool="add"} 1.0' in metrics.render()
+
+
+async def test_client_metrics() -> None:
+    metrics = Metrics()
+    agent = Agent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc", metrics=metrics),
+    )
+
+    with patch(
+        "llmio.clients.BaseClient._request_chat_completion",
+        side_effect=RuntimeError("Connection failed"),
+    ):
+        with pytest.raises(RuntimeError):
+            await agent.speak("What is 1 + 2?")
+
+    assert (
+        metrics.client_requests.value(model="gpt-4o-mini", outcome="RuntimeError") == 1
+    )
+
+
+async def test_closed_streams_are_recorded() -> None:
+    metrics = Metrics()
+    async with MockServer(
+        script=[Step(content=" ".join(["word"] * 100))], chunks_per_second=100
+    ) as server:
+        agent = Agent(
+            instruction="You are a helpful assistant",
+            client=OpenAIClient(api_key="abc", base_url=server.url, metrics=metrics),
+            metrics=metrics,
+        )
+
+        stopping = True
+
+        @agent.stop_when
+        def stop(content: str) -> bool:
+            return stopping and len(content) > 10
+
+        await agent.speak("Hello", stream=True)
+        stopping = False
+        with pytest.raises(errors.DeadlineExceeded):
+            await agent.speak("Hello", stream=True, deadline=0.1)
+
+    assert metrics.client_requests.value(model="gpt-4o-mini", outcome="closed") == 1
+    assert metrics.client_requests.value(model="gpt-4o-mini", outcome="cancelled") == 1
+    assert metrics.completion_latency.count(model="gpt-4o-mini") == 2
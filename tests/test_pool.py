@@ -0,0 +1,67 @@
+import asyncio
+import functools
+
+from llmio import Agent, OpenAIClient
+from llmio.bench import MockServer, Step
+from llmio.pool import AgentPool, _HashRing
+
+
+def _agent(url: str) -> Agent:
+    agent = Agent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc", base_url=url),
+    )
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    return agent
+
+
+def test_hash_ring() -> None:
+    ring = _HashRing(slots=4, virtual_nodes=64)
+    keys = [f"session-{i}" for i in range(1000)]
+    slots = [ring.slot(key) for key in keys]
+
+    assert slots == [ring.slot(key) for key in keys]
+    assert all(slots.count(slot) > 150 for slot in range(4))
+
+    # Adding a slot only moves the keys that the new slot takes over.
+    grown = _HashRing(slots=5, virtual_nodes=64)
+    moved = [key for key, slot in zip(keys, slots) if grown.slot(key) != slot]
+    assert all(grown.slot(key) == 4 for key in moved)
+
+
+async def test_pool() -> None:
+    script = [
+        Step(content="Adding.", tool_calls=[("add", {"num1": 1, "num2": 2})]),
+        Step(content="The answer is 3"),
+    ]
+    async with MockServer(script=script) as server:
+        factory = functools.partial(_agent, server.url)
+        async with AgentPool(factory, workers=2, health_interval=0.1) as pool:
+            responses = await asyncio.gather(
+                *(
+                    pool.speak("What is 1 + 2?", session_key=f"session-{i}")
+                    for i in range(4)
+                )
+            )
+            assert [response.messages for response in responses] == [
+                ["Adding.", "The answer is 3"]
+            ] * 4
+            assert responses[0].history[2]["content"] == "3.0"
+            assert pool.worker_for("session-1") == pool.worker_for("session-1")
+
+            # A worker that dies is restarted by the health check.
+            pool._workers[0].process.kill()
+            for _ in range(100):
+                if pool.restarts:
+                    break
+                await asyncio.sleep(0.1)
+            assert pool.restarts == 1
+
+            response = await pool.speak(
+                "Thanks!", history=responses[0].history, session_key="session-0"
+            )
+            assert response.messages == ["Adding.", "The answer is 3"]
@@ -0,0 +1,118 @@
+import json
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import pytest
+
+from llmio import Agent, OpenAIClient, models
+
+from tests.utils import mocked_async_openai_replies
+
+
+@dataclass
+class User:
+    name: str
+
+
+def _agent(**kwargs: Any) -> Agent:
+    agent = Agent(
+        instruction="You help {user_name}.",
+        client=OpenAIClient(api_key="abc"),
+        **kwargs,
+    )
+
+    @agent.tool
+    def multiply(num1: float, num2: float) -> float:
+        return num1 * num2
+
+    @agent.tool
+    def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    @agent.variable
+    def user_name(_context: User) -> str:
+        return _context.name
+
+    return agent
+
+
+async def test_stable_prefix() -> None:
+    agent = _agent(stable_prefix=True, prompt_cache_key="calculator")
+
+    replies = [
+        models.ChatCompletionMessage(role="assistant", content="Hi Alice"),
+        models.ChatCompletionMessage(role="assistant", content="Hi Bob"),
+    ]
+    with mocked_async_openai_replies(replies) as mocked:
+        await agent.speak("Hello", _context=User("Alice"))
+        await agent.speak("Hello", _context=User("Bob"))
+
+    first, second = [c.kwargs for c in mocked.call_args_list]
+    assert first["prompt_cache_key"] == "calculator"
+    assert [tool["function"]["name"] for tool in first["tools"]] == ["add", "multiply"]
+    assert json.dumps(first["tools"]) == json.dumps(second["tools"])
+    assert first["messages"][:2] == second["messages"][:2]
+    assert first["messages"][0]["content"] == "You help {user_name}."
+    assert first["messages"][-1] == {
+        "role": "system",
+        "content": "Current values of the variables in the instruction:\nuser_name: Alice",
+    }
+
+
+async def test_default_prompt_is_unchanged() -> None:
+    agent = _agent()
+
+    replies = [models.ChatCompletionMessage(role="assistant", content="Hi Alice")]
+    with mocked_async_openai_replies(replies) as mocked:
+        await agent.speak("Hello", _context=User("Alice"))
+
+    kwargs = mocked.call_args.kwargs
+    assert "prompt_cache_key" not in kwargs
+    assert [tool["function"]["name"] for tool in kwargs["tools"]] == [
+        "multiply",
+        "add",
+    ]
+    assert kwargs["messages"] == [
+        {"role": "system", "content": "You help Alice."},
+        {"role": "user", "content": "Hello"},
+    ]
+
+
+@pytest.mark.parametrize("raw", [False, True])
+async def test_client_sends_prompt_cache_key(raw: bool) -> None:
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            json={
+                "id": "1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "Hi"},
+                    }
+                ],
+            },
+        )
+
+    client = OpenAIClient(
+        api_key="abc",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        raw=raw,
+    )
+    await client.get_chat_completion(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "Hello"}],
+        tools=[],
+        response_format=None,
+        prompt_cache_key="calculator",
+    )
+
+    assert bodies[0]["prompt_cache_key"] == "calculator"
@@ -0,0 +1,175 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pydantic
+import pytest
+
+from llmio import Agent, OpenAIClient, StructuredAgent
+from llmio.clients import BaseClient
+from llmio.bench import Fixed, MockServer, Step
+from llmio.metrics import Metrics
+from llmio.racing import Candidate, RacingClient
+
+
+def _agent(client: RacingClient) -> Agent:
+    agent = Agent(instruction="You are a calculator", client=client)
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    return agent
+
+
+def _candidate(
+    server: MockServer, model: str, cost: float = 1.0, delay: float = 0.0
+) -> Candidate:
+    return Candidate(
+        OpenAIClient(api_key="abc", base_url=server.url),
+        model=model,
+        cost=cost,
+        delay=delay,
+    )
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_fastest_candidate_wins(stream: bool) -> None:
+    metrics = Metrics()
+    async with MockServer(
+        script=[Step(content="Slow")], latency=Fixed(1.0)
+    ) as slow, MockServer(script=[Step(content="Fast")]) as fast:
+        client = RacingClient(
+            [_candidate(slow, "slow"), _candidate(fast, "fast")], metrics=metrics
+        )
+        response = await _agent(client).speak("Hello", stream=stream)
+
+    assert response.messages == ["Fast"]
+    assert response.stats.latency < 0.5
+    assert response.stats.turns[0].model == "fast"
+    assert client.wins == {"fast": 1}
+    assert 'llmio_race_wins_total{candidate="fast"} 1' in metrics.render()
+
+
+async def test_invalid_responses_lose() -> None:
+    script = [Step(tool_calls=[("subtract", {"num1": 1, "num2": 2})])] * 2
+    async with MockServer(script=script) as invalid, MockServer(
+        script=[
+            Step(tool_calls=[("add", {"num1": 1, "num2": 2})]),
+            Step(content="The answer is 3"),
+        ],
+        latency=Fixed(0.1),
+    ) as valid:
+        client = RacingClient(
+            [_candidate(invalid, "invalid"), _candidate(valid, "valid")]
+        )
+        response = await _agent(client).speak("What is 1 + 2?")
+
+    assert response.messages == ["The answer is 3"]
+    assert response.history[2]["content"] == "3.0"
+    assert client.wins == {"valid": 2}
+
+
+async def test_lax_arguments_win() -> None:
+    # pydantic coerces booleans to numbers, so the fast answer is valid.
+    async with MockServer(
+        script=[
+            Step(tool_calls=[("add", {"num1": True, "num2": 2})]),
+            Step(content="The answer is 3"),
+        ]
+    ) as fast, MockServer(script=[Step(content="Slow")], latency=Fixed(0.5)) as slow:
+        client = RacingClient([_candidate(slow, "slow"), _candidate(fast, "fast")])
+        response = await _agent(client).speak("What is true + 2?")
+
+    assert response.messages == ["The answer is 3"]
+    assert client.wins == {"fast": 2}
+
+
+class Answer(pydantic.BaseModel):
+    value: int
+
+
+async def test_structured_output_is_validated() -> None:
+    async with MockServer(
+        script=[Step(content='{"value": "three"}')]
+    ) as invalid, MockServer(
+        script=[Step(content='{"value": 3}')], latency=Fixed(0.1)
+    ) as valid:
+        client = RacingClient(
+            [_candidate(invalid, "invalid"), _candidate(valid, "valid")],
+            response_model=Answer,
+        )
+        agent = StructuredAgent(
+            instruction="You are a calculator", client=client, response_format=Answer
+        )
+        response = await agent.speak("What is 1 + 2?")
+
+    assert response.messages == [Answer(value=3)]
+    assert response.stats.turns[0].model == "valid"
+
+
+async def test_cost_cap_and_delay() -> None:
+    async with MockServer() as first, MockServer() as expensive, MockServer() as hedge:
+        client = RacingClient(
+            [
+                _candidate(first, "first"),
+                _candidate(expensive, "expensive", cost=5),
+                _candidate(hedge, "hedge", delay=1.0),
+            ],
+            max_cost=2,
+        )
+        response = await _agent(client).speak("Hello")
+
+    assert response.stats.turns[0].model == "first"
+    # The expensive candidate does not fit within the cap,
+    # and the hedge is not sent as the first candidate answered within its delay.
+    assert (first.requests, expensive.requests, hedge.requests) == (1, 0, 0)
+
+
+async def test_errors() -> None:
+    async with MockServer() as server:
+        client = RacingClient(
+            [
+                Candidate(
+                    OpenAIClient(api_key="abc", base_url="http://127.0.0.1:1/v1")
+                ),
+                _candidate(server, "working"),
+            ]
+        )
+        response = await _agent(client).speak("Hello")
+
+    assert response.messages == ["This is a mocked reply."]
+    assert client.wins == {"working": 1}
+
+
+class _Stream(BaseClient):
+    """
+    Streams a single chunk after a delay, and takes a while to close.
+    """
+
+    # pylint: disable-next=super-init-not-called
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.closed = False
+
+    async def stream_chat_completion(  # type: ignore[override]
+        self, **kwargs: Any
+    ) -> AsyncGenerator[Any, None]:
+        await asyncio.sleep(self.delay)
+        try:
+            yield "chunk"
+        finally:
+            await asyncio.sleep(0.05)
+            self.closed = True
+
+
+async def test_late_streams_are_closed() -> None:
+    # Two candidates answer at once, and the third answers while the loser is closed.
+    clients = [_Stream(0), _Stream(0), _Stream(0.01)]
+    client = RacingClient([Candidate(stream) for stream in clients])
+    async for _ in client.stream_chat_completion(
+        model="gpt", messages=[], tools=[], response_format=None
+    ):
+        pass
+
+    assert all(stream.closed for stream in clients)
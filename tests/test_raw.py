@@ -0,0 +1,176 @@
+import json
+from typing import Any
+
+import httpx
+import openai
+import pytest
+
+from llmio import Agent, OpenAIClient, AzureOpenAIClient
+
+
+def _completion(message: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def _sse(chunks: list[dict[str, Any]]) -> bytes:
+    events = [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks]
+    return "".join([*events, "data: [DONE]\n\n"]).encode()
+
+
+def _chunk(delta: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+    }
+
+
+_TOOL_CALL = {
+    "id": "add_1",
+    "type": "function",
+    "function": {"name": "add", "arguments": json.dumps({"num1": 1, "num2": 2})},
+}
+
+
+def _handler(requests: list[httpx.Request]) -> Any:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        body = json.loads(request.content)
+        tool_round = body["messages"][-1]["role"] == "tool"
+        if body.get("stream"):
+            if tool_round:
+                chunks = [
+                    _chunk({"content": "The answer "}),
+                    _chunk({"content": "is 3"}),
+                ]
+            else:
+                chunks = [
+                    _chunk(
+                        {
+                            "role": "assistant",
+                            "tool_calls": [{"index": 0, **_TOOL_CALL}],
+                        }
+                    )
+                ]
+            return httpx.Response(
+                200,
+                content=_sse(chunks),
+                headers={"content-type": "text/event-stream"},
+            )
+        message: dict[str, Any]
+        if tool_round:
+            message = {"role": "assistant", "content": "The answer is 3"}
+        else:
+            message = {"role": "assistant", "content": None, "tool_calls": [_TOOL_CALL]}
+        return httpx.Response(200, json=_completion(message))
+
+    return handler
+
+
+def _agent(client: OpenAIClient | AzureOpenAIClient) -> Agent:
+    agent = Agent(instruction="You are a calculator", client=client)
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    return agent
+
+
+async def test_raw_completion() -> None:
+    requests: list[httpx.Request] = []
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(_handler(requests)))
+    agent = _agent(
+        OpenAIClient(
+            api_key="abc",
+            base_url="http://localhost:8000/v1",
+            http_client=http_client,
+            raw=True,
+        )
+    )
+
+    response = await agent.speak("What is 1 + 2?")
+
+    assert response.messages == ["The answer is 3"]
+    assert response.history[1] == {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [_TOOL_CALL],
+    }
+    assert response.history[2] == {
+        "role": "tool",
+        "content": "3.0",
+        "tool_call_id": "add_1",
+    }
+    assert str(requests[0].url) == "http://localhost:8000/v1/chat/completions"
+    assert requests[0].headers["authorization"] == "Bearer abc"
+
+
+async def test_raw_stream() -> None:
+    requests: list[httpx.Request] = []
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(_handler(requests)))
+    agent = _agent(
+        AzureOpenAIClient(
+            api_key="abc",
+            endpoint="http://localhost:8000",
+            api_version="2024.01.01",
+            http_client=http_client,
+            raw=True,
+        )
+    )
+
+    deltas: list[str] = []
+
+    @agent.on_stream
+    def on_stream(delta: str) -> None:
+        deltas.append(delta)
+
+    response = await agent.speak("What is 1 + 2?", stream=True)
+
+    assert deltas == ["The answer ", "is 3"]
+    # Azure only requests usage of streams when asked to.
+    assert "stream_options" not in json.loads(requests[0].content)
+    assert response.messages == ["The answer is 3"]
+    assert response.history[2]["content"] == "3.0"
+    assert requests[0].url.path == "/openai/deployments/gpt-4o-mini/chat/completions"
+    assert requests[0].url.params["api-version"] == "2024.01.01"
+    assert requests[0].headers["api-key"] == "abc"
+
+
+async def test_raw_status_error() -> None:
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                429, json={"error": {"message": "slow down"}}
+            )
+        )
+    )
+    agent = _agent(OpenAIClient(api_key="abc", http_client=http_client, raw=True))
+
+    with pytest.raises(openai.RateLimitError):
+        await agent.speak("What is 1 + 2?")
+
+
+async def test_raw_stream_error() -> None:
+    http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(
+                200,
+                content=b'data: {"error": {"message": "overloaded"}}\n\n',
+                headers={"content-type": "text/event-stream"},
+            )
+        )
+    )
+    agent = _agent(OpenAIClient(api_key="abc", http_client=http_client, raw=True))
+
+    with pytest.raises(openai.APIError, match="overloaded"):
+        await agent.speak("What is 1 + 2?", stream=True)
@@ -0,0 +1,80 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from llmio import Agent, OpenAIClient, errors
+from llmio.bench import MockServer, Step
+from llmio.clients import BaseClient
+from llmio.replay import RecordingClient, ReplayClient
+
+
+def _agent(client: BaseClient) -> Agent:
+    agent = Agent(instruction="You are a calculator", client=client)
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    return agent
+
+
+_SCRIPT = [
+    Step(tool_calls=[("add", {"num1": 1, "num2": 2})]),
+    Step(content="The answer is 3"),
+]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_record_and_replay(tmp_path: Path, stream: bool) -> None:
+    path = str(tmp_path / "recording")
+    async with MockServer(script=_SCRIPT, chunks_per_second=50) as server:
+        async with RecordingClient(
+            OpenAIClient(api_key="abc", base_url=server.url), path
+        ) as client:
+            recorded = await _agent(client).speak("What is 1 + 2?", stream=stream)
+            await _agent(client).speak("What is 2 + 2?", stream=stream)
+
+    async with ReplayClient(path) as client:
+        replayed = await _agent(client).speak("What is 1 + 2?", stream=stream)
+
+        with pytest.raises(errors.MissingRecording):
+            await _agent(client).speak("What is 3 + 3?", stream=stream)
+
+    assert replayed.messages == recorded.messages == ["The answer is 3"]
+    assert replayed.history == recorded.history
+
+
+async def test_replay_speed(tmp_path: Path) -> None:
+    path = str(tmp_path / "recording")
+    async with MockServer(
+        script=[Step(content="a b c d e f")], chunks_per_second=20
+    ) as server:
+        async with RecordingClient(
+            OpenAIClient(api_key="abc", base_url=server.url), path
+        ) as client:
+            await _agent(client).speak("Hi", stream=True)
+
+    async with ReplayClient(path) as client:
+        start = time.perf_counter()
+        await _agent(client).speak("Hi", stream=True)
+        fast = time.perf_counter() - start
+
+    async with ReplayClient(path, speed=2.0) as client:
+        start = time.perf_counter()
+        await _agent(client).speak("Hi", stream=True)
+        timed = time.perf_counter() - start
+
+    # Seven chunks plus a usage chunk at 20 chunks per second take about 0.35 seconds.
+    assert fast < 0.1
+    assert 0.15 < timed < 0.5
+
+
+async def test_empty_recording(tmp_path: Path) -> None:
+    path = str(tmp_path / "recording")
+    async with RecordingClient(OpenAIClient(api_key="abc"), path):
+        pass
+
+    async with ReplayClient(path) as client:
+        with pytest.raises(errors.MissingRecording):
+            await _agent(client).speak("Hi")
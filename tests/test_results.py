@@ -0,0 +1,202 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import pydantic
+
+from llmio import (
+    Agent,
+    BlobStore,
+    OpenAIClient,
+    Project,
+    Spill,
+    ToolRetriever,
+    Truncate,
+    models,
+)
+from llmio.results import ResultSerializer
+
+from tests.utils import mocked_async_openai_replies
+
+
+def test_truncate() -> None:
+    policy = Truncate(max_chars=5)
+    assert policy.apply("short") == "short"
+    assert policy.apply("0123456789") == "01234\n[... 5 more characters truncated]"
+
+
+def test_project() -> None:
+    class File(pydantic.BaseModel):
+        name: str
+        size: int
+        content: str
+
+    @dataclass
+    class Folder:
+        name: str
+        owner: str
+
+    policy = Project(["name", "size"])
+    assert policy.apply([{"name": "a", "size": 1, "content": "x"}]) == str(
+        [{"name": "a", "size": 1}]
+    )
+    assert policy.apply(File(name="a", size=1, content="x")) == str(
+        {"name": "a", "size": 1}
+    )
+    assert policy.apply(Folder(name="a", owner="b")) == str({"name": "a"})
+    assert (
+        Project(["name"], then=Truncate(5))
+        .apply({"name": "abcdefgh"})
+        .startswith("{'nam")
+    )
+
+
+def test_blob_store_pages(tmp_path: Path) -> None:
+    store = BlobStore(str(tmp_path))
+    text = "æøå" * 50_000
+    handle = store.put(text)
+
+    assert handle in store
+    assert store.length(handle) == len(text)
+    assert store.read(handle, 100_001, 5) == text[100_001:100_006]
+    assert store.read(handle, len(text) - 2, 10) == text[-2:]
+
+
+def test_blob_store_keeps_newlines_and_caps_reads(tmp_path: Path) -> None:
+    store = BlobStore(str(tmp_path), max_read_chars=5)
+    handle = store.put("a\r\nb\rc\nd")
+
+    assert store.read(handle, 0, 100) == "a\r\nb\r"
+    assert store.read(handle, 5, 100) == "c\nd"
+    assert store.read(handle, 0, -1) == ""
+
+
+def test_blob_store_close(tmp_path: Path) -> None:
+    with BlobStore(str(tmp_path)) as store:
+        store.put("result")
+    assert not list(tmp_path.iterdir())
+
+    temporary = BlobStore()
+    temporary.put("result")
+    temporary.close()
+    assert not Path(temporary.directory).exists()
+
+
+async def test_spilled_results_are_read_with_read_result(tmp_path: Path) -> None:
+    agent = Agent(
+        instruction="You list files.",
+        client=OpenAIClient(api_key="abc"),
+    )
+    store = BlobStore(str(tmp_path))
+
+    @agent.tool(result_policy=Spill(store, max_chars=100, preview_chars=10))
+    def list_files() -> str:
+        return "\n".join(f"file_{i}.txt" for i in range(1000))
+
+    assert [tool.name for tool in agent._tools] == ["list_files", "read_result"]
+
+    def tool_call(name: str, arguments: dict) -> models.ChatCompletionMessage:
+        return models.ChatCompletionMessage.construct(
+            role="assistant",
+            tool_calls=[
+                models.ToolCall.construct(
+                    id=f"{name}_1",
+                    type="function",
+                    function=models.Function.construct(
+                        name=name, arguments=json.dumps(arguments)
+                    ),
+                )
+            ],
+        )
+
+    first = tool_call("list_files", {})
+    with mocked_async_openai_replies(
+        [first, models.ChatCompletionMessage(role="assistant", content="Done")]
+    ):
+        response = await agent.speak("List the files")
+
+    message = response.history[2]["content"]
+    assert isinstance(message, str)
+    assert "file_0.txt" in message and "file_999.txt" not in message
+    handle = message.split("'")[1]
+
+    read = tool_call("read_result", {"handle": handle, "offset": 0, "length": 21})
+    with mocked_async_openai_replies(
+        [read, models.ChatCompletionMessage(role="assistant", content="Done")]
+    ):
+        response = await agent.speak("Read it")
+
+    assert response.history[2]["content"] == (
+        "Characters 0 to 21 of 12889:\nfile_0.txt\nfile_1.txt"
+    )
+
+
+class Task(pydantic.BaseModel):
+    id: int
+    name: str
+    done: bool = False
+
+
+async def test_read_result_is_always_selected(tmp_path: Path) -> None:
+    agent = Agent(
+        instruction="You are a file assistant",
+        client=OpenAIClient(api_key="abc"),
+        tool_retriever=ToolRetriever(top_k=1),
+    )
+
+    @agent.tool(result_policy=Spill(BlobStore(str(tmp_path)), max_chars=100))
+    def list_files() -> str:
+        """Lists the files in the folder."""
+        return "\n".join(f"file_{i}.txt" for i in range(1000))
+
+    @agent.tool
+    def delete_file(name: str) -> str:
+        """Deletes a file."""
+        return f"Deleted {name}"
+
+    with mocked_async_openai_replies(
+        [models.ChatCompletionMessage(role="assistant", content="Done")]
+    ) as patched:
+        await agent.speak("List the files in the folder")
+
+    tools = patched.call_args.kwargs["tools"]
+    assert [tool["function"]["name"] for tool in tools] == ["list_files", "read_result"]
+
+
+def test_serializer() -> None:
+    serializer = ResultSerializer(list[Task])
+    tasks = [Task(id=1, name="Write"), Task(id=2, name="Ship", done=True)]
+
+    assert serializer(tasks) == (
+        '[{"id":1,"name":"Write","done":false},{"id":2,"name":"Ship","done":true}]'
+    )
+    assert serializer("Already text") == "Already text"
+    assert ResultSerializer(list[Task], tabular=True)(tasks) == (
+        '{"columns":["id","name","done"],"rows":[[1,"Write",false],[2,"Ship",true]]}'
+    )
+
+    class Opaque:
+        def __str__(self) -> str:
+            return "opaque"
+
+    assert ResultSerializer()(Opaque()) == "opaque"
+    assert ResultSerializer()({"tasks": tasks[:1], "tags": ("a",)}) == (
+        '{"tasks":[{"id":1,"name":"Write","done":false}],"tags":["a"]}'
+    )
+
+
+async def test_tool_results_are_serialized_by_return_type() -> None:
+    agent = Agent(
+        instruction="You manage tasks.",
+        client=OpenAIClient(api_key="abc"),
+    )
+
+    @agent.tool
+    async def list_tasks() -> list[Task]:
+        return [Task(id=1, name="Write")]
+
+    (tool,) = agent._tools
+    assert tool.serializer is tool.serializer
+    assert await tool.execute(tool.parse_args("{}"), context=None) == (
+        '[{"id":1,"name":"Write","done":false}]'
+    )
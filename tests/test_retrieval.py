@@ -0,0 +1,118 @@
+from llmio import Agent, OpenAIClient, ToolRetriever, models, types as T
+from llmio.retrieval import BM25, tokenize
+
+from tests.utils import mocked_async_openai_replies
+
+
+def _tool(name: str, description: str) -> T.Tool:
+    return T.Tool(
+        type="function",
+        function=T.FunctionDefinition(
+            name=name,
+            description=description,
+            parameters={"type": "object", "properties": {}},
+        ),
+    )
+
+
+TOOLS = [
+    _tool("get_weather", "Returns the weather forecast for a city."),
+    _tool("sendEmail", "Sends an email to a recipient."),
+    _tool("create_invoice", "Creates an invoice for a customer."),
+    _tool("search_flights", "Searches flights between two airports."),
+    _tool("get_time", "Returns the current time in a timezone."),
+]
+
+
+def _names(tools: list[T.Tool]) -> list[str]:
+    return [tool["function"]["name"] for tool in tools]
+
+
+def test_tokenize() -> None:
+    assert tokenize("sendEmail get_weather, HTTP2!") == [
+        "send",
+        "email",
+        "get",
+        "weather",
+        "http2",
+    ]
+
+
+def test_bm25_prefers_rare_terms() -> None:
+    index = BM25([["get", "weather"], ["get", "time"], ["send", "email"]])
+    scores = index.scores(["get", "weather"])
+    assert scores[0] > scores[1] > scores[2] == 0
+
+
+async def test_select_top_k_pinned_and_called() -> None:
+    retriever = ToolRetriever(top_k=1, pinned=["get_time"])
+    messages: list[T.Message] = [
+        {"role": "user", "content": "Book me a flight"},
+        {
+            "role": "assistant",
+            "tool_calls": [
+                {
+                    "id": "1",
+                    "type": "function",
+                    "function": {"name": "search_flights", "arguments": "{}"},
+                }
+            ],
+        },
+        {"role": "tool", "tool_call_id": "1", "content": "No flights"},
+        {"role": "user", "content": "What is the weather in Oslo?"},
+    ]
+
+    selected = await retriever.select(TOOLS, messages)
+
+    assert _names(selected) == ["get_weather", "search_flights", "get_time"]
+
+
+async def test_embeddings_are_fused_with_bm25() -> None:
+    class Embeddings:
+        def __init__(self) -> None:
+            self.calls = 0
+
+        async def embed(self, texts: list[str]) -> list[list[float]]:
+            self.calls += 1
+            # Only the invoice tool and mails about billing are similar.
+            return [
+                [1.0, 0.0] if "invoice" in text or "bill" in text else [0.0, 1.0]
+                for text in texts
+            ]
+
+    embeddings = Embeddings()
+    retriever = ToolRetriever(top_k=1, embeddings=embeddings)
+    messages: list[T.Message] = [{"role": "user", "content": "Please bill ACME"}]
+
+    assert _names(await retriever.select(TOOLS, messages)) == ["create_invoice"]
+    await retriever.select(TOOLS, messages)
+    # The tools are embedded once, the query on every call.
+    assert embeddings.calls == 3
+
+
+async def test_agent_sends_selected_tools() -> None:
+    agent = Agent(
+        instruction="You are an assistant.",
+        client=OpenAIClient(api_key="abc"),
+        tool_retriever=ToolRetriever(top_k=1),
+    )
+
+    @agent.tool
+    def get_weather(city: str) -> str:
+        """
+        Returns the weather forecast for a city.
+        """
+        return "Sunny"
+
+    @agent.tool
+    def get_time(timezone: str) -> str:
+        """
+        Returns the current time in a timezone.
+        """
+        return "12:00"
+
+    replies = [models.ChatCompletionMessage(role="assistant", content="Sunny")]
+    with mocked_async_openai_replies(replies) as mocked:
+        await agent.speak("What is the weather like in Oslo?")
+
+    assert _names(mocked.call_args.kwargs["tools"]) == ["get_weather"]
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from llmio import Agent, OpenAIClient
+from llmio.bench import Fixed, MockServer, Step
+from llmio.metrics import Metrics
+from llmio.routing import AdaptiveRouter, Route
+
+
+def _route(server: MockServer, name: str) -> Route:
+    return Route(OpenAIClient(api_key="abc", base_url=server.url), name=name)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_routes_to_fastest(stream: bool) -> None:
+    metrics = Metrics()
+    async with MockServer(latency=Fixed(0.1)) as slow, MockServer() as fast:
+        router = AdaptiveRouter(
+            [_route(slow, "slow"), _route(fast, "fast")],
+            exploration=0,
+            metrics=metrics,
+        )
+        agent = Agent(instruction="You are a helpful assistant", client=router)
+        for _ in range(5):
+            await agent.speak("Hello", stream=stream)
+
+    # Each route is tried once, and then the fast one is preferred.
+    assert (slow.requests, fast.requests) == (1, 4)
+    stats = {route.name: route for route in router.stats()}
+    assert stats["fast"].requests == 4
+    assert stats["slow"].latency is not None and stats["slow"].latency >= 0.1
+    assert stats["slow"].p50 == pytest.approx(stats["slow"].latency, rel=0.05)
+    assert 'llmio_routed_requests_total{route="fast"} 4' in metrics.render()
+
+
+async def test_reacts_to_degradation() -> None:
+    async with MockServer() as first, MockServer(latency=Fixed(0.05)) as second:
+        router = AdaptiveRouter(
+            [_route(first, "first"), _route(second, "second")],
+            exploration=0.2,
+            alpha=0.5,
+            seed=0,
+        )
+        agent = Agent(instruction="You are a helpful assistant", client=router)
+        for _ in range(5):
+            await agent.speak("Hello")
+        assert first.requests > second.requests
+
+        first.latency = Fixed(0.2)
+        for _ in range(15):
+            await agent.speak("Hello")
+        before = first.requests
+        for _ in range(5):
+            await agent.speak("Hello")
+
+    # Once the first route slowed down, exploration found it worse and requests moved.
+    assert first.requests - before <= 1
+
+
+async def test_errors_route_away() -> None:
+    async with MockServer() as server:
+        router = AdaptiveRouter(
+            [
+                Route(
+                    OpenAIClient(api_key="abc", base_url="http://127.0.0.1:1/v1"),
+                    name="down",
+                ),
+                _route(server, "up"),
+            ],
+            exploration=0,
+        )
+        agent = Agent(instruction="You are a helpful assistant", client=router)
+        with pytest.raises(Exception):
+            await agent.speak("Hello")
+        for _ in range(3):
+            await agent.speak("Hello")
+
+    down, up = router.stats()
+    assert (down.requests, down.errors, down.latency) == (1, 1, None)
+    assert down.error_rate > 0
+    assert up.requests == 3
+
+
+async def test_slow_stream_callbacks_are_not_measured() -> None:
+    async with MockServer(
+        script=[Step(content=" ".join(["word"] * 10))], chunks_per_second=1000
+    ) as server:
+        router = AdaptiveRouter([_route(server, "only")])
+        agent = Agent(instruction="You are a helpful assistant", client=router)
+
+        @agent.on_stream
+        async def slow(delta: str) -> None:
+            await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        await agent.speak("Hello", stream=True)
+        elapsed = time.perf_counter() - start
+
+    (stats,) = router.stats()
+    assert elapsed > 0.4
+    assert stats.latency is not None and stats.latency < 0.2
+
+
+def test_no_routes() -> None:
+    with pytest.raises(ValueError):
+        AdaptiveRouter([])
@@ -0,0 +1,88 @@
+from typing import Optional
+
+import pydantic
+
+from llmio import Agent, OpenAIClient
+from llmio.schema import compress_whitespace, minimize_schema
+
+
+class Address(pydantic.BaseModel):
+    street: str
+    city: str = pydantic.Field(description="The   city\n\n   name.")
+
+
+class Node(pydantic.BaseModel):
+    title: str
+    children: list["Node"] = []
+
+
+def _titles(node: object, in_properties: bool = False) -> list[str]:
+    """
+    Returns the `title` keywords in a schema, ignoring properties named "title".
+    """
+    if isinstance(node, list):
+        return [title for item in node for title in _titles(item)]
+    if not isinstance(node, dict):
+        return []
+    titles = [] if in_properties or "title" not in node else [node["title"]]
+    for key, value in node.items():
+        if key not in ("required", "default"):
+            titles.extend(_titles(value, in_properties=key == "properties"))
+    return titles
+
+
+def test_minimize_inlines_definitions_and_drops_titles() -> None:
+    class Order(pydantic.BaseModel):
+        address: Address
+        note: Optional[str] = None
+        tree: Node
+
+    minimized = minimize_schema(Order.model_json_schema())
+
+    assert not _titles(minimized)
+    assert minimized["properties"]["address"] == {
+        "properties": {
+            "street": {"type": "string"},
+            "city": {"description": "The city\nname.", "type": "string"},
+        },
+        "required": ["street", "city"],
+        "type": "object",
+    }
+    assert minimized["properties"]["note"] == {"type": ["string", "null"]}
+    # The recursion is kept as a reference, and the property named "title" survives.
+    tree = minimized["properties"]["tree"]
+    assert tree["properties"]["title"] == {"type": "string"}
+    assert tree["properties"]["children"]["items"] == {"$ref": "#/$defs/Node"}
+    assert minimized["$defs"]["Node"]["properties"]["title"] == {"type": "string"}
+    assert list(minimized["$defs"]) == ["Node"]
+
+
+def test_compress_whitespace() -> None:
+    assert (
+        compress_whitespace("  Adds\n\n    two   numbers.\n  ") == "Adds\ntwo numbers."
+    )
+
+
+async def test_agent_minimizes_schemas() -> None:
+    agent = Agent(
+        instruction="You ship orders.",
+        client=OpenAIClient(api_key="abc"),
+        minimize_schemas=True,
+    )
+
+    @agent.tool
+    def ship(address: Address, note: Optional[str] = None) -> str:
+        """
+        Ships an order.
+
+            The address must be complete.
+        """
+        return "Shipped"
+
+    (tool,) = agent._tools
+    definition = agent._tool_definitions[0]["function"]
+    assert definition["description"] == "Ships an order.\nThe address must be complete."
+    assert "$defs" not in definition["parameters"]
+    assert tool.function_definition is tool.function_definition
+    assert tool.tokens_saved > 0
+    assert f"Tokens saved: {tool.tokens_saved}" in agent.summary()
@@ -0,0 +1,158 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator
+from unittest.mock import patch
+
+from openai.types import CompletionUsage
+from openai.types.chat.chat_completion_chunk import (
+    Choice as ChunkChoice,
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+from openai.types.completion_usage import PromptTokensDetails
+
+from llmio import Agent, GeminiClient, models, OpenAIClient
+from llmio.bench import MockServer
+
+
+def _usage(prompt: int, completion: int, cached: int) -> CompletionUsage:
+    return CompletionUsage(
+        prompt_tokens=prompt,
+        completion_tokens=completion,
+        total_tokens=prompt + completion,
+        prompt_tokens_details=PromptTokensDetails(cached_tokens=cached),
+    )
+
+
+def _agent() -> Agent:
+    agent = Agent(
+        instruction="You are a calculator", client=OpenAIClient(api_key="abc")
+    )
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        await asyncio.sleep(0.01)
+        return num1 + num2
+
+    return agent
+
+
+async def test_completion_stats() -> None:
+    agent = _agent()
+    completions = [
+        models.ChatCompletion.construct(
+            choices=[
+                models.Choice.construct(
+                    message=models.ChatCompletionMessage.construct(
+                        role="assistant",
+                        tool_calls=[
+                            models.ToolCall.construct(
+                                id="add_1",
+                                type="function",
+                                function=models.Function.construct(
+                                    name="add",
+                                    arguments=json.dumps({"num1": 1, "num2": 2}),
+                                ),
+                            ),
+                        ],
+                    )
+                )
+            ],
+            usage=_usage(100, 10, 0),
+        ),
+        models.ChatCompletion.construct(
+            choices=[
+                models.Choice.construct(
+                    message=models.ChatCompletionMessage.construct(
+                        role="assistant", content="3"
+                    )
+                )
+            ],
+            usage=_usage(120, 5, 100),
+        ),
+    ]
+    with patch("llmio.clients.BaseClient.get_chat_completion", side_effect=completions):
+        response = await agent.speak("What is 1 + 2?")
+
+    stats = response.stats
+    assert [turn.prompt_tokens for turn in stats.turns] == [100, 120]
+    assert stats.prompt_tokens == 220
+    assert stats.completion_tokens == 15
+    assert stats.cached_tokens == 100
+    assert stats.tool_rounds == 1
+    assert [tool.name for tool in stats.tools] == ["add"]
+    assert stats.tools[0].duration >= 0.01
+    assert stats.turns[0].time_to_first_token is None
+    assert stats.turns[0].tokens_per_second is None
+
+
+async def test_stream_stats() -> None:
+    agent = _agent()
+
+    def chunk(delta: ChoiceDelta | None, usage: CompletionUsage | None = None) -> Any:
+        return models.ChatCompletionChunk.construct(
+            choices=[ChunkChoice.construct(index=0, delta=delta)] if delta else [],
+            usage=usage,
+        )
+
+    streams = [
+        [
+            chunk(
+                ChoiceDelta.construct(
+                    tool_calls=[
+                        ChoiceDeltaToolCall.construct(
+                            index=0,
+                            id="add_1",
+                            function=ChoiceDeltaToolCallFunction.construct(
+                                name="add", arguments='{"num1": 1, "num2": 2}'
+                            ),
+                        )
+                    ]
+                )
+            ),
+            chunk(None, _usage(100, 10, 0)),
+        ],
+        [
+            chunk(ChoiceDelta.construct(content="The answer")),
+            chunk(ChoiceDelta.construct(content=" is 3")),
+            chunk(None, _usage(120, 4, 64)),
+        ],
+    ]
+
+    async def stream_chat_completion(**kwargs: Any) -> AsyncIterator[Any]:
+        for item in streams.pop(0):
+            await asyncio.sleep(0.01)
+            yield item
+
+    with patch(
+        "llmio.clients.BaseClient.stream_chat_completion",
+        side_effect=stream_chat_completion,
+    ):
+        response = await agent.speak("What is 1 + 2?", stream=True)
+
+    assert response.messages == ["The answer is 3"]
+    stats = response.stats
+    assert stats.prompt_tokens == 220
+    assert stats.cached_tokens == 64
+    assert stats.cache_hit_rate == 64 / 220
+    assert stats.tool_rounds == 1
+    last = stats.turns[-1]
+    assert last.time_to_first_token is not None
+    assert 0 < last.time_to_first_token < last.latency
+    assert last.tokens_per_second is not None and last.tokens_per_second > 0
+
+
+async def test_stream_usage_is_requested_by_openai_clients() -> None:
+    async with MockServer() as server:
+        openai_response = await Agent(
+            instruction="You are a helpful assistant",
+            client=OpenAIClient(api_key="abc", base_url=server.url),
+        ).speak("Hello", stream=True)
+        gemini_response = await Agent(
+            instruction="You are a helpful assistant",
+            client=GeminiClient(api_key="abc", base_url=server.url),
+        ).speak("Hello", stream=True)
+
+    assert openai_response.stats.turns[0].prompt_tokens is not None
+    assert gemini_response.stats.turns[0].prompt_tokens is None
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from llmio import Agent, OpenAIClient, errors
+from llmio.bench import MockServer, Step
+
+CONTENT = " ".join(f"word{i}" for i in range(200))
+
+
+def _agent(server: MockServer, raw: bool) -> Agent:
+    return Agent(
+        instruction="You are a helpful assistant",
+        client=OpenAIClient(api_key="abc", base_url=server.url, raw=raw),
+    )
+
+
+@pytest.mark.parametrize("raw", [False, True])
+async def test_stop_when(raw: bool) -> None:
+    async with MockServer(
+        script=[Step(content=CONTENT)], chunks_per_second=100
+    ) as server:
+        agent = _agent(server, raw)
+
+        @agent.stop_when
+        def stop(content: str) -> bool:
+            return "word5 " in content
+
+        start = time.perf_counter()
+        response = await agent.speak("Hello", stream=True)
+        elapsed = time.perf_counter() - start
+
+        # The conversation continues from the partial message.
+        followup = await agent.speak("Go on", history=response.history)
+
+    assert response.messages == ["word0 word1 word2 word3 word4 word5 "]
+    assert response.history[-1] == {
+        "role": "assistant",
+        "content": "word0 word1 word2 word3 word4 word5 ",
+    }
+    assert response.stats.stopped
+    assert not followup.stats.stopped
+    # The rest of the stream, which takes two seconds, was not read.
+    assert elapsed < 1
+
+
+async def test_stop_from_stream_callback() -> None:
+    async with MockServer(
+        script=[Step(content=CONTENT)], chunks_per_second=100
+    ) as server:
+        agent = _agent(server, raw=False)
+        deltas = []
+
+        @agent.on_stream
+        def on_stream(_context: list[str], delta: str) -> None:
+            deltas.append(delta)
+            if len(deltas) == len(_context):
+                raise errors.StopStream()
+
+        response = await agent.speak("Hello", _context=["a", "b", "c"], stream=True)
+
+    assert response.messages == ["".join(deltas)]
+    assert len(deltas) == 3
+    assert response.stats.stopped
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from llmio import Agent, OpenAIClient, SyncAgent, sync
+from llmio.bench import MockServer
+
+
+async def test_speak_sync() -> None:
+    async with MockServer() as server:
+        agent = Agent(
+            instruction="You are a helpful assistant{loop}",
+            client=OpenAIClient(api_key="abc", base_url=server.url),
+        )
+        loops = set()
+
+        @agent.variable
+        def loop() -> str:
+            loops.add(id(asyncio.get_running_loop()))
+            return ""
+
+        # The mock server runs on this loop, so the blocking calls run in threads.
+        def speak(i: int) -> list[str]:
+            return agent.speak_sync(f"Hello {i}").messages
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = await asyncio.gather(
+                *(
+                    asyncio.get_running_loop().run_in_executor(executor, speak, i)
+                    for i in range(16)
+                )
+            )
+        response = await asyncio.to_thread(SyncAgent(agent).speak, "Hello")
+
+    assert results == [["This is a mocked reply."]] * 16
+    assert response.messages == ["This is a mocked reply."]
+    # Every call ran on the same background loop.
+    assert len(loops) == 1
+    assert loops != {id(asyncio.get_running_loop())}
+
+
+def test_run_sync() -> None:
+    async def thread_name() -> str:
+        return threading.current_thread().name
+
+    assert sync.run_sync(thread_name()) == "llmio-event-loop"
+
+    async def fail() -> None:
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError, match="failed"):
+        sync.run_sync(fail())
+
+    async def nested() -> None:
+        sync.run_sync(thread_name())
+
+    with pytest.raises(RuntimeError, match="deadlock"):
+        sync.run_sync(nested())
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from llmio import Agent, errors, models, OpenAIClient
+from llmio.metrics import Metrics
+
+from tests.utils import mocked_async_openai_replies
+
+
+def _tool_call(name: str) -> models.ChatCompletionMessage:
+    return models.ChatCompletionMessage.construct(
+        role="assistant",
+        tool_calls=[
+            models.ToolCall.construct(
+                id=f"{name}_1",
+                type="function",
+                function=models.Function.construct(name=name, arguments=json.dumps({})),
+            ),
+        ],
+    )
+
+
+@pytest.mark.parametrize("synchronous", [False, True])
+async def test_tool_timeout(synchronous: bool) -> None:
+    metrics = Metrics()
+    agent = Agent(
+        instruction="You are a helpful assistant.",
+        client=OpenAIClient(api_key="abc"),
+        metrics=metrics,
+        tool_timeout_message="{tool} timed out after {timeout}s.",
+    )
+    # The tool is released once the agent answered, so it only finished if it was waited for.
+    release, finished = threading.Event(), threading.Event()
+
+    if synchronous:
+
+        @agent.tool(timeout=0.05)
+        def hang() -> str:
+            release.wait(10)
+            finished.set()
+            return "Done"
+
+    else:
+
+        @agent.tool(timeout=0.05)
+        async def hang() -> str:
+            await asyncio.sleep(10)
+            return "Done"
+
+    replies = [
+        _tool_call("hang"),
+        models.ChatCompletionMessage.construct(role="assistant", content="Sorry"),
+    ]
+    with mocked_async_openai_replies(replies):
+        response = await agent.speak("Go")
+    assert not finished.is_set()
+    release.set()
+
+    assert response.history[2] == {
+        "role": "tool",
+        "content": "hang timed out after 0.05s.",
+        "tool_call_id": "hang_1",
+    }
+    assert metrics.tool_timeouts.value(tool="hang") == 1
+
+
+async def test_deadline_cancels_tools() -> None:
+    agent = Agent(
+        instruction="You are a helpful assistant.",
+        client=OpenAIClient(api_key="abc"),
+    )
+    cancelled = asyncio.Event()
+
+    @agent.tool
+    async def hang() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "Done"
+
+    with mocked_async_openai_replies([_tool_call("hang")]):
+        with pytest.raises(errors.DeadlineExceeded):
+            await agent.speak("Go", deadline=0.05)
+
+    assert cancelled.is_set()
+
+
+async def test_deadline_stops_waiting_for_synchronous_tools() -> None:
+    agent = Agent(
+        instruction="You are a helpful assistant.",
+        client=OpenAIClient(api_key="abc"),
+    )
+
+    release, finished = threading.Event(), threading.Event()
+
+    @agent.tool
+    def block() -> str:
+        release.wait(10)
+        finished.set()
+        return "Done"
+
+    with mocked_async_openai_replies([_tool_call("block")]):
+        with pytest.raises(errors.DeadlineExceeded):
+            await agent.speak("Go", deadline=0.05)
+
+    assert not finished.is_set()
+    release.set()
+
+
+async def test_deadline_is_passed_to_the_client() -> None:
+    agent = Agent(
+        instruction="You are a helpful assistant.",
+        client=OpenAIClient(api_key="abc"),
+    )
+
+    timeouts = []
+
+    async def get_chat_completion(**kwargs: Any) -> models.ChatCompletion:
+        timeouts.append(kwargs["timeout"])
+        await asyncio.sleep(10)
+        raise AssertionError("Not cancelled")
+
+    with patch(
+        "llmio.clients.BaseClient.get_chat_completion",
+        side_effect=get_chat_completion,
+    ):
+        with pytest.raises(errors.DeadlineExceeded):
+            await agent.speak("Go", deadline=0.1)
+
+    assert 0 < timeouts[0] <= 0.1
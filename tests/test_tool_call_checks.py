@@ -0,0 +1,161 @@
+from typing import Any, AsyncIterator
+from unittest.mock import patch
+
+import pytest
+
+from llmio import Agent, OpenAIClient, errors, models, raw
+from llmio.bench import MockServer, Step
+from llmio.schema import ArgumentPrefixChecker
+
+SCHEMA = {
+    "properties": {
+        "num": {"type": "integer"},
+        "name": {"type": "string"},
+        "tags": {"anyOf": [{"type": "array", "items": {}}, {"type": "null"}]},
+        "when": {"type": "string", "format": "date-time"},
+    }
+}
+
+
+def _check(arguments: str) -> str | None:
+    checker = ArgumentPrefixChecker(SCHEMA)
+    for char in arguments:
+        if (error := checker.feed(char)) is not None:
+            return error
+    return None
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        '{"num": 1, "name": "a\\"b", "tags": [1, {"x": [true, null]}], "when": 0}',
+        '{"num": "12", "tags": null}',
+        '{"num": -Infinity, "other": {"name": 1}}',
+        '{"num": true}',
+        '{"name": "unfinished',
+        "  {} ",
+    ],
+)
+def test_valid_prefixes(arguments: str) -> None:
+    assert _check(arguments) is None
+
+
+@pytest.mark.parametrize(
+    "arguments, error",
+    [
+        ('{"name": 1', "The argument 'name' must be of type string at position 9"),
+        ('{"tags": "a"', "The argument 'tags' must be of type array or null"),
+        ('{"num": [', "The argument 'num' must be of type integer"),
+        ("[1]", "The arguments must be a JSON object"),
+        ('{"num": 1}}', "Unexpected data after the arguments"),
+        ('{"num" 1', "Expected ':'"),
+        ('{"num": 1,}', "Expected a property name"),
+        ('{"other": tru}', "Unexpected character '}'"),
+    ],
+)
+def test_invalid_prefixes(arguments: str, error: str) -> None:
+    result = _check(arguments)
+    assert result is not None and result.startswith(error)
+
+
+def _agent(client: OpenAIClient, graceful_errors: bool = False) -> Agent:
+    agent = Agent(
+        instruction="You are a greeter",
+        client=client,
+        graceful_errors=graceful_errors,
+    )
+
+    @agent.tool
+    async def greet(name: str) -> str:
+        return f"Hello {name}"
+
+    return agent
+
+
+async def test_unknown_tool_aborts_stream() -> None:
+    script = [
+        Step(tool_calls=[("unknown", {})] + [("greet", {"name": "a"})] * 50),
+        Step(content="Sorry"),
+    ]
+    async with MockServer(script=script, chunks_per_second=50) as server:
+        agent = _agent(OpenAIClient(api_key="abc", base_url=server.url))
+        with pytest.raises(errors.BadToolCall):
+            await agent.speak("Hello", stream=True)
+
+        agent = _agent(
+            OpenAIClient(api_key="abc", base_url=server.url), graceful_errors=True
+        )
+        response = await agent.speak("Hello", stream=True)
+
+    assert response.messages == ["Sorry"]
+    # Only the invalid tool call was received before the stream was aborted.
+    tool_calls: Any = response.history[1]["tool_calls"]  # type: ignore[typeddict-item]
+    assert [call["function"]["name"] for call in tool_calls] == ["unknown"]
+    assert response.history[2]["content"] == "No tool with the name 'unknown' found."
+    # The rest of the stream, which takes a second, was not read.
+    assert response.stats.latency < 0.5
+
+
+async def test_invalid_arguments_abort_stream() -> None:
+    arguments = '{"name": 12345, "padding": "' + "x" * 100 + '"}'
+    received = 0
+
+    async def stream(**kwargs: Any) -> AsyncIterator[models.ChatCompletionChunk]:
+        nonlocal received
+        messages = kwargs["messages"]
+        if messages[-1]["role"] == "tool":
+            yield raw.decode_chunk({"choices": [{"delta": {"content": "Sorry"}}]})  # type: ignore[misc]
+            return
+        deltas: list[dict[str, Any]] = [
+            {
+                "tool_calls": [
+                    {
+                        "index": 0,
+                        "id": "call_1",
+                        "type": "function",
+                        "function": {"name": "greet", "arguments": ""},
+                    }
+                ]
+            }
+        ]
+        deltas += [
+            {"tool_calls": [{"index": 0, "function": {"arguments": char}}]}
+            for char in arguments
+        ]
+        for delta in deltas:
+            received += 1
+            yield raw.decode_chunk({"choices": [{"delta": delta}]})  # type: ignore[misc]
+
+    agent = _agent(OpenAIClient(api_key="abc"), graceful_errors=True)
+    with patch("llmio.clients.BaseClient.stream_chat_completion", side_effect=stream):
+        response = await agent.speak("Hello", stream=True)
+
+    assert response.messages == ["Sorry"]
+    assert received == len('{"name": 1') + 1
+    tool_calls: Any = response.history[1]["tool_calls"]  # type: ignore[typeddict-item]
+    assert tool_calls[0]["function"]["arguments"] == '{"name": 1'
+    assert response.history[2]["content"] == (
+        "The argument validation failed for the function call to greet: "
+        "The argument 'name' must be of type string at position 9 of the arguments."
+    )
+
+
+async def test_lax_arguments_are_not_aborted() -> None:
+    # pydantic accepts booleans for numbers, so the stream must not be aborted.
+    script = [Step(tool_calls=[("double", {"num": True})]), Step(content="Done")]
+    async with MockServer(script=script) as server:
+        agent = Agent(
+            instruction="You are a calculator",
+            client=OpenAIClient(api_key="abc", base_url=server.url),
+        )
+
+        @agent.tool
+        async def double(num: int) -> int:
+            return num * 2
+
+        response = await agent.speak("Double true", stream=True)
+
+    assert response.messages == ["Done"]
+    tool_calls: Any = response.history[1]["tool_calls"]  # type: ignore[typeddict-item]
+    assert tool_calls[0]["function"]["arguments"] == '{"num": true}'
+    assert response.history[2]["content"] == "2"
@@ -0,0 +1,150 @@
+import contextlib
+import contextvars
+import json
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+import pytest
+
+from llmio import Agent, models, OpenAIClient, tracing
+
+from tests.utils import mocked_async_openai_replies
+
+
+@dataclass
+class RecordedSpan(tracing.Span):
+    name: str
+    parent: "RecordedSpan | None"
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class RecordingTracer(tracing.Tracer):
+    def __init__(self) -> None:
+        self.spans: list[RecordedSpan] = []
+        self._current: contextvars.ContextVar[RecordedSpan | None] = (
+            contextvars.ContextVar("current", default=None)
+        )
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, attributes: dict[str, Any] | None = None
+    ) -> Iterator[tracing.Span]:
+        span = RecordedSpan(
+            name=name, parent=self._current.get(), attributes=dict(attributes or {})
+        )
+        self.spans.append(span)
+        token = self._current.set(span)
+        try:
+            yield span
+        finally:
+            self._current.reset(token)
+
+
+def _calculator(tracer: tracing.Tracer) -> Agent:
+    agent = Agent(
+        instruction="You are a calculator",
+        client=OpenAIClient(api_key="abc"),
+        graceful_errors=True,
+        tracer=tracer,
+    )
+
+    @agent.tool
+    async def add(num1: float, num2: float) -> float:
+        return num1 + num2
+
+    @agent.inspect_prompt
+    def inspect_prompt(prompt: Any) -> None:
+        pass
+
+    return agent
+
+
+_MOCKS = [
+    models.ChatCompletionMessage.construct(
+        role="assistant",
+        tool_calls=[
+            models.ToolCall.construct(
+                id="add_1",
+                type="function",
+                function=models.Function.construct(
+                    name="add", arguments=json.dumps({"num1": 1})
+                ),
+            ),
+        ],
+    ),
+    models.ChatCompletionMessage.construct(
+        role="assistant",
+        tool_calls=[
+            models.ToolCall.construct(
+                id="add_2",
+                type="function",
+                function=models.Function.construct(
+                    name="add", arguments=json.dumps({"num1": 1, "num2": 2})
+                ),
+            ),
+        ],
+    ),
+    models.ChatCompletionMessage.construct(role="assistant", content="3"),
+]
+
+
+async def test_spans() -> None:
+    tracer = RecordingTracer()
+    agent = _calculator(tracer)
+
+    with mocked_async_openai_replies(_MOCKS):
+        await agent.speak("What is 1 + 2?")
+
+    names = [span.name for span in tracer.spans]
+    assert names == [
+        "llmio.speak",
+        "llmio.instruction",
+        "llmio.prompt_inspectors",
+        "llmio.completion",
+        "llmio.validate",
+        "llmio.prompt_inspectors",
+        "llmio.completion",
+        "llmio.validate",
+        "llmio.tool",
+        "llmio.prompt_inspectors",
+        "llmio.completion",
+    ]
+    speak = tracer.spans[0]
+    assert all(span.parent is speak for span in tracer.spans[1:])
+    assert speak.attributes == {
+        "gen_ai.request.model": "gpt-4o-mini",
+        "llmio.stream": False,
+        "llmio.rounds": 3,
+        "llmio.retries": 1,
+    }
+    completions = [span for span in tracer.spans if span.name == "llmio.completion"]
+    assert [span.attributes["llmio.retries"] for span in completions] == [0, 1, 1]
+    tool = next(span for span in tracer.spans if span.name == "llmio.tool")
+    assert tool.attributes == {"gen_ai.tool.name": "add"}
+
+
+async def test_opentelemetry_tracer() -> None:
+    pytest.importorskip("opentelemetry.sdk")
+    # pylint: disable=import-outside-toplevel
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    agent = _calculator(tracing.OpenTelemetryTracer(provider.get_tracer("test")))
+
+    with mocked_async_openai_replies(_MOCKS):
+        await agent.speak("What is 1 + 2?")
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    parent, speak = spans["llmio.tool"].parent, spans["llmio.speak"]
+    assert parent is not None and speak.context is not None
+    assert parent.span_id == speak.context.span_id
+    assert speak.attributes is not None and speak.attributes["llmio.rounds"] == 3
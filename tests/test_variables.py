@@ -0,0 +1,108 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from llmio import Agent, OpenAIClient
+from llmio.metrics import Metrics
+
+
+@dataclass
+class User:
+    name: str
+
+
+def _agent(instruction: str, metrics: Metrics | None = None) -> Agent:
+    return Agent(
+        instruction=instruction, client=OpenAIClient(api_key="abc"), metrics=metrics
+    )
+
+
+async def test_variables_are_evaluated_concurrently() -> None:
+    agent = _agent("{first} and {second}")
+
+    @agent.variable
+    async def first() -> str:
+        await asyncio.sleep(0.1)
+        return "one"
+
+    @agent.variable
+    async def second() -> str:
+        await asyncio.sleep(0.1)
+        return "two"
+
+    start = time.perf_counter()
+    assert await agent._get_instruction(None) == "one and two"
+    assert time.perf_counter() - start < 0.18
+
+
+async def test_format_specs_and_repeated_placeholders() -> None:
+    agent = _agent("{value:.2f} {value!r} {{literal}} {name!r:>6}")
+
+    @agent.variable
+    def value() -> float:
+        return 1.5
+
+    @agent.variable
+    def name() -> str:
+        return "a"
+
+    expected = "{value:.2f} {value!r} {{literal}} {name!r:>6}".format(
+        value=1.5, name="a"
+    )
+    assert await agent._get_instruction(None) == expected
+
+
+async def test_cache_scopes() -> None:
+    metrics = Metrics()
+    agent = _agent("{per_speak} {per_context} {shared}", metrics=metrics)
+    calls = {"per_speak": 0, "per_context": 0, "shared": 0}
+
+    @agent.variable
+    def per_speak() -> int:
+        calls["per_speak"] += 1
+        return calls["per_speak"]
+
+    @agent.variable(cache="context", key=lambda context: context.name)
+    def per_context(_context: User) -> str:
+        calls["per_context"] += 1
+        return _context.name
+
+    @agent.variable(cache="global")
+    def shared() -> str:
+        calls["shared"] += 1
+        return "shared"
+
+    assert await agent._get_instruction(User("a")) == "1 a shared"
+    assert await agent._get_instruction(User("a")) == "2 a shared"
+    assert await agent._get_instruction(User("b")) == "3 b shared"
+    assert calls == {"per_speak": 3, "per_context": 2, "shared": 1}
+    assert metrics.cache_hits.value(cache="variable") == 3
+
+
+async def test_cached_values_expire() -> None:
+    agent = _agent("{value}")
+    calls = 0
+
+    @agent.variable(cache="global", ttl=0.05)
+    def value() -> int:
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await agent._get_instruction(None) == "1"
+    assert await agent._get_instruction(None) == "1"
+    await asyncio.sleep(0.06)
+    assert await agent._get_instruction(None) == "2"
+
+
+async def test_unhashable_context_requires_key() -> None:
+    agent = _agent("{value}")
+
+    @agent.variable(cache="context")
+    def value() -> str:
+        return "value"
+
+    with pytest.raises(TypeError):
+        await agent._get_instruction({"user": "a"})